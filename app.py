@@ -1,8 +1,11 @@
 import os
 import logging
+import sqlite3
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
@@ -19,17 +22,70 @@ app.secret_key = os.environ.get("SESSION_SECRET", "default_secret_key_for_develo
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1) # needed for url_for to generate with https
 
 # configure the database, relative to the app instance folder
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///timetracker.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("SQLALCHEMY_DATABASE_URI", "sqlite:///timetracker.db")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_pre_ping": True,
 }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# SQLite performance profile, applied to every new connection (see PERFORMANCE.md).
+# Each pragma can be overridden with an SQLITE_<NAME> environment variable.
+app.config["SQLITE_PRAGMAS"] = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),  # readers no longer block on writers
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),  # safe with WAL, far fewer fsyncs
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),  # ms to wait for a lock before failing
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -32000)),  # negative means KiB
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+    "foreign_keys": os.environ.get("SQLITE_FOREIGN_KEYS", "ON"),
+}
+
+# Invoice and quote numbers are a prefix followed by a zero-padded counter (see numbering.py)
+app.config["DOCUMENT_NUMBER_FORMATS"] = {
+    "invoice": {
+        "prefix": os.environ.get("INVOICE_NUMBER_PREFIX", "INV-"),
+        "padding": int(os.environ.get("INVOICE_NUMBER_PADDING", 4)),
+    },
+    "quote": {
+        "prefix": os.environ.get("QUOTE_NUMBER_PREFIX", "QUO-"),
+        "padding": int(os.environ.get("QUOTE_NUMBER_PADDING", 4)),
+    },
+}
+
+# Per-request query counts, DB time and N+1 detection (see sql_profiler.py)
+app.config["SQL_PROFILER"] = {
+    "enabled": os.environ.get("SQL_PROFILER", "1") == "1",
+    "strict": os.environ.get("SQL_PROFILER_STRICT", "0") == "1",  # raise when a request goes over its query budget
+    "query_budget": int(os.environ.get("SQL_QUERY_BUDGET", 20)),  # for views without @query_budget
+    "slow_ms": float(os.environ.get("SQL_PROFILER_SLOW_MS", 250)),  # DB time per request before it is logged
+    "repeat_threshold": int(os.environ.get("SQL_PROFILER_REPEAT_THRESHOLD", 5)),  # runs of one statement flagged as N+1
+    "debug_page": os.environ.get("SQL_PROFILER_PAGE", "0") == "1",  # serve /debug/perf without debug mode
+}
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the configured SQLite pragmas to a new DBAPI connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config["SQLITE_PRAGMAS"].items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 # initialize the app with the extension, flask-sqlalchemy >= 3.0.x
 db.init_app(app)
 
 with app.app_context():
     # Make sure to import the models here or their tables won't be created
     import models  # noqa: F401
+    # Registers the session events that keep the daily rollup in step with time entries
+    import rollup  # noqa: F401
+    # Registers the events that bump data versions for write-invalidated caches
+    import cache  # noqa: F401
+    # Creates the full-text search index and its triggers along with the tables
+    import search  # noqa: F401
+    # Registers the engine events and request hooks of the per-request SQL profiler
+    import sql_profiler  # noqa: F401
 
     db.create_all()
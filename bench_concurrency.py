@@ -0,0 +1,173 @@
+"""Concurrency benchmark for the SQLite profile configured in app.py.
+
+Starts several worker processes, each with its own copy of the app the way
+gunicorn workers have, against one shared database file that is seeded with
+time entries. Writer processes save timers through /save-timer while reader
+processes keep streaming the full CSV export, a read that holds its snapshot
+for as long as the rows are being sent. The benchmark counts failed saves
+("database is locked") and reports save latency and throughput.
+
+With the rollback journal, a reader blocks every writer from committing until
+its read is finished, so saves wait and eventually fail once busy_timeout
+runs out. With WAL, readers and the writer do not block each other.
+
+Usage:
+    python bench_concurrency.py [--writers 4] [--readers 4] [--requests 30] [--entries 50000]
+                                [--profile legacy|tuned|both]
+"""
+import argparse
+import io
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+# Pragma overrides for each profile, passed to the workers as environment variables
+PROFILES = {
+    # What the app ran with before: rollback journal, full fsync on every commit
+    'legacy': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT': '5000',  # the sqlite3 module's default timeout
+        'SQLITE_MMAP_SIZE': '0',
+        'SQLITE_CACHE_SIZE': '-2000',
+        'SQLITE_TEMP_STORE': 'DEFAULT',
+    },
+    # The defaults in app.py
+    'tuned': {},
+}
+
+
+def _load_app(db_path, profile):
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    os.environ['SQL_PROFILER'] = '0'
+    os.environ.update(PROFILES[profile])
+
+    from app import app
+    import routes  # noqa: F401
+
+    # Failed requests are counted below, keep their tracebacks out of the report
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+def setup_database(db_path, profile, entries):
+    """Create the schema, a client to log time against and entries for the readers to export"""
+    app = _load_app(db_path, profile)
+    from app import db
+    from models import Client
+    from time_entry_import import import_time_entries
+
+    with app.app_context():
+        client = Client(name="Benchmark Client", hourly_rate=100.0)
+        db.session.add(client)
+        db.session.commit()
+
+        rows = ''.join(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},09:00,10:30,Seed entry {i},Benchmark Client\n"
+                       for i in range(entries))
+        import_time_entries(io.StringIO('date,time_in,time_out,item,client\n' + rows))
+        db.session.commit()
+        return client.id
+
+
+def run_writer(db_path, profile, client_id, requests, worker_id, results):
+    """Save timers, putting ('writer', saved, failed, save latencies) on the results queue"""
+    app = _load_app(db_path, profile)
+    client = app.test_client()
+
+    saved = failed = 0
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = client.post('/save-timer', data={
+            'client_id': client_id,
+            'item': f"Worker {worker_id} timer {i}",
+            'location': 'Benchmark',
+            'date': '2025-01-15',
+            'time_in': '09:00',
+            'time_out': '10:30',
+            'total_hours': '1.5',
+            'hourly_rate': '100',
+        })
+        latencies.append(time.perf_counter() - start)
+        # A successful save redirects to the listing, a failed one back to the timer
+        if response.headers.get('Location', '').endswith('/time-entries'):
+            saved += 1
+        else:
+            failed += 1
+    results.put(('writer', saved, failed, latencies))
+
+
+def run_reader(db_path, profile, done, results):
+    """Stream the full export until the writers are done, putting ('reader', exports, failed, []) on the queue"""
+    app = _load_app(db_path, profile)
+    client = app.test_client()
+
+    exports = failed = 0
+    while not done.is_set():
+        try:
+            response = client.get('/time-entries/export?format=csv')
+            response.get_data()
+            exports += 1
+        except Exception:
+            failed += 1
+    results.put(('reader', exports, failed, []))
+
+
+def run_profile(profile, writers, readers, requests, entries):
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with ctx.Pool(1) as pool:
+            client_id = pool.apply(setup_database, (db_path, profile, entries))
+
+        done = ctx.Event()
+        results = ctx.Queue()
+        reader_processes = [ctx.Process(target=run_reader, args=(db_path, profile, done, results))
+                            for _ in range(readers)]
+        writer_processes = [ctx.Process(target=run_writer, args=(db_path, profile, client_id, requests, worker_id,
+                                                                 results))
+                            for worker_id in range(writers)]
+        for process in reader_processes:
+            process.start()
+        start = time.perf_counter()
+        for process in writer_processes:
+            process.start()
+
+        outcomes = [results.get() for _ in writer_processes]
+        elapsed = time.perf_counter() - start
+        done.set()
+        outcomes += [results.get() for _ in reader_processes]
+        for process in reader_processes + writer_processes:
+            process.join()
+
+    writes = [outcome for outcome in outcomes if outcome[0] == 'writer']
+    reads = [outcome for outcome in outcomes if outcome[0] == 'reader']
+    saved = sum(outcome[1] for outcome in writes)
+    failed = sum(outcome[2] for outcome in writes)
+    latencies = sorted(latency for outcome in writes for latency in outcome[3])
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{profile:<8} writers={writers} readers={readers} saved={saved} failed={failed} "
+          f"exports={sum(outcome[1] for outcome in reads)} elapsed={elapsed:.2f}s "
+          f"throughput={saved / elapsed:.1f} saves/s save median={statistics.median(latencies) * 1000:.0f}ms "
+          f"p95={p95 * 1000:.0f}ms")
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=30, help='saves per writer')
+    parser.add_argument('--entries', type=int, default=50000, help='time entries seeded for the readers to export')
+    parser.add_argument('--profile', choices=['legacy', 'tuned', 'both'], default='both')
+    args = parser.parse_args()
+
+    profiles = ['legacy', 'tuned'] if args.profile == 'both' else [args.profile]
+    failures = {profile: run_profile(profile, args.writers, args.readers, args.requests, args.entries)
+                for profile in profiles}
+
+    # Exit non-zero if the tuned profile dropped any writes
+    raise SystemExit(1 if failures.get('tuned') else 0)
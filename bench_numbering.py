@@ -0,0 +1,118 @@
+"""Stress test for invoice and quote number allocation.
+
+Starts several worker processes against one database file, the way gunicorn
+workers share it, and has every worker create invoices and quotes through
+/invoices/create and /quotes/create as fast as it can. Afterwards it checks
+that no create failed and that the issued numbers are unique and gap-free.
+
+Usage:
+    python bench_numbering.py [--workers 8] [--requests 50]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date, time as time_of_day
+
+
+def _load_app(db_path):
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+
+    from app import app
+    import routes  # noqa: F401
+
+    # Failed requests are counted below, keep their tracebacks out of the report
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+def setup_database(db_path, entries):
+    """Create a client and the time entries the invoices and quotes are made from"""
+    app = _load_app(db_path)
+    from app import db
+    from models import Client, TimeEntry
+
+    with app.app_context():
+        client = Client(name="Benchmark Client", hourly_rate=100.0)
+        db.session.add(client)
+        db.session.flush()
+        db.session.execute(TimeEntry.__table__.insert(), [
+            dict(client_id=client.id, item=f"Entry {i}", date=date(2025, 1, 15), time_in=time_of_day(9),
+                 time_out=time_of_day(10), total_hours=1.0, hourly_rate=100.0, amount=100.0)
+            for i in range(entries)
+        ])
+        db.session.commit()
+        return client.id, [entry_id for (entry_id,) in db.session.query(TimeEntry.id).order_by(TimeEntry.id)]
+
+
+def run_worker(db_path, client_id, entry_ids):
+    """Alternate invoice and quote creates, returning (created, failed)"""
+    app = _load_app(db_path)
+    client = app.test_client()
+
+    created = failed = 0
+    for i, entry_id in enumerate(entry_ids):
+        kind = 'invoices' if i % 2 == 0 else 'quotes'
+        response = client.post(f'/{kind}/create', data={
+            'client_id': client_id,
+            'date_issued': '2025-02-01',
+            'time_entries': [entry_id],
+        })
+        # A successful create redirects to the new document, a failed one back to the form
+        if response.headers.get('Location', '').endswith('/create'):
+            failed += 1
+        else:
+            created += 1
+    return created, failed
+
+
+def check_numbers(db_path):
+    """Return (issued numbers per kind, problems found)"""
+    app = _load_app(db_path)
+    from app import db
+    from models import Invoice, Quote
+    from numbering import format_document_number
+
+    issued, problems = {}, []
+    with app.app_context():
+        for kind, column in (('invoice', Invoice.invoice_number), ('quote', Quote.quote_number)):
+            numbers = sorted(db.session.scalars(db.select(column)))
+            expected = [format_document_number(kind, value) for value in range(1, len(numbers) + 1)]
+            if numbers != expected:
+                problems.append(f"{kind} numbers have gaps or duplicates: {sorted(set(expected) - set(numbers))[:5]}")
+            issued[kind] = len(numbers)
+    return issued, problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50, help='creates per worker')
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with ctx.Pool(1) as pool:
+            client_id, entry_ids = pool.apply(setup_database, (db_path, args.workers * args.requests))
+
+        start = time.perf_counter()
+        with ctx.Pool(args.workers) as pool:
+            results = pool.starmap(run_worker, [
+                (db_path, client_id, entry_ids[worker::args.workers]) for worker in range(args.workers)
+            ])
+        elapsed = time.perf_counter() - start
+
+        with ctx.Pool(1) as pool:
+            issued, problems = pool.apply(check_numbers, (db_path,))
+
+    created = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    print(f"workers={args.workers} created={created} failed={failed} elapsed={elapsed:.2f}s "
+          f"invoices={issued['invoice']} quotes={issued['quote']}")
+    for problem in problems:
+        print(problem)
+
+    raise SystemExit(1 if failed or problems else 0)
@@ -0,0 +1,102 @@
+"""Micro-benchmark for invoice and quote PDF rendering.
+
+Renders documents built from in-memory objects (no database needed) into a
+temporary file and reports the mean time per PDF and the peak RSS of the
+process. With --cold the per-process style and logo caches in utils.py are
+cleared before every render, which reproduces the cost of building them on
+each call. Peak RSS only ever grows, so compare sizes in separate runs.
+
+Usage:
+    python bench_pdf.py [--lines 20] [--count 50] [--cold] [--kind invoice|quote]
+"""
+import argparse
+import resource
+import tempfile
+import time
+from datetime import date, time as time_of_day, timedelta
+from types import SimpleNamespace
+
+import utils
+
+
+def sample_company():
+    return SimpleNamespace(
+        company_name="Benchmark Consulting", address="1 Main Street", city="Toronto",
+        province="ON", postal_code="M5V 1A1", phone="555-0100", email="billing@example.com",
+        website="example.com", tax_number="123456789RT0001", default_hst_rate=0.13
+    )
+
+
+def sample_document(lines, quote=False):
+    client = SimpleNamespace(
+        name="Benchmark Client", contact_person="Pat Smith", address="2 King Street",
+        city="Ottawa", province="ON", postal_code="K1P 1A1", phone="555-0199", email="ap@example.com"
+    )
+    entries = [
+        SimpleNamespace(
+            date=date(2025, 1, 1) + timedelta(days=i % 28), item=f"Consulting work item {i}",
+            location="On site", time_in=time_of_day(9), time_out=time_of_day(11),
+            total_hours=2.0, hourly_rate=120.0, amount=240.0
+        )
+        for i in range(lines)
+    ]
+    subtotal = sum(entry.amount for entry in entries)
+    document = SimpleNamespace(
+        client=client, time_entries=entries, date_issued=date(2025, 2, 1), notes="Thank you for your business.",
+        subtotal=subtotal, hst_rate=0.13, hst_amount=subtotal * 0.13, total=subtotal * 1.13
+    )
+    if quote:
+        document.quote_number = "QUO-0001"
+        document.date_valid_until = date(2025, 3, 1)
+    else:
+        document.invoice_number = "INV-0001"
+        document.date_due = date(2025, 3, 1)
+    return document
+
+
+def clear_render_caches():
+    for name in ('pdf_styles', '_load_logo'):
+        cached = getattr(utils, name, None)
+        if cached is not None:
+            cached.cache_clear()
+
+
+def render_to_file(write, document, company):
+    with tempfile.TemporaryFile() as output:
+        write(document, company, output)
+        return output.tell()
+
+
+def bench(write, document, company, count, cold):
+    render_to_file(write, document, company)  # warm up imports and fonts
+    start = time.perf_counter()
+    for _ in range(count):
+        if cold:
+            clear_render_caches()
+        size = render_to_file(write, document, company)
+    return (time.perf_counter() - start) / count * 1000, size
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=20, help='time entries per document')
+    parser.add_argument('--count', type=int, default=50, help='renders per measurement')
+    parser.add_argument('--cold', action='store_true', help='clear the render caches before every PDF')
+    parser.add_argument('--kind', choices=['invoice', 'quote'], help='only render this kind of document')
+    args = parser.parse_args()
+
+    company = sample_company()
+    for label, write, document in (
+        ('invoice', utils.write_invoice_pdf, sample_document(args.lines)),
+        ('quote', utils.write_quote_pdf, sample_document(args.lines, quote=True)),
+    ):
+        if args.kind and args.kind != label:
+            continue
+        ms, size = bench(write, document, company, args.count, args.cold)
+        print(f"{label:<8} lines={args.lines} {'cold' if args.cold else 'warm'} {ms:.2f} ms/pdf "
+              f"{size / 1024:.0f} KiB, peak RSS {peak_rss_mib():.0f} MiB")
@@ -0,0 +1,229 @@
+"""Set-based creation of invoices and quotes from time entries.
+
+A document is created in the caller's transaction with a fixed number of
+statements however many entries it covers: the document row is inserted, the
+entries are linked to it with bulk UPDATEs, and its subtotal is an integer SQL
+SUM over the stored amounts of the entries that were actually linked. The
+UPDATEs only match entries of the document's client that are not billed yet,
+so an entry that a concurrent request invoiced first is never billed twice; if
+any selected entry cannot be linked, a ValueError is raised and the caller
+rolls back.
+"""
+from datetime import timedelta
+
+from sqlalchemy import func, select, update
+
+from app import db
+from models import Client, Invoice, Quote, QuoteStatus, TimeEntry
+from money import round_to_cent
+from numbering import next_document_number, release_document_number
+from rollup import refresh_rollup
+
+# Entry ids per UPDATE, well below SQLite's limit on bound parameters
+ENTRY_ID_CHUNK_SIZE = 5000
+
+# Invoices committed together by a batch invoicing run
+BATCH_CLIENTS_PER_TRANSACTION = 20
+
+
+class BatchInvoicingError(Exception):
+    """A batch invoicing run failed; committed lists the summaries of the invoices it committed before that"""
+
+    def __init__(self, error, committed):
+        super().__init__(str(error))
+        self.committed = committed
+
+
+def _link_entries(column, document_id, conditions, entry_ids=None):
+    """Set column to document_id on the entries matching conditions, returning how many were linked"""
+    def link(*extra):
+        statement = update(TimeEntry).where(*conditions, *extra).values({column: document_id})
+        # The entries are not loaded, there is nothing in the session to synchronize
+        return db.session.execute(statement, execution_options={'synchronize_session': False}).rowcount
+
+    if entry_ids is None:
+        return link()
+    return sum(
+        link(TimeEntry.id.in_(entry_ids[start:start + ENTRY_ID_CHUNK_SIZE]))
+        for start in range(0, len(entry_ids), ENTRY_ID_CHUNK_SIZE)
+    )
+
+
+def _apply_totals(document, column):
+    """Set the document's subtotal, HST and total from the SUM of its linked entries"""
+    subtotal = db.session.execute(
+        select(func.coalesce(func.sum(TimeEntry.amount), 0)).where(column == document.id)
+    ).scalar()
+    document.subtotal = subtotal
+    document.hst_amount = round_to_cent(subtotal * document.hst_rate)
+    document.total = subtotal + document.hst_amount
+
+
+def _refresh_invoiced_days(invoice):
+    """Bring the rollup up to date for the days of the entries just invoiced"""
+    days = db.session.execute(
+        select(TimeEntry.client_id, TimeEntry.date).where(TimeEntry.invoice_id == invoice.id).distinct()
+    ).all()
+    refresh_rollup(db.session.connection(), days)
+
+
+def _entry_ids(entry_ids):
+    entry_ids = sorted({int(entry_id) for entry_id in entry_ids})
+    if not entry_ids:
+        raise ValueError('Please select at least one time entry')
+    return entry_ids
+
+
+def _create_invoice(client_id, date_issued, date_due, hst_rate, notes, entry_ids=None, conditions=()):
+    """Create an invoice billing the client's uninvoiced entries, returning it and how many entries it bills.
+
+    The entries are the given entry_ids, all of which must be billable, or
+    else every uninvoiced entry of the client matching conditions.
+    """
+    invoice = Invoice(
+        invoice_number=next_document_number('invoice'),
+        client_id=client_id,
+        date_issued=date_issued,
+        date_due=date_due,
+        hst_rate=hst_rate,
+        status='draft',
+        notes=notes
+    )
+    db.session.add(invoice)
+    db.session.flush()  # Get the invoice ID
+
+    linked = _link_entries(
+        TimeEntry.invoice_id, invoice.id,
+        [TimeEntry.client_id == client_id, TimeEntry.invoice_id.is_(None), *conditions], entry_ids
+    )
+    if entry_ids is not None and linked != len(entry_ids):
+        raise ValueError(f'{len(entry_ids) - linked} of the selected time entries are already invoiced '
+                         f'or belong to another client')
+
+    _apply_totals(invoice, TimeEntry.invoice_id)
+    _refresh_invoiced_days(invoice)
+    return invoice, linked
+
+
+def create_invoice_for_entries(client_id, entry_ids, date_issued, date_due, hst_rate, notes=''):
+    """Create an invoice billing the given unbilled entries of a client"""
+    invoice, _ = _create_invoice(client_id, date_issued, date_due, hst_rate, notes, entry_ids=_entry_ids(entry_ids))
+    return invoice
+
+
+def create_quote_for_entries(client_id, entry_ids, date_issued, date_valid_until, hst_rate, notes=''):
+    """Create a quote for the given entries of a client that are neither invoiced nor quoted"""
+    entry_ids = _entry_ids(entry_ids)
+
+    quote = Quote(
+        quote_number=next_document_number('quote'),
+        client_id=client_id,
+        date_issued=date_issued,
+        date_valid_until=date_valid_until,
+        hst_rate=hst_rate,
+        status=QuoteStatus.PENDING.value,
+        notes=notes
+    )
+    db.session.add(quote)
+    db.session.flush()  # Get the quote ID
+
+    linked = _link_entries(
+        TimeEntry.quote_id, quote.id,
+        [TimeEntry.client_id == client_id, TimeEntry.invoice_id.is_(None), TimeEntry.quote_id.is_(None)],
+        entry_ids
+    )
+    if linked != len(entry_ids):
+        raise ValueError(f'{len(entry_ids) - linked} of the selected time entries are already invoiced, '
+                         f'quoted or belong to another client')
+
+    _apply_totals(quote, TimeEntry.quote_id)
+    return quote
+
+
+def convert_quote_to_invoice(quote, date_issued, date_due):
+    """Create an invoice billing every entry of a quote and mark the quote as invoiced"""
+    quoted = db.session.execute(select(func.count(TimeEntry.id)).where(TimeEntry.quote_id == quote.id)).scalar()
+    invoice, linked = _create_invoice(quote.client_id, date_issued, date_due, quote.hst_rate, quote.notes,
+                                      conditions=[TimeEntry.quote_id == quote.id])
+    if linked != quoted:
+        raise ValueError(f'{quoted - linked} of the quoted time entries are already invoiced')
+
+    # Link the quote to the invoice
+    quote.invoice_id = invoice.id
+    quote.status = QuoteStatus.INVOICED.value
+    return invoice
+
+
+def previous_month(today):
+    """First and last day of the month before today"""
+    last_day = today.replace(day=1) - timedelta(days=1)
+    return last_day.replace(day=1), last_day
+
+
+def unbilled_period_totals(period_start, period_end):
+    """Entry count, hours and subtotal of each client's unbilled entries in a billing period"""
+    return db.session.execute(
+        select(
+            Client.id.label('client_id'),
+            Client.name.label('client_name'),
+            func.count(TimeEntry.id).label('entry_count'),
+            func.sum(TimeEntry.total_hours).label('hours'),
+            func.sum(TimeEntry.amount).label('subtotal'),
+        ).join(TimeEntry, TimeEntry.client_id == Client.id).where(
+            TimeEntry.invoice_id.is_(None),
+            TimeEntry.date >= period_start,
+            TimeEntry.date <= period_end
+        ).group_by(Client.id, Client.name).order_by(Client.name, Client.id)
+    ).all()
+
+
+def invoice_billing_period(period_start, period_end, date_issued, date_due, hst_rate,
+                           clients_per_transaction=BATCH_CLIENTS_PER_TRANSACTION, progress=None):
+    """Invoice every client's unbilled entries in a billing period.
+
+    Commits after every clients_per_transaction invoices, so an interrupted
+    run keeps the invoices committed so far; running it again only invoices
+    the entries that are still unbilled. A client whose entries were billed
+    by someone else since the totals were read gets no invoice. progress(done,
+    total, summary) is called after each invoice. Returns a summary dict per
+    invoice created, or raises BatchInvoicingError after rolling back the
+    uncommitted part of the run.
+    """
+    created = []
+    committed = 0
+    try:
+        pending = unbilled_period_totals(period_start, period_end)
+        notes = f"Billing period {period_start:%Y-%m-%d} to {period_end:%Y-%m-%d}"
+
+        for done, client in enumerate(pending, 1):
+            invoice, linked = _create_invoice(
+                client.client_id, date_issued, date_due, hst_rate, notes,
+                conditions=[TimeEntry.date >= period_start, TimeEntry.date <= period_end]
+            )
+            if not linked:
+                # Drop the empty invoice and give its number back so the sequence stays gap-free
+                db.session.delete(invoice)
+                db.session.flush()
+                release_document_number('invoice', invoice.invoice_number)
+                continue
+
+            summary = {
+                'client': client.client_name,
+                'invoice_number': invoice.invoice_number,
+                'entries': linked,
+                'subtotal': invoice.subtotal,
+                'total': invoice.total,
+            }
+            created.append(summary)
+
+            if len(created) % clients_per_transaction == 0:
+                db.session.commit()
+                committed = len(created)
+            if progress:
+                progress(done, len(pending), summary)
+
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        raise BatchInvoicingError(error, created[:committed]) from error
+    return created
@@ -0,0 +1,119 @@
+"""Bulk export of invoice PDFs.
+
+Invoices are rendered by a pool of worker processes, each with its own app and
+database connection, through the same on-disk PDF cache the download route
+uses. The ZIP archive is written out as each PDF becomes available, so neither
+the web worker nor the CLI ever holds the whole archive in memory.
+"""
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import app, db
+from models import CompanySettings, Invoice
+from pdf_cache import cached_pdf
+from utils import generate_combined_invoice_pdf, write_invoice_pdf
+
+PDF_EXPORT_WORKERS = int(os.environ.get('PDF_EXPORT_WORKERS', os.cpu_count() or 2))
+
+# Bytes copied from a rendered PDF into the archive at a time
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def filter_invoices(query, start_date=None, end_date=None, status=None, client_id=None):
+    """Apply the export filters to an invoice query"""
+    if start_date:
+        query = query.filter(Invoice.date_issued >= start_date)
+    if end_date:
+        query = query.filter(Invoice.date_issued <= end_date)
+    if status:
+        query = query.filter(Invoice.status == status)
+    if client_id:
+        query = query.filter(Invoice.client_id == client_id)
+    return query
+
+
+def matching_invoice_ids(**filters):
+    """Ids of the invoices matching the export filters, oldest first"""
+    query = filter_invoices(db.session.query(Invoice.id), **filters)
+    return [invoice_id for (invoice_id,) in query.order_by(Invoice.date_issued, Invoice.id)]
+
+
+def _render_invoice(invoice_id):
+    """Worker process entry point: render one invoice through the PDF cache.
+
+    Returns the invoice number and PDF path, or None if the invoice was
+    deleted after its id was listed.
+    """
+    with app.app_context():
+        invoice = db.session.get(Invoice, invoice_id)
+        if invoice is None:
+            return None
+        company = CompanySettings.query.first()
+        path, _ = cached_pdf('invoice', invoice, company, write_invoice_pdf)
+        return invoice.invoice_number, path
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only stream that hands back whatever was written since the last pop()"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _pending(output):
+    data = output.pop()
+    if data:
+        yield data
+
+
+def stream_invoice_zip(invoice_ids, workers=PDF_EXPORT_WORKERS):
+    """Yield a ZIP archive of the invoices' PDFs, chunk by chunk, while they render"""
+    output = _ChunkWriter()
+    executor = ProcessPoolExecutor(
+        max_workers=max(1, min(workers, len(invoice_ids))),
+        mp_context=multiprocessing.get_context('spawn')
+    )
+    try:
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            # map() keeps the invoice order while later invoices render in the background
+            for rendered in executor.map(_render_invoice, invoice_ids):
+                if rendered is None:
+                    continue
+                invoice_number, path = rendered
+                with open(path, 'rb') as pdf_file, archive.open(f"Invoice_{invoice_number}.pdf", 'w') as entry:
+                    while chunk := pdf_file.read(COPY_CHUNK_SIZE):
+                        entry.write(chunk)
+                        yield from _pending(output)
+                yield from _pending(output)
+
+        # Closing the archive writes its central directory
+        yield from _pending(output)
+    finally:
+        # Stop rendering if the download was abandoned part way
+        executor.shutdown(cancel_futures=True)
+
+
+def write_combined_invoice_pdf(invoice_ids, output):
+    """Render the invoices into a single PDF written to output (a path or file)"""
+    invoices = Invoice.query.options(joinedload(Invoice.client), selectinload(Invoice.time_entries)).filter(
+        Invoice.id.in_(invoice_ids)).order_by(Invoice.date_issued, Invoice.id).all()
+    company = CompanySettings.query.first()
+    generate_combined_invoice_pdf(invoices, company, output)
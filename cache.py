@@ -0,0 +1,173 @@
+"""Process-local caches invalidated by database writes.
+
+Mapper and session events record which tables each flush (or bulk ORM
+statement) writes to, and the counters of all of them in the data_version
+table are bumped once, right before the transaction commits, on the same
+connection, so a version moves exactly when the change commits. A cached
+value remembers the versions it was computed from and is only reused while
+they are unchanged; checking that costs one primary-key read and also sees
+writes made by other worker processes.
+
+The same versions give JSON endpoints an ETag, so unchanged responses are
+answered with 304 Not Modified without being queried or serialized.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import make_response, request
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+
+from app import db
+from models import DataVersion
+
+_PENDING_KEY = 'changed_tables'
+
+# Every cache created, for reporting hit/miss counters
+caches = []
+
+
+def bump_versions(connection, tables):
+    """Increment the data version of each table name"""
+    tables = sorted(set(tables))
+    result = connection.execute(
+        update(DataVersion).where(DataVersion.name.in_(tables)).values(version=DataVersion.version + 1))
+    if result.rowcount < len(tables):
+        existing = set(connection.execute(select(DataVersion.name).where(DataVersion.name.in_(tables))).scalars())
+        connection.execute(insert(DataVersion), [{'name': table, 'version': 1}
+                                                 for table in tables if table not in existing])
+
+
+def mark_tables_changed(tables, session=None):
+    """Have the data versions of the table names bumped when the session's transaction commits"""
+    session = session or db.session()
+    session.info.setdefault(_PENDING_KEY, set()).update(tables)
+
+
+def _changed_tables():
+    return db.session().info.get(_PENDING_KEY, ())
+
+
+def current_versions(tables):
+    """Current data versions of the given table names, as a tuple in the same order"""
+    rows = dict(db.session.execute(
+        select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(tables))).all())
+    return tuple(rows.get(table, 0) for table in tables)
+
+
+def versions_etag(tables):
+    """ETag for a response computed from the given table names"""
+    return '-'.join(str(version) for version in current_versions(tables))
+
+
+def conditional_on_versions(*tables):
+    """Decorate a view so it answers 304 while the tables it reads are unchanged.
+
+    The ETag is read before the view runs, so a write that commits in between
+    only makes the next request fetch the response again.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = versions_etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            # Caches may keep the response but must revalidate it with the ETag each time
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+class VersionedCache:
+    """Cache of computed values that stay valid while the watched tables are unchanged"""
+
+    def __init__(self, name, tables, maxsize=128, ttl=None):
+        self.name = name
+        self.tables = tuple(tables)
+        self.maxsize = maxsize
+        self.ttl = ttl  # seconds a value is used for at most, None to keep it while the tables are unchanged
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        caches.append(self)
+
+    def get(self, compute, key=None):
+        """Return the cached value for key, calling compute() if it is missing or stale"""
+        if any(table in self.tables for table in _changed_tables()):
+            # The current transaction wrote to a watched table, its versions only move on commit
+            return compute()
+        versions = current_versions(self.tables)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == versions and (entry[2] is None or entry[2] > time.monotonic()):
+            with self._lock:
+                self.hits += 1
+                # Move the key to the end so the least recently used keys are evicted first
+                if self._entries.get(key) is entry:
+                    self._entries[key] = self._entries.pop(key)
+            return entry[1]
+
+        value = compute()
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self.misses += 1
+            self._entries.pop(key, None)
+            self._entries[key] = (versions, value, expires)
+            # Evict the least recently used keys once the cache is full
+            while len(self._entries) > self.maxsize:
+                self._entries.pop(next(iter(self._entries)))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'tables': list(self.tables),
+            'entries': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def _record_write(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None and mapper.local_table.name != DataVersion.__tablename__:
+        mark_tables_changed([mapper.local_table.name], session)
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(db.Model, _event_name, _record_write, propagate=True)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def record_bulk_write(orm_execute_state):
+    # ORM-enabled bulk UPDATE/DELETE/INSERT statements bypass the flush
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name != DataVersion.__tablename__:
+        mark_tables_changed([mapper.local_table.name], orm_execute_state.session)
+
+
+@event.listens_for(Session, 'before_commit')
+def bump_changed_versions(session):
+    # The commit flushes after this event, so flush first to include the tables of that last flush
+    session.flush()
+    tables = session.info.pop(_PENDING_KEY, None)
+    if tables:
+        bump_versions(session.connection(), tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changed_tables(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,149 @@
+"""Flask CLI commands, run with `flask --app main <command>`"""
+import io
+from datetime import date, timedelta
+
+import click
+
+from app import app, db
+from billing import (BATCH_CLIENTS_PER_TRANSACTION, BatchInvoicingError, invoice_billing_period, previous_month,
+                     unbilled_period_totals)
+from bulk_export import PDF_EXPORT_WORKERS, matching_invoice_ids, stream_invoice_zip, write_combined_invoice_pdf
+from models import CompanySettings
+from rollup import rebuild_rollup
+from search import rebuild_search_index
+from time_entry_export import EXPORT_FORMATS, stream_time_entries
+from time_entry_import import import_time_entries
+
+
+@app.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Rebuild the daily rollup table from all time entries."""
+    rows = rebuild_rollup(db.session.connection())
+    db.session.commit()
+    click.echo(f"Rebuilt daily rollup: {rows} rows")
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from all searchable rows."""
+    rows = rebuild_search_index(db.session.connection())
+    db.session.commit()
+    click.echo(f"Rebuilt search index: {rows} rows")
+
+
+@app.cli.command('export-invoices')
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Issued on or after this date.')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Issued on or before this date.')
+@click.option('--status', type=click.Choice(['draft', 'sent', 'paid']), help='Only invoices with this status.')
+@click.option('--client-id', type=int, help='Only invoices for this client.')
+@click.option('--combined', is_flag=True, help='Write one combined PDF instead of a ZIP of PDFs.')
+@click.option('--workers', type=int, default=PDF_EXPORT_WORKERS, show_default=True, help='Rendering processes.')
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False), help='File to write.')
+def export_invoices_command(start_date, end_date, status, client_id, combined, workers, output):
+    """Export the PDFs of matching invoices as a ZIP or one combined PDF."""
+    invoice_ids = matching_invoice_ids(
+        start_date=start_date.date() if start_date else None,
+        end_date=end_date.date() if end_date else None,
+        status=status,
+        client_id=client_id
+    )
+    if not invoice_ids:
+        raise click.ClickException('No invoices match the export filters')
+
+    if combined:
+        write_combined_invoice_pdf(invoice_ids, output)
+    else:
+        with open(output, 'wb') as archive:
+            for chunk in stream_invoice_zip(invoice_ids, workers=workers):
+                archive.write(chunk)
+    click.echo(f"Exported {len(invoice_ids)} invoices to {output}")
+
+
+@app.cli.command('export-time-entries')
+@click.option('--client-id', type=int, help='Only entries for this client.')
+@click.option('--task-id', type=int, help='Only entries logged against this task.')
+@click.option('--date-from', type=click.DateTime(formats=['%Y-%m-%d']), help='Entries on or after this date.')
+@click.option('--date-to', type=click.DateTime(formats=['%Y-%m-%d']), help='Entries on or before this date.')
+@click.option('--invoice-status', type=click.Choice(['invoiced', 'not_invoiced']), help='Only invoiced or uninvoiced entries.')
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False, allow_dash=True),
+              help='File to write, or - for standard output.')
+def export_time_entries_command(client_id, task_id, date_from, date_to, invoice_status, export_format, output):
+    """Export matching time entries as CSV or NDJSON."""
+    chunks = stream_time_entries(
+        export_format,
+        client_id=client_id,
+        task_id=task_id,
+        date_from=date_from.date() if date_from else None,
+        date_to=date_to.date() if date_to else None,
+        invoice_status=invoice_status
+    )
+    with click.open_file(output, 'wb') as export_file:
+        for chunk in chunks:
+            export_file.write(chunk.encode('utf-8'))
+
+
+@app.cli.command('import-time-entries')
+@click.argument('csv_file', type=click.File('rb', lazy=False))
+@click.option('--dry-run', is_flag=True, help='Validate the rows and report errors without saving anything.')
+def import_time_entries_command(csv_file, dry_run):
+    """Import time entries from a CSV file (- for standard input)."""
+    try:
+        result = import_time_entries(io.TextIOWrapper(csv_file, encoding='utf-8-sig', newline=''))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for error in result['errors']:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+    if result['error_count'] > len(result['errors']):
+        click.echo(f"... and {result['error_count'] - len(result['errors'])} more errors", err=True)
+
+    if dry_run:
+        db.session.rollback()
+        click.echo(f"Dry run: {result['imported']} entries would be imported, {result['error_count']} rows rejected")
+    else:
+        db.session.commit()
+        click.echo(f"Imported {result['imported']} entries, {result['error_count']} rows rejected")
+
+
+@app.cli.command('batch-invoice')
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), help='First day of the billing period [default: first day of last month].')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day of the billing period [default: last day of last month].')
+@click.option('--date-issued', type=click.DateTime(formats=['%Y-%m-%d']), help='Issue date of the invoices [default: today].')
+@click.option('--batch-size', type=int, default=BATCH_CLIENTS_PER_TRANSACTION, show_default=True,
+              help='Invoices committed per transaction.')
+@click.option('--dry-run', is_flag=True, help='Show what would be invoiced without creating anything.')
+def batch_invoice_command(start_date, end_date, date_issued, batch_size, dry_run):
+    """Create one invoice per client for the unbilled entries of a billing period.
+
+    Safe to run again after an interruption: only entries that are still
+    unbilled are invoiced.
+    """
+    default_start, default_end = previous_month(date.today())
+    period_start = start_date.date() if start_date else default_start
+    period_end = end_date.date() if end_date else default_end
+    issued = date_issued.date() if date_issued else date.today()
+
+    company = CompanySettings.query.first()
+    hst_rate = company.default_hst_rate if company else 0.13  # Default to 13% if not set
+
+    if dry_run:
+        totals = unbilled_period_totals(period_start, period_end)
+        for row in totals:
+            click.echo(f"{row.client_name}: {row.entry_count} entries, {row.hours:.2f} h, "
+                       f"subtotal ${row.subtotal:.2f}, total ${row.subtotal * (1 + hst_rate):.2f}")
+        grand_total = sum(row.subtotal for row in totals) * (1 + hst_rate)
+        click.echo(f"Dry run: {len(totals)} invoices totalling ${grand_total:.2f} for {period_start} to {period_end}")
+        return
+
+    def progress(done, total, invoice):
+        click.echo(f"[{done}/{total}] {invoice['invoice_number']} {invoice['client']}: "
+                   f"{invoice['entries']} entries, ${invoice['total']:.2f}")
+
+    try:
+        created = invoice_billing_period(period_start, period_end, issued, issued + timedelta(days=30), hst_rate,
+                                         clients_per_transaction=batch_size, progress=progress)
+    except BatchInvoicingError as error:
+        raise click.ClickException(f"{error}. {len(error.committed)} invoices were committed before the error "
+                                   f"and kept, the rest were rolled back; run the batch again to finish.")
+    click.echo(f"Created {len(created)} invoices totalling ${sum(invoice['total'] for invoice in created):.2f}")
@@ -0,0 +1,19 @@
+# Gunicorn settings for running several workers against the SQLite database.
+# See PERFORMANCE.md for the reasoning behind each setting.
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+
+# Load the app (and run db.create_all) once in the master instead of racing
+# in every worker on first boot.
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Connections opened in the master before forking must never be shared
+    # with the workers; drop them from the pool without closing them.
+    from app import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -1,6 +1,9 @@
 from app import app, db
 import models
 from models import Client, HourlyRate
+from money import Cents, line_amount, to_cents
+from rollup import rebuild_rollup
+from search import SEARCH_TABLE, create_search_index
 import sqlite3
 import os
 import inspect
@@ -20,13 +23,18 @@ def get_expected_tables():
     for model_class in model_classes:
         table_name = model_class.__tablename__
         expected_tables[table_name] = {
-            'columns': {}
+            'columns': {},
+            'indexes': {}
         }
         
+        # Get index info
+        for index in model_class.__table__.indexes:
+            expected_tables[table_name]['indexes'][index.name] = index
+        
         # Get column info
         for column_name, column in model_class.__table__.columns.items():
             column_type = str(column.type)
-            nullable = not column.nullable
+            nullable = column.nullable
             primary_key = column.primary_key
             foreign_key = None
             
@@ -54,7 +62,9 @@ def get_actual_tables(db_path):
     cursor = conn.cursor()
     
     # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    # The full-text search index and its shadow tables are maintained by search.py, not the models
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+                   f"AND name NOT LIKE '{SEARCH_TABLE}%'")
     tables = cursor.fetchall()
     
     actual_tables = {}
@@ -62,9 +72,15 @@ def get_actual_tables(db_path):
     for table in tables:
         table_name = table[0]
         actual_tables[table_name] = {
-            'columns': {}
+            'columns': {},
+            'indexes': set()
         }
         
+        # Get index names for this table
+        cursor.execute(f"PRAGMA index_list({table_name})")
+        for index in cursor.fetchall():
+            actual_tables[table_name]['indexes'].add(index[1])
+        
         # Get column info for this table
         cursor.execute(f"PRAGMA table_info({table_name})")
         columns = cursor.fetchall()
@@ -83,7 +99,7 @@ def get_actual_tables(db_path):
             
             actual_tables[table_name]['columns'][name] = {
                 'type': type_,
-                'nullable': notnull == 1,
+                'nullable': notnull == 0,
                 'primary_key': pk == 1,
                 'foreign_key': foreign_key
             }
@@ -125,6 +141,12 @@ def validate_schema(db_path):
             extra_columns = set(actual_columns.keys()) - set(expected_columns.keys())
             if extra_columns:
                 print(f"Table '{table_name}' has extra columns: {', '.join(extra_columns)}")
+            
+            # Check for missing indexes
+            missing_indexes = set(expected_tables[table_name]['indexes'].keys()) - actual_tables[table_name]['indexes']
+            if missing_indexes:
+                issues_found = True
+                print(f"Table '{table_name}' is missing indexes: {', '.join(missing_indexes)}")
         
         if not issues_found:
             print(f"Database schema for {db_path} is valid!")
@@ -134,7 +156,7 @@ def validate_schema(db_path):
             return False
 
 def fix_schema(db_path):
-    """Fix the database schema by creating missing tables and columns"""
+    """Fix the database schema by creating missing tables, columns and indexes"""
     with app.app_context():
         print(f"Fixing schema for {db_path}...")
         
@@ -169,9 +191,59 @@ def fix_schema(db_path):
         conn.commit()
         conn.close()
         
+        # Create any indexes declared on the models that the database lacks
+        actual_tables = get_actual_tables(db_path)
+        for table_name in set(expected_tables.keys()) & set(actual_tables.keys()):
+            expected_indexes = expected_tables[table_name]['indexes']
+            missing_indexes = set(expected_indexes.keys()) - actual_tables[table_name]['indexes']
+            for index_name in missing_indexes:
+                print(f"Adding missing index '{index_name}' to table '{table_name}'")
+                try:
+                    expected_indexes[index_name].create(db.engine, checkfirst=True)
+                except Exception as e:
+                    print(f"Error adding index: {e}")
+        
         # Validate again to confirm fixes
         return validate_schema(db_path)
 
+def migrate_money_to_cents(db_path):
+    """Convert money columns stored as REAL dollars to INTEGER cents and fill in time entry amounts"""
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    money_columns = [(table.name, column.name) for table in db.metadata.sorted_tables
+                     for column in table.columns if isinstance(column.type, Cents)]
+    for table_name, column_name in money_columns:
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        columns = {column[1]: column for column in cursor.fetchall()}
+        if column_name not in columns or columns[column_name][2].upper() == 'INTEGER':
+            continue
+
+        # SQLite cannot change a column's type, so the cents go into a new column that replaces it
+        print(f"Converting '{table_name}.{column_name}' from dollars to cents")
+        not_null = "NOT NULL DEFAULT 0" if columns[column_name][3] else ""
+        cursor.execute(f"ALTER TABLE {table_name} RENAME COLUMN {column_name} TO {column_name}_dollars")
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} INTEGER {not_null}")
+        cursor.execute(f"UPDATE {table_name} SET {column_name} = CAST(ROUND({column_name}_dollars * 100) AS INTEGER)")
+        cursor.execute(f"ALTER TABLE {table_name} DROP COLUMN {column_name}_dollars")
+
+    cursor.execute("PRAGMA table_info(time_entry)")
+    if 'amount' not in {column[1] for column in cursor.fetchall()}:
+        # Rounded exactly as new entries are, not with SQLite's floating point ROUND
+        print("Adding stored amounts to time entries")
+        cursor.execute("ALTER TABLE time_entry ADD COLUMN amount INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("SELECT id, total_hours, hourly_rate FROM time_entry")
+        cursor.executemany("UPDATE time_entry SET amount = ? WHERE id = ?", [
+            (to_cents(line_amount(total_hours, hourly_rate / 100)), entry_id)
+            for entry_id, total_hours, hourly_rate in cursor.fetchall()
+        ])
+
+    conn.commit()
+    conn.close()
+
 def migrate_hourly_rates():
     """Migrate existing client hourly rates to the hourly_rate table"""
     with app.app_context():
@@ -201,21 +273,36 @@ def migrate_hourly_rates():
 
 def migrate_database():
     with app.app_context():
-        # Get the database path
-        db_path = os.path.join('instance', 'timetracker.db')
+        # Get the database path, which Flask-SQLAlchemy resolves against the instance folder
+        db_path = db.engine.url.database
         
+        # Money columns used to be REAL dollars
+        migrate_money_to_cents(db_path)
+
         # Validate the schema
         print(f"Validating schema for {db_path}...")
         schema_valid = validate_schema(db_path)
         
         if not schema_valid:
             print("Schema issues found. Fixing...")
-            fix_schema(db_path)
-        
+            if not fix_schema(db_path):
+                print("Database migration failed: the schema issues above could not be fixed")
+                return False
+
         # Migrate hourly rates if needed
         migrate_hourly_rates()
         
+        # Add the full-text search index and its triggers, indexing the existing rows
+        create_search_index(db.session.connection())
+
+        # Rebuild the daily rollup so it matches the existing time entries
+        rows = rebuild_rollup(db.session.connection())
+        db.session.commit()
+        print(f"Rebuilt daily rollup: {rows} rows")
+        
         print("Database migration and validation completed successfully!")
+        return True
 
 if __name__ == "__main__":
-    migrate_database()
+    if not migrate_database():
+        sys.exit(1)
@@ -1,5 +1,7 @@
 from app import db
+from money import Cents, line_amount
 from datetime import datetime, timedelta
+from sqlalchemy import event
 from enum import Enum
 
 class TaskStatus(Enum):
@@ -19,11 +21,15 @@ class HourlyRate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)  # Name/description of the rate
-    rate = db.Column(db.Float, nullable=False)
+    rate = db.Column(Cents, nullable=False)
     is_default = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_hourly_rate_client_default', 'client_id', 'is_default'),
+    )
+
     def __repr__(self):
         return f'<HourlyRate {self.name}: ${self.rate} for client {self.client_id}>'
 
@@ -37,7 +43,7 @@ class Client(db.Model):
     phone = db.Column(db.String(20), nullable=True)
     email = db.Column(db.String(100), nullable=True)
     contact_person = db.Column(db.String(100), nullable=True)
-    hourly_rate = db.Column(db.Float, nullable=False, default=0.0)  # Kept for backward compatibility
+    hourly_rate = db.Column(Cents, nullable=False, default=0.0)  # Kept for backward compatibility
     time_entries = db.relationship('TimeEntry', backref='client', lazy=True, cascade="all, delete-orphan")
     invoices = db.relationship('Invoice', backref='client', lazy=True, cascade="all, delete-orphan")
     hourly_rates = db.relationship('HourlyRate', backref='client', lazy=True, cascade="all, delete-orphan")
@@ -67,32 +73,62 @@ class TimeEntry(db.Model):
     time_in = db.Column(db.Time, nullable=False)
     time_out = db.Column(db.Time, nullable=False)
     total_hours = db.Column(db.Float, nullable=False)  # Stored for quick access
-    hourly_rate = db.Column(db.Float, nullable=False)  # Store the rate at the time of entry
+    hourly_rate = db.Column(Cents, nullable=False)  # Store the rate at the time of entry
+    amount = db.Column(Cents, nullable=False, default=0.0)  # total_hours * hourly_rate, kept in sync on flush
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=True)
     quote_id = db.Column(db.Integer, db.ForeignKey('quote.id'), nullable=True)  # Link to a quote if applicable
+    idempotency_key = db.Column(db.String(64), nullable=True)  # Client-chosen key of entries saved through the batch API
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Listing order and keyset pagination cursor
+        db.Index('ix_time_entry_date_time_in_id', 'date', 'time_in', 'id'),
+        # Per-client reports over a date range
+        db.Index('ix_time_entry_client_date', 'client_id', 'date'),
+        # Unbilled entries per client ordered by date (invoice creation, dashboard)
+        db.Index('ix_time_entry_unbilled_client_date', 'client_id', 'date',
+                 sqlite_where=db.text('invoice_id IS NULL'),
+                 postgresql_where=db.text('invoice_id IS NULL')),
+        db.Index('ix_time_entry_invoice_id', 'invoice_id'),
+        db.Index('ix_time_entry_quote_id', 'quote_id'),
+        db.Index('ix_time_entry_task_id', 'task_id'),
+        # A retried batch API submission finds the entries it already saved (NULLs never collide)
+        db.Index('ix_time_entry_idempotency_key', 'idempotency_key', unique=True),
+    )
+
     def __repr__(self):
         return f'<TimeEntry {self.id}: {self.item} for {self.client_id} on {self.date}>'
 
 
+@event.listens_for(TimeEntry, 'before_insert')
+@event.listens_for(TimeEntry, 'before_update')
+def set_line_amount(mapper, connection, entry):
+    # The stored amount is what every money aggregate sums, so it follows hours and rate on every write
+    entry.amount = line_amount(entry.total_hours, entry.hourly_rate)
+
+
 class Invoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(20), nullable=False, unique=True)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     date_issued = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
     date_due = db.Column(db.Date, nullable=True)
-    subtotal = db.Column(db.Float, nullable=False, default=0.0)
+    subtotal = db.Column(Cents, nullable=False, default=0.0)
     hst_rate = db.Column(db.Float, nullable=False, default=0.13)  # 13% is typical HST rate
-    hst_amount = db.Column(db.Float, nullable=False, default=0.0)
-    total = db.Column(db.Float, nullable=False, default=0.0)
+    hst_amount = db.Column(Cents, nullable=False, default=0.0)
+    total = db.Column(Cents, nullable=False, default=0.0)
     status = db.Column(db.String(20), nullable=False, default='draft')  # draft, sent, paid
     notes = db.Column(db.Text, nullable=True)
     time_entries = db.relationship('TimeEntry', backref='invoice', lazy=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_invoice_client_id', 'client_id'),
+        db.Index('ix_invoice_date_issued', 'date_issued'),
+    )
+
     def __repr__(self):
         return f'<Invoice {self.invoice_number} for {self.client_id}>'
 
@@ -113,6 +149,15 @@ class Task(db.Model):
     client = db.relationship('Client', backref=db.backref('tasks', lazy=True, cascade="all, delete-orphan"))
     time_entries = db.relationship('TimeEntry', backref='task', lazy=True)
 
+    __table_args__ = (
+        # Status/priority filters ordered by priority and due date
+        db.Index('ix_task_status_priority_due_date', 'status', 'priority', 'due_date'),
+        # The default task board: open tasks in board order, however many archived tasks pile up
+        db.Index('ix_task_open_priority_due_date', db.text('priority DESC'), 'due_date', 'id',
+                 sqlite_where=db.text("status != 'archived'")),
+        db.Index('ix_task_client_id', 'client_id'),
+    )
+
     def __repr__(self):
         return f'<Task {self.id}: {self.title}>'
 
@@ -123,10 +168,10 @@ class Quote(db.Model):
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     date_issued = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
     date_valid_until = db.Column(db.Date, nullable=True)
-    subtotal = db.Column(db.Float, nullable=False, default=0.0)
+    subtotal = db.Column(Cents, nullable=False, default=0.0)
     hst_rate = db.Column(db.Float, nullable=False, default=0.13)  # 13% is typical HST rate
-    hst_amount = db.Column(db.Float, nullable=False, default=0.0)
-    total = db.Column(db.Float, nullable=False, default=0.0)
+    hst_amount = db.Column(Cents, nullable=False, default=0.0)
+    total = db.Column(Cents, nullable=False, default=0.0)
     status = db.Column(db.String(20), nullable=False, default=QuoteStatus.PENDING.value)
     notes = db.Column(db.Text, nullable=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=True)  # Link to invoice if converted
@@ -139,38 +184,21 @@ class Quote(db.Model):
     # Add relationship to invoice if converted
     invoice = db.relationship('Invoice', backref=db.backref('quote', uselist=False), lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_quote_client_id', 'client_id'),
+        db.Index('ix_quote_date_issued', 'date_issued'),
+    )
+
     def __repr__(self):
         return f'<Quote {self.quote_number} for {self.client_id}>'
     
     def convert_to_invoice(self):
         """Convert this quote to an invoice"""
         from app import db
-        
-        # Create a new invoice based on this quote
-        invoice = Invoice(
-            invoice_number=self.quote_number.replace('QUO-', 'INV-'),
-            client_id=self.client_id,
-            date_issued=datetime.utcnow().date(),
-            date_due=datetime.utcnow().date() + timedelta(days=30),
-            subtotal=self.subtotal,
-            hst_rate=self.hst_rate,
-            hst_amount=self.hst_amount,
-            total=self.total,
-            status='draft',
-            notes=self.notes
-        )
-        
-        db.session.add(invoice)
-        db.session.flush()  # Get the invoice ID
-        
-        # Link the quote to the invoice
-        self.invoice_id = invoice.id
-        self.status = QuoteStatus.INVOICED.value
-        
-        # Link the time entries to the invoice
-        for entry in self.time_entries:
-            entry.invoice_id = invoice.id
-            
+        from billing import convert_quote_to_invoice
+
+        today = datetime.utcnow().date()
+        invoice = convert_quote_to_invoice(self, date_issued=today, date_due=today + timedelta(days=30))
         db.session.commit()
         return invoice
 
@@ -210,5 +238,53 @@ class CalendarEvent(db.Model):
     client = db.relationship('Client', backref=db.backref('calendar_events', lazy=True, cascade="all, delete-orphan"))
     task = db.relationship('Task', backref=db.backref('calendar_events', lazy=True))
 
+    __table_args__ = (
+        # Visible calendar window lookups (end_time > window start AND start_time < window end).
+        # Leading with end_time means the scan only covers the window and later events.
+        db.Index('ix_calendar_event_end_start', 'end_time', 'start_time'),
+        db.Index('ix_calendar_event_client_id', 'client_id'),
+    )
+
     def __repr__(self):
         return f'<CalendarEvent {self.id}: {self.title}>'
+
+
+class DailyRollup(db.Model):
+    """Time entry totals per client, task and day, kept up to date by rollup.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
+    task_id = db.Column(db.Integer, nullable=False, default=0)  # 0 for entries without a task
+    day = db.Column(db.Date, nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    hours = db.Column(db.Float, nullable=False, default=0.0)
+    unbilled_hours = db.Column(db.Float, nullable=False, default=0.0)
+    billed_amount = db.Column(Cents, nullable=False, default=0.0)
+    unbilled_amount = db.Column(Cents, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'task_id', 'day', name='uq_daily_rollup_client_task_day'),
+        db.Index('ix_daily_rollup_day', 'day'),
+        # Covers the per-task sums of task_progress.py, read in task order without visiting the table
+        db.Index('ix_daily_rollup_task_hours', 'task_id', 'hours', 'billed_amount', 'unbilled_amount'),
+    )
+
+    def __repr__(self):
+        return f'<DailyRollup {self.day} client {self.client_id} task {self.task_id}>'
+
+
+class DataVersion(db.Model):
+    """Write counter per table, bumped by cache.py whenever rows of that table change"""
+    name = db.Column(db.String(50), primary_key=True)  # table name
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}: {self.version}>'
+
+
+class DocumentCounter(db.Model):
+    """Last number handed out per document kind, incremented atomically by numbering.py"""
+    name = db.Column(db.String(20), primary_key=True)  # 'invoice' or 'quote'
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DocumentCounter {self.name}: {self.value}>'
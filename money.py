@@ -0,0 +1,49 @@
+"""Money stored as whole cents.
+
+Amounts are INTEGER columns holding cents, so SUMs over them are exact
+integer additions in SQL. Python code and templates keep working in dollars:
+the Cents column type converts dollars to cents when binding and back when
+loading, and that includes aggregates such as func.sum(TimeEntry.amount).
+Amounts are rounded to the cent, half a cent up.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from sqlalchemy.sql import operators
+
+from app import db
+
+
+def to_cents(amount):
+    """Whole cents of a dollar amount, rounding half a cent up"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def round_to_cent(amount):
+    """A dollar amount rounded to the cent"""
+    return to_cents(amount) / 100
+
+
+# The same hours and rates come up over and over, e.g. in a large import
+@lru_cache(maxsize=4096)
+def line_amount(hours, rate):
+    """Amount of a time entry: hours at an hourly rate, rounded to the cent"""
+    return round_to_cent(Decimal(str(hours)) * Decimal(str(rate)))
+
+
+class Cents(db.TypeDecorator):
+    """Dollar amount stored as an INTEGER number of cents"""
+    impl = db.Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else value / 100
+
+    def coerce_compared_value(self, op, value):
+        # Amounts that are compared, added or subtracted are dollars; factors like amount * hst_rate are not
+        if op in (operators.mul, operators.truediv, operators.floordiv, operators.mod):
+            return db.Float()
+        return self
@@ -0,0 +1,78 @@
+"""Invoice and quote numbers allocated from a counter table.
+
+next_document_number() increments the kind's row in document_counter and
+reads the new value back in a single UPDATE ... RETURNING, inside the
+caller's transaction. The row stays locked until that transaction ends, so
+concurrent workers queue for it instead of computing the same number, and a
+rolled back create rolls its increment back too, so numbers have no gaps.
+
+The counter for a kind is created the first time a number is needed,
+starting after the highest number already issued with the current prefix.
+"""
+import re
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models import DocumentCounter, Invoice, Quote
+
+# The column holding the issued numbers of each kind
+NUMBER_COLUMNS = {
+    'invoice': Invoice.invoice_number,
+    'quote': Quote.quote_number,
+}
+
+
+def format_document_number(kind, value):
+    """Format a counter value with the kind's configured prefix and padding"""
+    number_format = app.config["DOCUMENT_NUMBER_FORMATS"][kind]
+    return f"{number_format['prefix']}{value:0{number_format['padding']}d}"
+
+
+def highest_issued_number(kind):
+    """Largest counter value among the numbers already issued with the current prefix"""
+    prefix = app.config["DOCUMENT_NUMBER_FORMATS"][kind]['prefix']
+    column = NUMBER_COLUMNS[kind]
+    suffix = re.compile(rf"{re.escape(prefix)}(\d+)")
+
+    highest = 0
+    for (number,) in db.session.execute(select(column).where(column.startswith(prefix, autoescape=True))):
+        match = suffix.fullmatch(number)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def next_document_number(kind):
+    """Allocate the next invoice or quote number in the current transaction"""
+    connection = db.session.connection()
+    increment = update(DocumentCounter).where(DocumentCounter.name == kind).values(
+        value=DocumentCounter.value + 1).returning(DocumentCounter.value)
+
+    value = connection.execute(increment).scalar()
+    if value is None:
+        # First number of this kind: start after the numbers issued before the counter existed
+        value = highest_issued_number(kind) + 1
+        try:
+            with db.session.begin_nested():
+                db.session.connection().execute(insert(DocumentCounter).values(name=kind, value=value))
+        except IntegrityError:
+            # Another worker created the counter first
+            value = connection.execute(increment).scalar()
+
+    return format_document_number(kind, value)
+
+
+def release_document_number(kind, number):
+    """Give back the number last allocated in the current transaction, for a document that was not created.
+
+    The transaction still holds the counter, so no later number can have
+    been allocated; a number that is not the counter's current value is kept.
+    """
+    prefix = app.config["DOCUMENT_NUMBER_FORMATS"][kind]['prefix']
+    match = re.fullmatch(rf"{re.escape(prefix)}(\d+)", number)
+    if match:
+        db.session.connection().execute(
+            update(DocumentCounter).where(DocumentCounter.name == kind, DocumentCounter.value == int(match.group(1)))
+            .values(value=DocumentCounter.value - 1))
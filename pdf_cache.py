@@ -0,0 +1,94 @@
+"""On-disk cache of rendered invoice and quote PDFs.
+
+Each PDF is stored under instance/pdf_cache, named by a SHA-256 hash of
+everything that ends up in the document: the invoice or quote row, its client,
+the company settings, its time entries, the logo and the PDF layout version.
+Any change produces a new hash, so entries never need invalidating; old ones
+are evicted least recently used first once the cache grows past its size limit.
+The hash doubles as the ETag of the download response.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from app import app
+from utils import PDF_LOGO_PATH
+
+PDF_CACHE_DIR = os.path.join(app.instance_path, 'pdf_cache')
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# Bump when the PDF layout in utils.py changes so stale renders are not reused
+PDF_LAYOUT_VERSION = 3
+
+def _row_values(obj):
+    """Column values of a model instance, in a JSON friendly form"""
+    return [str(getattr(obj, column.key)) for column in obj.__table__.columns]
+
+
+def document_fingerprint(kind, document, company):
+    """Hash of all the data rendered into an invoice or quote PDF"""
+    logo_stat = os.stat(PDF_LOGO_PATH) if os.path.exists(PDF_LOGO_PATH) else None
+    payload = {
+        'kind': kind,
+        'layout': PDF_LAYOUT_VERSION,
+        'document': _row_values(document),
+        'client': _row_values(document.client),
+        'company': _row_values(company),
+        'entries': [_row_values(entry) for entry in document.time_entries],
+        'logo': [logo_stat.st_size, logo_stat.st_mtime_ns] if logo_stat else None,
+    }
+    return hashlib.sha256(json.dumps(payload).encode('utf-8')).hexdigest()
+
+
+def evict_pdf_cache(max_bytes=PDF_CACHE_MAX_BYTES, keep=None):
+    """Delete least recently used PDFs, other than keep, until the cache fits in max_bytes"""
+    if not os.path.isdir(PDF_CACHE_DIR):
+        return
+
+    files = []
+    for entry in os.scandir(PDF_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith('.pdf'):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another worker evicted it first
+        total -= size
+
+
+def cached_pdf(kind, document, company, render):
+    """Return (path, etag) of the PDF for a document, rendering it only on a cache miss.
+
+    render(document, company, output) writes the PDF to the file object output.
+    """
+    etag = document_fingerprint(kind, document, company)
+    path = os.path.join(PDF_CACHE_DIR, f"{kind}-{etag}.pdf")
+
+    if os.path.exists(path):
+        # Mark as recently used for eviction
+        os.utime(path)
+        return path, etag
+
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+
+    # Render into a temporary file first so other workers never see a partial PDF
+    fd, tmp_path = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            render(document, company, tmp_file)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+    evict_pdf_cache(keep=path)
+    return path, etag
@@ -0,0 +1,74 @@
+"""Directory of clients and their hourly rates for the time entry forms.
+
+Every client with all of its rates and its default rate is loaded with one
+outer-joined query and kept in a VersionedCache, so rendering a client picker
+or resolving the rate of a new time entry costs a single version check until
+a client or rate is written.
+"""
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from app import db
+from cache import VersionedCache
+from models import Client, HourlyRate
+
+ClientRates = namedtuple('ClientRates', ['id', 'name', 'default_rate', 'rates'])
+Rate = namedtuple('Rate', ['id', 'name', 'rate'])
+
+rate_directory_cache = VersionedCache('rate_directory', [Client.__tablename__, HourlyRate.__tablename__], maxsize=1)
+
+
+class RateDirectory:
+    """Clients in name order, each with its rates in the order they were added"""
+
+    def __init__(self, clients):
+        self.clients = clients
+        self._by_id = {client.id: client for client in clients}
+
+    def __contains__(self, client_id):
+        return client_id in self._by_id
+
+    def client(self, client_id):
+        return self._by_id.get(client_id)
+
+    def resolve_rate(self, client_id, rate_id, submitted_rate):
+        """Hourly rate for a new entry: the chosen rate if it belongs to the client, else the submitted one"""
+        if rate_id and rate_id != 'default':
+            client = self._by_id.get(client_id)
+            for rate in client.rates if client else ():
+                if str(rate.id) == str(rate_id):
+                    return rate.rate
+        return submitted_rate
+
+
+def load_rate_directory():
+    rows = db.session.execute(
+        select(Client.id, Client.name, Client.hourly_rate, HourlyRate.id, HourlyRate.name, HourlyRate.rate,
+               HourlyRate.is_default)
+        .outerjoin(HourlyRate, HourlyRate.client_id == Client.id)
+        .order_by(Client.name, Client.id, HourlyRate.id)
+    )
+
+    clients = []
+    for client_id, name, legacy_rate, rate_id, rate_name, rate, is_default in rows:
+        if not clients or clients[-1]['id'] != client_id:
+            # Without a rate marked as default, the legacy hourly_rate field is the default
+            clients.append({'id': client_id, 'name': name, 'default_rate': legacy_rate, 'rates': [], 'has_default': False})
+        client = clients[-1]
+        if rate_id is None:
+            continue
+        client['rates'].append(Rate(rate_id, rate_name, rate))
+        if is_default and not client['has_default']:
+            client['default_rate'] = rate
+            client['has_default'] = True
+
+    return RateDirectory([
+        ClientRates(client['id'], client['name'], client['default_rate'], tuple(client['rates']))
+        for client in clients
+    ])
+
+
+def rate_directory():
+    """The current rate directory, shared by the requests of this process"""
+    return rate_directory_cache.get(load_rate_directory)
@@ -0,0 +1,206 @@
+"""Pivot reports over time entries, grouped in SQL.
+
+A report groups the time entries of a date range by any combination of
+dimensions (client, task, location, rate and a day, week, month or quarter
+bucket) and returns one compact tuple per group: the dimension values
+followed by the entry count, hours and amount. The grouping is a single
+GROUP BY, so no TimeEntry objects are loaded however many entries a report
+covers. Reports whose dimensions all exist in the daily rollup (client, task
+and the time buckets) are grouped from the rollup, which has one row per
+client, task and day instead of one per entry.
+
+Dimensions are entries of DIMENSIONS. A dimension's columns function gets
+the ReportSource being grouped and returns the value it shows, the
+expressions to group by and the joins it needs.
+
+cached_report() keeps results in an LRU cache keyed by the normalized report
+parameters. Reports of the current month are reused until a time entry,
+client or task is written or REPORT_CACHE_TTL runs out. Reports of closed
+periods, which end before the current month, watch the closed_period data
+version instead of time_entry, so they stay cached until an entry in a closed
+period actually changes.
+"""
+import os
+from collections import namedtuple
+
+from sqlalchemy import Integer, cast, func, select
+
+from app import db
+from cache import VersionedCache
+from models import Client, DailyRollup, Task, TimeEntry
+from rollup import CLOSED_PERIOD_VERSION, open_period_start
+
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 256))
+
+# Seconds a report of the current month is reused for at most
+REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 300))
+
+# Where a report is grouped from: the table with its key columns and the SQL aggregates of the measures
+ReportSource = namedtuple('ReportSource', ['table', 'client_id', 'task_id', 'date', 'entries', 'hours', 'amount'])
+
+ENTRY_SOURCE = ReportSource(
+    TimeEntry, TimeEntry.client_id, TimeEntry.task_id, TimeEntry.date,
+    func.count(TimeEntry.id), func.sum(TimeEntry.total_hours), func.sum(TimeEntry.amount))
+
+# The rollup's task_id is 0 for entries without a task, which joins to no task just like NULL
+ROLLUP_SOURCE = ReportSource(
+    DailyRollup, DailyRollup.client_id, DailyRollup.task_id, DailyRollup.day,
+    func.sum(DailyRollup.entry_count), func.sum(DailyRollup.hours),
+    func.sum(DailyRollup.billed_amount + DailyRollup.unbilled_amount))
+
+# columns(source) returns (value, group_by expressions, joins as (entity, onclause) outer joins)
+Dimension = namedtuple('Dimension', ['label', 'columns', 'rollup'])
+
+DimensionColumns = namedtuple('DimensionColumns', ['value', 'group_by', 'joins'])
+
+MEASURES = ['entries', 'hours', 'amount']
+
+Report = namedtuple('Report', ['dimensions', 'columns', 'rows', 'totals'])
+
+
+def _client(source):
+    return DimensionColumns(Client.name, [source.client_id, Client.name], [(Client, Client.id == source.client_id)])
+
+
+def _task(source):
+    return DimensionColumns(func.coalesce(Task.title, 'No task'), [source.task_id, Task.title],
+                            [(Task, Task.id == source.task_id)])
+
+
+def _entry_column(column):
+    def columns(source):
+        return DimensionColumns(column, [column], [])
+    return columns
+
+
+def _time_bucket(bucket):
+    """Dimension columns for a time bucket, labelled with SQLite date functions so the labels sort in time order"""
+    def columns(source):
+        value = bucket(source.date)
+        return DimensionColumns(value, [value], [])
+    return columns
+
+
+def _quarter(day):
+    month = cast(func.strftime('%m', day), Integer)
+    return func.printf('%s-Q%d', func.strftime('%Y', day), (month + 2) // 3)
+
+
+DIMENSIONS = {
+    'client': Dimension('Client', _client, rollup=True),
+    'task': Dimension('Task', _task, rollup=True),
+    'location': Dimension('Location', _entry_column(TimeEntry.location), rollup=False),
+    'rate': Dimension('Rate', _entry_column(TimeEntry.hourly_rate), rollup=False),
+    # Buckets are labelled 2025-01-31, 2025-01-27 (the Monday starting the week), 2025-01 and 2025-Q1
+    'day': Dimension('Day', _time_bucket(lambda day: func.strftime('%Y-%m-%d', day)), rollup=True),
+    'week': Dimension('Week', _time_bucket(lambda day: func.date(day, '-6 days', 'weekday 1')), rollup=True),
+    'month': Dimension('Month', _time_bucket(lambda day: func.strftime('%Y-%m', day)), rollup=True),
+    'quarter': Dimension('Quarter', _time_bucket(_quarter), rollup=True),
+}
+
+def parse_dimensions(names):
+    """List of dimension names from a comma-separated string or a list, raising ValueError for unknown names"""
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    names = list(names)
+    for name in names:
+        if name not in DIMENSIONS:
+            raise ValueError(f"Unknown report dimension {name!r}, expected one of: {', '.join(DIMENSIONS)}")
+    if len(set(names)) != len(names):
+        raise ValueError('Each report dimension can only be used once')
+    return names
+
+
+def report_query(dimensions, start_date, end_date, client_id=None, task_id=None):
+    """The GROUP BY select of a report, choosing the rollup when it has every dimension"""
+    use_rollup = all(DIMENSIONS[name].rollup for name in dimensions)
+    source = ROLLUP_SOURCE if use_rollup else ENTRY_SOURCE
+
+    columns = [DIMENSIONS[name].columns(source) for name in dimensions]
+    query = select(*(column.value for column in columns), source.entries, source.hours, source.amount)
+    query = query.select_from(source.table)
+    for column in columns:
+        for entity, onclause in column.joins:
+            query = query.outerjoin(entity, onclause)
+
+    query = query.where(source.date >= start_date, source.date <= end_date)
+    if client_id:
+        query = query.where(source.client_id == client_id)
+    if task_id:
+        query = query.where(source.task_id == task_id)
+
+    group_by = [expression for column in columns for expression in column.group_by]
+    if group_by:
+        values = [column.value for column in columns]
+        # Ids break ties between clients or tasks of the same name
+        query = query.group_by(*group_by).order_by(
+            *values, *(expression for expression in group_by if not any(expression is value for value in values)))
+    return query
+
+
+def run_report(dimensions, start_date, end_date, client_id=None, task_id=None):
+    """Group the entries between start_date and end_date (inclusive) by the named dimensions.
+
+    Returns a Report whose rows are tuples of the dimension values followed by
+    the entry count, hours and amount, in dimension order, and whose totals
+    are the entry count, hours and amount over all rows.
+    """
+    dimensions = parse_dimensions(dimensions)
+    rows = []
+    for row in db.session.execute(report_query(dimensions, start_date, end_date, client_id, task_id)):
+        *values, entries, hours, amount = row
+        if entries:
+            rows.append((*values, entries, round(hours or 0, 2), amount or 0))
+
+    totals = (sum(row[-3] for row in rows), round(sum(row[-2] for row in rows), 2),
+              round(sum(row[-1] for row in rows), 2))
+    return Report(dimensions, [*dimensions, *MEASURES], rows, totals)
+
+
+report_cache = VersionedCache(
+    'reports', [TimeEntry.__tablename__, Client.__tablename__, Task.__tablename__],
+    maxsize=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL)
+
+closed_report_cache = VersionedCache(
+    'closed_period_reports', [CLOSED_PERIOD_VERSION, Client.__tablename__, Task.__tablename__],
+    maxsize=REPORT_CACHE_SIZE)
+
+
+def cached_report(dimensions, start_date, end_date, client_id=None, task_id=None):
+    """run_report() through the report caches, see above"""
+    dimensions = tuple(parse_dimensions(dimensions))
+    key = (dimensions, start_date, end_date, client_id or None, task_id or None)
+    cache = closed_report_cache if end_date < open_period_start() else report_cache
+    return cache.get(lambda: run_report(*key), key=key)
+
+
+def pivot(report, measure='hours'):
+    """Spread a report over its last dimension: (column keys, [(row key, cells, row total)], column totals).
+
+    The row key is the tuple of the other dimension values and cells has one
+    value of the measure per column key, None where there were no entries.
+    """
+    index = len(report.dimensions) + MEASURES.index(measure)
+    column_keys = sorted({row[len(report.dimensions) - 1] for row in report.rows}, key=_sort_key)
+    positions = {key: position for position, key in enumerate(column_keys)}
+
+    pivot_rows = []
+    by_key = {}
+    for row in report.rows:
+        row_key = row[:len(report.dimensions) - 1]
+        if row_key not in by_key:
+            by_key[row_key] = [None] * len(column_keys)
+            pivot_rows.append((row_key, by_key[row_key]))
+        cells = by_key[row_key]
+        position = positions[row[len(report.dimensions) - 1]]
+        cells[position] = (cells[position] or 0) + row[index]
+
+    column_totals = [round(sum(cells[position] or 0 for _, cells in pivot_rows), 2)
+                     for position in range(len(column_keys))]
+    return column_keys, [(row_key, cells, round(sum(cell or 0 for cell in cells), 2))
+                         for row_key, cells in pivot_rows], column_totals
+
+
+def _sort_key(value):
+    # Entries without a location sort first, like NULLs do in SQLite
+    return (value is not None, value)
@@ -0,0 +1,137 @@
+"""Incremental maintenance of the DailyRollup table.
+
+Every flush that touches time entries records the (client, day) pairs it
+affects, and the rollup rows for those days are recomputed from time_entry on
+the same connection right after the flush, so they commit or roll back
+together with the entries. Code that changes time_entry with bulk Core
+statements bypasses the ORM events and must call refresh_rollup() itself.
+Refreshing a day before the current month also bumps the closed_period data
+version, which caches of closed periods watch instead of time_entry.
+"""
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import case, delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from cache import mark_tables_changed
+from models import Client, DailyRollup, Invoice, Task, TimeEntry
+
+# Recompute at most this many days of one client per statement
+REFRESH_CHUNK_SIZE = 200
+
+_PENDING_KEY = 'rollup_days'
+
+# Data version bumped whenever entries dated before open_period_start() change
+CLOSED_PERIOD_VERSION = 'closed_period'
+
+
+def open_period_start():
+    """First day of the current month; entries dated before it belong to closed periods"""
+    return date.today().replace(day=1)
+
+
+def _rollup_select():
+    """SELECT producing rollup rows from time_entry, grouped by client, task and day"""
+    task_key = func.coalesce(TimeEntry.task_id, 0)
+    amount = TimeEntry.amount
+    unbilled = TimeEntry.invoice_id.is_(None)
+    return select(
+        TimeEntry.client_id,
+        task_key,
+        TimeEntry.date,
+        func.count(TimeEntry.id),
+        func.sum(TimeEntry.total_hours),
+        func.sum(case((unbilled, TimeEntry.total_hours), else_=0)),
+        func.sum(case((unbilled, 0), else_=amount)),
+        func.sum(case((unbilled, amount), else_=0)),
+    ).group_by(TimeEntry.client_id, task_key, TimeEntry.date)
+
+
+_ROLLUP_COLUMNS = ['client_id', 'task_id', 'day', 'entry_count', 'hours',
+                   'unbilled_hours', 'billed_amount', 'unbilled_amount']
+
+
+def refresh_rollup(connection, days):
+    """Recompute the rollup rows for an iterable of (client_id, day) pairs"""
+    days_by_client = defaultdict(set)
+    for client_id, day in days:
+        days_by_client[client_id].add(day)
+
+    # Lets results computed from closed periods stay cached until one of their entries changes
+    period_start = open_period_start()
+    if any(min(client_days) < period_start for client_days in days_by_client.values()):
+        mark_tables_changed([CLOSED_PERIOD_VERSION])
+
+    # One client and a list of days per statement, so both sides use the (client, day) indexes
+    for client_id, client_days in sorted(days_by_client.items()):
+        client_days = sorted(client_days)
+        for start in range(0, len(client_days), REFRESH_CHUNK_SIZE):
+            chunk = client_days[start:start + REFRESH_CHUNK_SIZE]
+            connection.execute(delete(DailyRollup).where(
+                DailyRollup.client_id == client_id, DailyRollup.day.in_(chunk)))
+            connection.execute(insert(DailyRollup).from_select(
+                _ROLLUP_COLUMNS,
+                _rollup_select().where(TimeEntry.client_id == client_id, TimeEntry.date.in_(chunk))
+            ))
+
+
+def rebuild_rollup(connection):
+    """Throw away the rollup and rebuild it from every time entry, returning the row count"""
+    connection.execute(delete(DailyRollup))
+    connection.execute(insert(DailyRollup).from_select(_ROLLUP_COLUMNS, _rollup_select()))
+    return connection.execute(select(func.count(DailyRollup.id))).scalar()
+
+
+@event.listens_for(Session, 'before_flush')
+def collect_rollup_days(session, flush_context, instances):
+    days = session.info.setdefault(_PENDING_KEY, set())
+
+    # The entries of a deleted client are deleted along with it, drop its rollup rows
+    # before the client row goes so the foreign key stays satisfied
+    deleted_clients = {obj.id for obj in session.deleted if isinstance(obj, Client)}
+    for client_id in sorted(deleted_clients):
+        session.connection().execute(delete(DailyRollup).where(DailyRollup.client_id == client_id))
+
+    # Days the entries are moving to (or being created on)
+    stored_ids = []
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, TimeEntry):
+            if obj in session.deleted:
+                if obj.client_id in deleted_clients:
+                    continue
+            elif obj.client_id is not None and obj.date is not None:
+                days.add((obj.client_id, obj.date))
+            if obj.id is not None:
+                stored_ids.append(obj.id)
+
+    # Days they are leaving, read from the database as it was before this flush
+    for start in range(0, len(stored_ids), REFRESH_CHUNK_SIZE):
+        days.update(session.connection().execute(
+            select(TimeEntry.client_id, TimeEntry.date).where(
+                TimeEntry.id.in_(stored_ids[start:start + REFRESH_CHUNK_SIZE]))
+        ).all())
+
+    # Deleting tasks and invoices clears task_id/invoice_id on their entries during the flush
+    deleted_ids = {TimeEntry.task_id: [], TimeEntry.invoice_id: []}
+    for obj in session.deleted:
+        if isinstance(obj, (Task, Invoice)) and obj.client_id not in deleted_clients:
+            deleted_ids[TimeEntry.task_id if isinstance(obj, Task) else TimeEntry.invoice_id].append(obj.id)
+    for column, ids in deleted_ids.items():
+        for start in range(0, len(ids), REFRESH_CHUNK_SIZE):
+            days.update(session.connection().execute(
+                select(TimeEntry.client_id, TimeEntry.date).where(
+                    column.in_(ids[start:start + REFRESH_CHUNK_SIZE])).distinct()
+            ).all())
+
+
+@event.listens_for(Session, 'after_flush')
+def apply_rollup_days(session, flush_context):
+    days = session.info.pop(_PENDING_KEY, None)
+    if days:
+        refresh_rollup(session.connection(), days)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_rollup_days(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,11 +1,27 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, abort
-from sqlalchemy import func, desc
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, abort, Response, stream_with_context
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import func, desc, tuple_
+from sqlalchemy.orm import joinedload, selectinload
 from app import app, db
-from models import Client, TimeEntry, Invoice, CompanySettings, Task, TaskStatus, HourlyRate, Quote, QuoteStatus, CalendarEvent
-from utils import generate_invoice_pdf, generate_quote_pdf, calculate_hours
+from models import Client, TimeEntry, Invoice, CompanySettings, Task, TaskStatus, HourlyRate, Quote, QuoteStatus, CalendarEvent, DailyRollup
+from cache import VersionedCache, caches, conditional_on_versions
+from sql_profiler import profile_log, query_budget
+from rate_directory import rate_directory
+from reporting import DIMENSIONS, MEASURES, cached_report, pivot
+from task_progress import TASK_SORTS, task_counts, tasks_with_progress
+from search import SEARCH_PAGE_SIZE, SEARCH_SOURCES, search
+from pdf_cache import cached_pdf
+from bulk_export import matching_invoice_ids, stream_invoice_zip, write_combined_invoice_pdf
+from time_entry_export import EXPORT_FORMATS, filter_time_entries, stream_time_entries
+from time_entry_import import import_time_entries
+from time_entry_batch import save_time_entry_batch
+from billing import (BatchInvoicingError, create_invoice_for_entries, create_quote_for_entries, invoice_billing_period,
+                     previous_month, unbilled_period_totals)
+from utils import write_invoice_pdf, write_quote_pdf, calculate_hours, parse_date, encode_cursor, decode_cursor
 from datetime import datetime, date, timedelta
 import os
 import io
+import tempfile
 
 # Add utility function for template context
 @app.context_processor
@@ -15,34 +31,93 @@ def utility_processor():
     return dict(current_year=current_year)
 
 # Task routes
+TASKS_PER_PAGE = 50
+
+TASK_STATUS_FILTERS = [
+    ('', 'Open'),
+    (TaskStatus.TODO.value, 'To Do'),
+    (TaskStatus.IN_PROGRESS.value, 'In Progress'),
+    (TaskStatus.COMPLETED.value, 'Completed'),
+    (TaskStatus.ARCHIVED.value, 'Archived'),
+    ('all', 'All'),
+]
+
+TASK_PRIORITY_FILTERS = [(None, 'All Priorities'), (2, 'High'), (1, 'Medium'), (0, 'Low')]
+
+def task_status_matches(status_filter, status):
+    """Whether a task status is shown by a status filter; the default shows every status but archived"""
+    if status_filter == 'all':
+        return True
+    if not status_filter:
+        return status != TaskStatus.ARCHIVED.value
+    return status == status_filter
+
 @app.route('/tasks')
+@query_budget(4)
 def tasks():
     # Get filter parameters
     client_id = request.args.get('client_id', type=int)
-    status = request.args.get('status')
+    status = request.args.get('status') or ''
     priority = request.args.get('priority', type=int)
-
-    # Base query
-    query = Task.query
+    over_budget = request.args.get('over_budget') == '1'
+    sort = request.args.get('sort', 'priority')
+    if sort not in TASK_SORTS:
+        sort = 'priority'
+    page = max(request.args.get('page', 1, type=int), 1)
 
     # Apply filters
-    if client_id:
-        query = query.filter_by(client_id=client_id)
-    if status:
-        query = query.filter_by(status=status)
+    client_conditions = [Task.client_id == client_id] if client_id else []
+    conditions = list(client_conditions)
+    if not status:
+        # Served by the partial index on open tasks
+        conditions.append(Task.status != TaskStatus.ARCHIVED.value)
+    elif status != 'all':
+        conditions.append(Task.status == status)
     if priority is not None:  # Check for None since priority can be 0 (low)
-        query = query.filter_by(priority=priority)
-
-    # Order by priority (high to low) and due date (oldest first)
-    tasks = query.order_by(Task.priority.desc(), Task.due_date).all()
-    clients = Client.query.order_by(Client.name).all()
+        conditions.append(Task.priority == priority)
+
+    # One page of tasks with their clients and logged hours, by default by priority (high to low) and due date
+    tasks = tasks_with_progress(*conditions, over_budget=over_budget, sort=sort,
+                                limit=TASKS_PER_PAGE + 1, offset=(page - 1) * TASKS_PER_PAGE)
+    has_next = len(tasks) > TASKS_PER_PAGE
+    tasks = tasks[:TASKS_PER_PAGE]
+
+    # Counts for the status and priority filter chips, from one GROUP BY over the client's tasks
+    counts = task_counts(*client_conditions)
+    filter_args = {key: value for key, value in request.args.items() if key != 'page' and value}
+    status_chips = [
+        (value, label, url_for('tasks', **{**filter_args, 'status': value or None}),
+         sum(count for (task_status, task_priority), count in counts.items()
+             if task_status_matches(value, task_status) and priority in (None, task_priority)))
+        for value, label in TASK_STATUS_FILTERS
+    ]
+    priority_chips = [
+        (value, label, url_for('tasks', **{**filter_args, 'priority': value}),
+         sum(count for (task_status, task_priority), count in counts.items()
+             if task_status_matches(status, task_status) and value in (None, task_priority)))
+        for value, label in TASK_PRIORITY_FILTERS
+    ]
+    # An unknown status matches no tasks, like the query above
+    matching = next((count for value, _, _, count in status_chips if value == status), 0)
+    page_count = None if over_budget else max((matching + TASKS_PER_PAGE - 1) // TASKS_PER_PAGE, 1)
+
+    # The client filter comes from the cached rate directory instead of another query
+    clients = rate_directory().clients
 
     return render_template('tasks.html', 
                           tasks=tasks,
                           clients=clients,
                           selected_client_id=client_id,
                           status=status,
-                          priority=priority)
+                          priority=priority,
+                          over_budget=over_budget,
+                          sort=sort,
+                          status_chips=status_chips,
+                          priority_chips=priority_chips,
+                          page=page,
+                          page_count=page_count,
+                          previous_url=url_for('tasks', **filter_args, page=page - 1) if page > 1 else None,
+                          next_url=url_for('tasks', **filter_args, page=page + 1) if has_next else None)
 
 @app.route('/tasks/add', methods=['GET', 'POST'])
 def add_task():
@@ -133,7 +208,7 @@ def delete_task(task_id):
 @app.route('/timer/task/<int:task_id>')
 def timer_with_task(task_id):
     task = Task.query.get_or_404(task_id)
-    clients = Client.query.all()
+    clients = rate_directory().clients
     today = date.today()
 
     # Pre-fill the timer form with task information
@@ -145,24 +220,105 @@ def timer_with_task(task_id):
                           today=today)
 
 # Home route
-@app.route('/')
-def index():
-    # Get some stats for the dashboard
-    total_clients = Client.query.count()
-    total_unbilled_hours = db.session.query(func.sum(TimeEntry.total_hours)).filter(TimeEntry.invoice_id.is_(None)).scalar() or 0
-    total_unbilled_amount = db.session.query(
-        func.sum(TimeEntry.total_hours * TimeEntry.hourly_rate)
-    ).filter(TimeEntry.invoice_id.is_(None)).scalar() or 0
+dashboard_cache = VersionedCache('dashboard', ['time_entry', 'invoice', 'client'], maxsize=1)
 
-    recent_time_entries = TimeEntry.query.order_by(TimeEntry.date.desc()).limit(5).all()
-    recent_invoices = Invoice.query.order_by(Invoice.date_issued.desc()).limit(5).all()
+def dashboard_stats():
+    """Compute the dashboard statistics as plain values that can be cached"""
+    total_clients = Client.query.count()
+    total_unbilled_hours, total_unbilled_amount = db.session.query(
+        func.coalesce(func.sum(DailyRollup.unbilled_hours), 0),
+        func.coalesce(func.sum(DailyRollup.unbilled_amount), 0)
+    ).one()
+
+    # Hours by client over the last 30 days, for the chart
+    hours_by_client = db.session.query(Client.name, func.sum(DailyRollup.hours)).join(
+        Client, Client.id == DailyRollup.client_id
+    ).filter(DailyRollup.day >= date.today() - timedelta(days=30)).group_by(
+        DailyRollup.client_id, Client.name
+    ).order_by(Client.name).all()
+
+    recent_time_entries = TimeEntry.query.options(joinedload(TimeEntry.client)).order_by(
+        TimeEntry.date.desc()).limit(5).all()
+    recent_invoices = Invoice.query.options(joinedload(Invoice.client)).order_by(
+        Invoice.date_issued.desc()).limit(5).all()
+
+    return {
+        'total_clients': total_clients,
+        'total_unbilled_hours': total_unbilled_hours,
+        'total_unbilled_amount': total_unbilled_amount,
+        'hours_by_client': [(name, hours) for name, hours in hours_by_client],
+        'recent_time_entries': [{
+            'date': entry.date,
+            'client_name': entry.client.name,
+            'item': entry.item,
+            'total_hours': entry.total_hours
+        } for entry in recent_time_entries],
+        'recent_invoices': [{
+            'id': invoice.id,
+            'invoice_number': invoice.invoice_number,
+            'client_name': invoice.client.name,
+            'date_issued': invoice.date_issued,
+            'total': invoice.total,
+            'status': invoice.status
+        } for invoice in recent_invoices],
+    }
 
-    return render_template('index.html', 
-                         total_clients=total_clients,
-                         total_unbilled_hours=total_unbilled_hours,
-                         total_unbilled_amount=total_unbilled_amount,
-                         recent_time_entries=recent_time_entries,
-                         recent_invoices=recent_invoices)
+@app.route('/')
+@query_budget(6)
+def index():
+    # The stats are recomputed only after time entries, invoices or clients change.
+    # The 30 day chart window also moves with the date, so it is part of the key.
+    stats = dashboard_cache.get(dashboard_stats, key=date.today())
+    return render_template('index.html', **stats)
+
+# Page showing each kind of search result, and the name of its id argument
+SEARCH_RESULT_VIEWS = {
+    'time_entry': ('edit_time_entry', 'entry_id'),
+    'task': ('edit_task', 'task_id'),
+    'client': ('edit_client', 'client_id'),
+    'invoice': ('view_invoice', 'invoice_id'),
+    'quote': ('view_quote', 'quote_id'),
+}
+
+@app.route('/api/search')
+@query_budget(3)
+def search_api():
+    query = request.args.get('q', '')
+    kind = request.args.get('kind') or None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', SEARCH_PAGE_SIZE, type=int), 1), 100)
+    if kind and kind not in SEARCH_SOURCES:
+        return jsonify({'error': f"kind must be one of: {', '.join(SEARCH_SOURCES)}"}), 400
+
+    results, has_more, ranked = search(query, kind=kind, page=page, per_page=per_page)
+    for result in results:
+        endpoint, id_arg = SEARCH_RESULT_VIEWS[result['kind']]
+        result['url'] = url_for(endpoint, **{id_arg: result['id']})
+
+    return jsonify({
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more,
+        'ranked': ranked,
+        'results': results,
+    })
+
+@app.route('/api/cache-stats')
+def cache_stats():
+    return jsonify([cache.stats() for cache in caches])
+
+@app.route('/debug/perf')
+def debug_perf():
+    # Statements reveal the schema, so the page is only served in debug mode or when enabled explicitly
+    if not (app.debug or app.config['SQL_PROFILER']['debug_page']):
+        abort(404)
+    if request.args.get('format') == 'json':
+        return jsonify({'endpoints': profile_log.endpoints(), 'recent': profile_log.recent()})
+    return render_template('debug_perf.html',
+                           settings=app.config['SQL_PROFILER'],
+                           endpoints=profile_log.endpoints(),
+                           recent=profile_log.recent())
 
 # Client routes
 @app.route('/clients')
@@ -316,8 +472,19 @@ def edit_client(client_id):
     return render_template('edit_client.html', client=client)
 
 @app.route('/clients/<int:client_id>/delete', methods=['POST'])
+@query_budget(21)
 def delete_client(client_id):
-    client = Client.query.get_or_404(client_id)
+    # Load everything the delete cascades through up front, one query per relationship
+    # instead of one per task and invoice
+    client = Client.query.options(
+        selectinload(Client.time_entries), selectinload(Client.hourly_rates), selectinload(Client.quotes),
+        selectinload(Client.calendar_events),
+        selectinload(Client.tasks).selectinload(Task.time_entries),
+        selectinload(Client.tasks).selectinload(Task.calendar_events),
+        selectinload(Client.invoices).selectinload(Invoice.time_entries),
+        selectinload(Client.invoices).selectinload(Invoice.quote),
+        selectinload(Client.quotes).selectinload(Quote.time_entries),
+    ).filter_by(id=client_id).first_or_404()
 
     try:
         db.session.delete(client)
@@ -330,19 +497,134 @@ def delete_client(client_id):
     return redirect(url_for('clients'))
 
 # Time Entry routes
+TIME_ENTRIES_PER_PAGE = 50
+
+def time_entry_filter_args():
+    """Time entry filters from the query string"""
+    return dict(
+        client_id=request.args.get('client_id', type=int),
+        task_id=request.args.get('task_id', type=int),
+        date_from=parse_date(request.args.get('date_from')),
+        date_to=parse_date(request.args.get('date_to')),
+        invoice_status=request.args.get('invoice_status') or None
+    )
+
 @app.route('/time-entries')
+@query_budget(3)
 def time_entries():
-    entries = TimeEntry.query.order_by(TimeEntry.date.desc(), TimeEntry.time_in.desc()).all()
+    # Get filter parameters
+    filter_args = time_entry_filter_args()
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before'))
+
+    sort_key = tuple_(TimeEntry.date, TimeEntry.time_in, TimeEntry.id)
+
+    # Keyset pagination on (date, time_in, id), newest first
+    query = filter_time_entries(TimeEntry.query, **filter_args).options(
+        joinedload(TimeEntry.client), joinedload(TimeEntry.invoice))
+    if before:
+        # Walk backwards from the cursor, then flip the page back to newest first
+        query = query.filter(sort_key > before).order_by(
+            TimeEntry.date, TimeEntry.time_in, TimeEntry.id)
+        entries = query.limit(TIME_ENTRIES_PER_PAGE + 1).all()
+        has_newer = len(entries) > TIME_ENTRIES_PER_PAGE
+        entries = entries[:TIME_ENTRIES_PER_PAGE][::-1]
+        has_older = True
+    else:
+        if after:
+            query = query.filter(sort_key < after)
+        query = query.order_by(TimeEntry.date.desc(), TimeEntry.time_in.desc(), TimeEntry.id.desc())
+        entries = query.limit(TIME_ENTRIES_PER_PAGE + 1).all()
+        has_older = len(entries) > TIME_ENTRIES_PER_PAGE
+        entries = entries[:TIME_ENTRIES_PER_PAGE]
+        has_newer = after is not None
+
+    # Totals for the whole filtered set in a single aggregate query
+    totals_query = db.session.query(
+        func.count(TimeEntry.id),
+        func.coalesce(func.sum(TimeEntry.total_hours), 0),
+        func.coalesce(func.sum(TimeEntry.amount), 0)
+    )
+    entry_count, total_hours, total_amount = filter_time_entries(totals_query, **filter_args).one()
+
+    # Links to the neighbouring pages keep the current filters
+    page_args = {key: request.args.get(key) for key in ('client_id', 'task_id', 'date_from', 'date_to', 'invoice_status')
+                 if request.args.get(key)}
+    newer_url = url_for('time_entries', before=encode_cursor(entries[0]), **page_args) if entries and has_newer else None
+    older_url = url_for('time_entries', after=encode_cursor(entries[-1]), **page_args) if entries and has_older else None
+
     clients = Client.query.order_by(Client.name).all()
-    return render_template('time_entries.html', entries=entries, clients=clients)
+    return render_template('time_entries.html',
+                          entries=entries,
+                          clients=clients,
+                          entry_count=entry_count,
+                          total_hours=total_hours,
+                          total_amount=total_amount,
+                          newer_url=newer_url,
+                          older_url=older_url,
+                          first_url=url_for('time_entries', **page_args) if has_newer else None)
+
+@app.route('/time-entries/export')
+def export_time_entries():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
+
+    # Rows are streamed from the database as the response is sent
+    return Response(
+        stream_with_context(stream_time_entries(export_format, **time_entry_filter_args())),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="time_entries.{export_format}"'}
+    )
+
+# Two rollup queries per client imported for, sized for an import covering 20 clients
+@app.route('/time-entries/import', methods=['POST'])
+@query_budget(50)
+def import_time_entries_csv():
+    # Either a multipart upload named "file" or a text/csv request body
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    csv_file = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    try:
+        result = import_time_entries(csv_file)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(result)
+
+# Two rollup queries per client in the batch, sized for a batch covering 20 clients
+@app.route('/api/time-entries/batch', methods=['POST'])
+@query_budget(55)
+def save_time_entries_batch():
+    # Either a JSON array of entries or an object with an "entries" array
+    payload = request.get_json(silent=True)
+    entries = payload.get('entries') if isinstance(payload, dict) else payload
+
+    try:
+        results = save_time_entry_batch(entries)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'created': sum(result['status'] == 'created' for result in results),
+        'duplicates': sum(result['status'] == 'duplicate' for result in results),
+        'errors': sum(result['status'] == 'error' for result in results),
+        'results': results,
+    })
 
 @app.route('/timer')
+@query_budget(3)
 def timer():
-    clients = Client.query.order_by(Client.name).all()
+    clients = rate_directory().clients
     today = date.today()
 
-    # Get active tasks for task selector
-    tasks = Task.query.filter(Task.status != TaskStatus.ARCHIVED.value).order_by(Task.priority.desc()).all()
+    # Get active tasks for task selector, with the hours logged against them
+    tasks = tasks_with_progress(Task.status != TaskStatus.ARCHIVED.value)
 
     return render_template('timer.html', 
                           clients=clients, 
@@ -356,7 +638,9 @@ def timer():
 def save_timer():
     try:
         client_id = int(request.form['client_id'])
-        client = Client.query.get_or_404(client_id)
+        directory = rate_directory()
+        if client_id not in directory:
+            abort(404)
 
         item = request.form['item']
         location = request.form['location']
@@ -365,16 +649,8 @@ def save_timer():
         time_out = datetime.strptime(request.form['time_out'], '%H:%M').time()
         total_hours = float(request.form['total_hours'])
 
-        # Get the hourly rate
-        hourly_rate = float(request.form['hourly_rate'])
-
-        # Get rate_id if it exists and is not 'default'
-        rate_id = request.form.get('rate_id')
-        if rate_id and rate_id != 'default':
-            # Verify this rate belongs to the client
-            rate = HourlyRate.query.get(int(rate_id))
-            if rate and rate.client_id == client_id:
-                hourly_rate = rate.rate
+        # The selected named rate if it belongs to the client, else the rate typed into the form
+        hourly_rate = directory.resolve_rate(client_id, request.form.get('rate_id'), float(request.form['hourly_rate']))
 
         # Get task_id if it exists
         task_id = request.form.get('task_id')
@@ -404,6 +680,8 @@ def save_timer():
 
         flash('Time entry saved successfully!', 'success')
         return redirect(url_for('time_entries'))
+    except HTTPException:
+        raise
     except Exception as e:
         db.session.rollback()
         flash(f'Error saving time entry: {str(e)}', 'danger')
@@ -411,12 +689,13 @@ def save_timer():
 
 @app.route('/time-entries/add', methods=['GET', 'POST'])
 def add_time_entry():
-    clients = Client.query.order_by(Client.name).all()
+    directory = rate_directory()
 
     if request.method == 'POST':
         try:
             client_id = int(request.form['client_id'])
-            client = Client.query.get_or_404(client_id)
+            if client_id not in directory:
+                abort(404)
 
             location = request.form['location']
             item = request.form['item']
@@ -431,16 +710,8 @@ def add_time_entry():
             # Calculate total hours
             total_hours = calculate_hours(time_in, time_out)
 
-            # Get the hourly rate
-            hourly_rate = float(request.form['hourly_rate'])
-
-            # Get rate_id if it exists and is not 'default'
-            rate_id = request.form.get('rate_id')
-            if rate_id and rate_id != 'default':
-                # Verify this rate belongs to the client
-                rate = HourlyRate.query.get(int(rate_id))
-                if rate and rate.client_id == client_id:
-                    hourly_rate = rate.rate
+            # The selected named rate if it belongs to the client, else the rate typed into the form
+            hourly_rate = directory.resolve_rate(client_id, request.form.get('rate_id'), float(request.form['hourly_rate']))
 
             new_entry = TimeEntry(
                 client_id=client_id,
@@ -458,21 +729,24 @@ def add_time_entry():
 
             flash('Time entry added successfully!', 'success')
             return redirect(url_for('time_entries'))
+        except HTTPException:
+            raise
         except Exception as e:
             db.session.rollback()
             flash(f'Error adding time entry: {str(e)}', 'danger')
 
-    return render_template('add_time_entry.html', clients=clients, today=date.today())
+    return render_template('add_time_entry.html', clients=directory.clients, today=date.today())
 
 @app.route('/time-entries/<int:entry_id>/edit', methods=['GET', 'POST'])
 def edit_time_entry(entry_id):
     entry = TimeEntry.query.get_or_404(entry_id)
-    clients = Client.query.order_by(Client.name).all()
+    directory = rate_directory()
 
     if request.method == 'POST':
         try:
             client_id = int(request.form['client_id'])
-            client = Client.query.get_or_404(client_id)
+            if client_id not in directory:
+                abort(404)
 
             entry.client_id = client_id
             entry.location = request.form['location']
@@ -484,28 +758,21 @@ def edit_time_entry(entry_id):
             # Recalculate total hours
             entry.total_hours = calculate_hours(entry.time_in, entry.time_out)
 
-            # Get the hourly rate
-            hourly_rate = float(request.form['hourly_rate'])
-
-            # Get rate_id if it exists and is not 'default'
-            rate_id = request.form.get('rate_id')
-            if rate_id and rate_id != 'default':
-                # Verify this rate belongs to the client
-                rate = HourlyRate.query.get(int(rate_id))
-                if rate and rate.client_id == client_id:
-                    hourly_rate = rate.rate
-
-            entry.hourly_rate = hourly_rate
+            # The selected named rate if it belongs to the client, else the rate typed into the form
+            entry.hourly_rate = directory.resolve_rate(
+                client_id, request.form.get('rate_id'), float(request.form['hourly_rate']))
 
             db.session.commit()
 
             flash('Time entry updated successfully!', 'success')
             return redirect(url_for('time_entries'))
+        except HTTPException:
+            raise
         except Exception as e:
             db.session.rollback()
             flash(f'Error updating time entry: {str(e)}', 'danger')
 
-    return render_template('edit_time_entry.html', entry=entry, clients=clients)
+    return render_template('edit_time_entry.html', entry=entry, clients=directory.clients)
 
 @app.route('/time-entries/<int:entry_id>/delete', methods=['POST'])
 def delete_time_entry(entry_id):
@@ -525,7 +792,8 @@ def delete_time_entry(entry_id):
 @app.route('/invoices')
 def invoices():
     invoices = Invoice.query.order_by(Invoice.date_issued.desc()).all()
-    return render_template('invoices.html', invoices=invoices)
+    clients = Client.query.order_by(Client.name).all()
+    return render_template('invoices.html', invoices=invoices, clients=clients)
 
 @app.route('/invoices/create', methods=['GET', 'POST'])
 def create_invoice():
@@ -536,15 +804,6 @@ def create_invoice():
             client_id = int(request.form['client_id'])
             client = Client.query.get_or_404(client_id)
 
-            # Find the next invoice number
-            last_invoice = Invoice.query.order_by(Invoice.id.desc()).first()
-            if last_invoice:
-                # Extract the numeric part and increment
-                last_num = int(last_invoice.invoice_number.split('-')[-1])
-                invoice_number = f"INV-{last_num + 1:04d}"
-            else:
-                invoice_number = "INV-0001"
-
             date_issued = datetime.strptime(request.form['date_issued'], '%Y-%m-%d').date()
 
             # Calculate due date (30 days from issue)
@@ -556,37 +815,19 @@ def create_invoice():
                 flash('Please select at least one time entry for the invoice', 'danger')
                 return redirect(url_for('create_invoice'))
 
-            # Calculate the subtotal and total
-            entries = TimeEntry.query.filter(TimeEntry.id.in_(selected_entries)).all()
-            subtotal = sum(entry.total_hours * entry.hourly_rate for entry in entries)
-
             # Get company settings for HST rate
             company = CompanySettings.query.first()
             hst_rate = company.default_hst_rate if company else 0.13  # Default to 13% if not set
 
-            hst_amount = subtotal * hst_rate
-            total = subtotal + hst_amount
-
-            new_invoice = Invoice(
-                invoice_number=invoice_number,
+            # Invoice, entry links and totals in one transaction
+            new_invoice = create_invoice_for_entries(
                 client_id=client_id,
+                entry_ids=selected_entries,
                 date_issued=date_issued,
                 date_due=date_due,
-                subtotal=subtotal,
                 hst_rate=hst_rate,
-                hst_amount=hst_amount,
-                total=total,
-                status='draft',
                 notes=request.form.get('notes', '')
             )
-
-            db.session.add(new_invoice)
-            db.session.commit()
-
-            # Update the time entries to link them to this invoice
-            for entry in entries:
-                entry.invoice_id = new_invoice.id
-
             db.session.commit()
 
             flash('Invoice created successfully!', 'success')
@@ -598,13 +839,57 @@ def create_invoice():
 
     return render_template('create_invoice.html', clients=clients)
 
+# About 8 queries per invoice, sized for a month-end run of 20 clients
+@app.route('/invoices/batch', methods=['GET', 'POST'])
+@query_budget(170)
+def batch_invoices():
+    # Defaults to last month, issued today
+    default_start, default_end = previous_month(date.today())
+    period_start = parse_date(request.values.get('period_start')) or default_start
+    period_end = parse_date(request.values.get('period_end')) or default_end
+    date_issued = parse_date(request.values.get('date_issued')) or date.today()
+
+    company = CompanySettings.query.first()
+    hst_rate = company.default_hst_rate if company else 0.13  # Default to 13% if not set
+
+    if request.method == 'POST':
+        try:
+            created = invoice_billing_period(
+                period_start, period_end, date_issued, date_issued + timedelta(days=30), hst_rate)
+        except BatchInvoicingError as e:
+            if e.committed:
+                flash(f'Error creating invoices: {str(e)}. The {len(e.committed)} invoices committed before the '
+                      f'error ({e.committed[0]["invoice_number"]} to {e.committed[-1]["invoice_number"]}) were kept; '
+                      f'run the batch again to invoice the remaining clients.', 'danger')
+            else:
+                flash(f'Error creating invoices: {str(e)}. No invoices were created.', 'danger')
+            return redirect(url_for('batch_invoices', period_start=period_start, period_end=period_end,
+                                    date_issued=date_issued))
+
+        if created:
+            total = sum(invoice['total'] for invoice in created)
+            flash(f'Created {len(created)} invoices totalling ${total:.2f}', 'success')
+        else:
+            flash('There are no unbilled time entries in this period', 'info')
+        return redirect(url_for('invoices'))
+
+    # Preview what the batch would invoice
+    totals = unbilled_period_totals(period_start, period_end)
+    return render_template('batch_invoices.html',
+                          totals=totals,
+                          hst_rate=hst_rate,
+                          period_start=period_start,
+                          period_end=period_end,
+                          date_issued=date_issued)
+
 @app.route('/get_unbilled_entries/<int:client_id>')
+@query_budget(2)
+@conditional_on_versions('time_entry')
 def get_unbilled_entries(client_id):
     entries = TimeEntry.query.filter_by(client_id=client_id, invoice_id=None).order_by(TimeEntry.date).all()
 
     entries_data = []
     for entry in entries:
-        amount = entry.total_hours * entry.hourly_rate
         entries_data.append({
             'id': entry.id,
             'date': entry.date.strftime('%Y-%m-%d'),
@@ -612,7 +897,7 @@ def get_unbilled_entries(client_id):
             'location': entry.location or '',
             'hours': f"{entry.total_hours:.2f}",
             'rate': f"${entry.hourly_rate:.2f}",
-            'amount': f"${amount:.2f}"
+            'amount': f"${entry.amount:.2f}"
         })
 
     return jsonify(entries_data)
@@ -667,22 +952,67 @@ def download_invoice(invoice_id):
         return redirect(url_for('company_settings'))
 
     try:
-        pdf_data = generate_invoice_pdf(invoice, company)
-
-        # Create a BytesIO object
-        pdf_io = io.BytesIO(pdf_data)
-        pdf_io.seek(0)
+        # Unchanged documents are served from the PDF cache instead of re-rendered
+        pdf_path, etag = cached_pdf('invoice', invoice, company, write_invoice_pdf)
 
-        return send_file(
-            pdf_io,
+        response = send_file(
+            pdf_path,
             as_attachment=True,
             download_name=f"Invoice_{invoice.invoice_number}.pdf",
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            etag=etag,
+            conditional=True
         )
+        # Let browsers keep the file but revalidate it with the ETag each time
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         flash(f'Error generating PDF: {str(e)}', 'danger')
         return redirect(url_for('view_invoice', invoice_id=invoice_id))
 
+@app.route('/invoices/export')
+def export_invoices():
+    company = CompanySettings.query.first()
+
+    if not company:
+        flash('Please set up your company information first', 'danger')
+        return redirect(url_for('company_settings'))
+
+    start_date = parse_date(request.args.get('start_date'))
+    end_date = parse_date(request.args.get('end_date'))
+    invoice_ids = matching_invoice_ids(
+        start_date=start_date,
+        end_date=end_date,
+        status=request.args.get('status') or None,
+        client_id=request.args.get('client_id', type=int)
+    )
+
+    if not invoice_ids:
+        flash('No invoices match the export filters', 'warning')
+        return redirect(url_for('invoices'))
+
+    filename = f"Invoices_{start_date or 'start'}_to_{end_date or 'today'}"
+
+    if request.args.get('format') == 'pdf':
+        # One combined PDF, spooled to a temporary file rather than memory
+        pdf_file = tempfile.TemporaryFile()
+        write_combined_invoice_pdf(invoice_ids, pdf_file)
+        pdf_file.seek(0)
+        return send_file(
+            pdf_file,
+            as_attachment=True,
+            download_name=f"{filename}.pdf",
+            mimetype='application/pdf'
+        )
+
+    # The ZIP is streamed while the invoices render in a process pool
+    return Response(
+        stream_invoice_zip(invoice_ids),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}.zip"'}
+    )
+
 # Quote routes
 @app.route('/quotes')
 def quotes():
@@ -698,15 +1028,6 @@ def create_quote():
             client_id = int(request.form['client_id'])
             client = Client.query.get_or_404(client_id)
 
-            # Find the next quote number
-            last_quote = Quote.query.order_by(Quote.id.desc()).first()
-            if last_quote:
-                # Extract the numeric part and increment
-                last_num = int(last_quote.quote_number.split('-')[-1])
-                quote_number = f"QUO-{last_num + 1:04d}"
-            else:
-                quote_number = "QUO-0001"
-
             date_issued = datetime.strptime(request.form['date_issued'], '%Y-%m-%d').date()
             
             # Calculate valid until date (30 days from issue by default)
@@ -720,37 +1041,19 @@ def create_quote():
                 flash('Please select at least one time entry for the quote', 'danger')
                 return redirect(url_for('create_quote'))
 
-            # Calculate the subtotal and total
-            entries = TimeEntry.query.filter(TimeEntry.id.in_(selected_entries)).all()
-            subtotal = sum(entry.total_hours * entry.hourly_rate for entry in entries)
-
             # Get company settings for HST rate
             company = CompanySettings.query.first()
             hst_rate = company.default_hst_rate if company else 0.13  # Default to 13% if not set
 
-            hst_amount = subtotal * hst_rate
-            total = subtotal + hst_amount
-
-            new_quote = Quote(
-                quote_number=quote_number,
+            # Quote, entry links and totals in one transaction
+            new_quote = create_quote_for_entries(
                 client_id=client_id,
+                entry_ids=selected_entries,
                 date_issued=date_issued,
                 date_valid_until=date_valid_until,
-                subtotal=subtotal,
                 hst_rate=hst_rate,
-                hst_amount=hst_amount,
-                total=total,
-                status=QuoteStatus.PENDING.value,
                 notes=request.form.get('notes', '')
             )
-
-            db.session.add(new_quote)
-            db.session.commit()
-
-            # Update the time entries to link them to this quote
-            for entry in entries:
-                entry.quote_id = new_quote.id
-
             db.session.commit()
 
             flash('Quote created successfully!', 'success')
@@ -763,12 +1066,13 @@ def create_quote():
     return render_template('create_quote.html', clients=clients)
 
 @app.route('/get_unquoted_entries/<int:client_id>')
+@query_budget(2)
+@conditional_on_versions('time_entry')
 def get_unquoted_entries(client_id):
     entries = TimeEntry.query.filter_by(client_id=client_id, invoice_id=None, quote_id=None).order_by(TimeEntry.date).all()
 
     entries_data = []
     for entry in entries:
-        amount = entry.total_hours * entry.hourly_rate
         entries_data.append({
             'id': entry.id,
             'date': entry.date.strftime('%Y-%m-%d'),
@@ -776,7 +1080,7 @@ def get_unquoted_entries(client_id):
             'location': entry.location or '',
             'hours': f"{entry.total_hours:.2f}",
             'rate': f"${entry.hourly_rate:.2f}",
-            'amount': f"${amount:.2f}"
+            'amount': f"${entry.amount:.2f}"
         })
 
     return jsonify(entries_data)
@@ -851,34 +1155,34 @@ def download_quote(quote_id):
         return redirect(url_for('company_settings'))
 
     try:
-        pdf_data = generate_quote_pdf(quote, company)
-
-        # Create a BytesIO object
-        pdf_io = io.BytesIO(pdf_data)
-        pdf_io.seek(0)
+        # Unchanged documents are served from the PDF cache instead of re-rendered
+        pdf_path, etag = cached_pdf('quote', quote, company, write_quote_pdf)
 
-        return send_file(
-            pdf_io,
+        response = send_file(
+            pdf_path,
             as_attachment=True,
             download_name=f"Quote_{quote.quote_number}.pdf",
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            etag=etag,
+            conditional=True
         )
+        # Let browsers keep the file but revalidate it with the ETag each time
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         flash(f'Error generating PDF: {str(e)}', 'danger')
         return redirect(url_for('view_quote', quote_id=quote_id))
 
 # Reports route
-@app.route('/reports')
-def reports():
-    clients = Client.query.order_by(Client.name).all()
+REPORT_ENTRY_LIMIT = 500
 
-    # Default to current month
+def report_filters():
+    """Client, task and date range of a report request, defaulting to the current month"""
     today = date.today()
     start_date = date(today.year, today.month, 1)
     end_date = (date(today.year, today.month + 1, 1) - timedelta(days=1)) if today.month < 12 else date(today.year, 12, 31)
 
-    # Get query parameters
-    client_id = request.args.get('client_id', type=int)
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
 
@@ -888,41 +1192,87 @@ def reports():
     if end_date_str:
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
 
-    # Build the query
-    query = TimeEntry.query.filter(TimeEntry.date.between(start_date, end_date))
-
-    if client_id:
-        query = query.filter_by(client_id=client_id)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'client_id': request.args.get('client_id', type=int),
+        'task_id': request.args.get('task_id', type=int),
+    }
 
-    entries = query.order_by(TimeEntry.date).all()
-
-    # Calculate totals
-    total_hours = sum(entry.total_hours for entry in entries)
-    total_amount = sum(entry.total_hours * entry.hourly_rate for entry in entries)
-
-    # Group by client
-    client_summary = {}
-    for entry in entries:
-        if entry.client_id not in client_summary:
-            client_summary[entry.client_id] = {
-                'name': entry.client.name,
-                'hours': 0,
-                'amount': 0
-            }
-
-        client_summary[entry.client_id]['hours'] += entry.total_hours
-        client_summary[entry.client_id]['amount'] += entry.total_hours * entry.hourly_rate
+@app.route('/reports')
+@query_budget(6)
+def reports():
+    clients = Client.query.order_by(Client.name).all()
+    filters = report_filters()
+    start_date, end_date, client_id = filters['start_date'], filters['end_date'], filters['client_id']
+
+    # Pivot of the chosen row dimension against the chosen time bucket or other dimension
+    pivot_rows_by = request.args.get('rows', 'client')
+    pivot_columns_by = request.args.get('columns', 'month')
+    pivot_measure = request.args.get('measure', 'hours')
+    if pivot_rows_by not in DIMENSIONS:
+        pivot_rows_by = 'client'
+    if pivot_columns_by not in DIMENSIONS or pivot_columns_by == pivot_rows_by:
+        pivot_columns_by = None
+    if pivot_measure not in MEASURES:
+        pivot_measure = 'hours'
+
+    # Totals per client, grouped in SQL from the daily rollup and cached until the period's entries change
+    client_summary = cached_report(['client'], **filters)
+    entry_count, total_hours, total_amount = client_summary.totals
+
+    pivot_report = cached_report([pivot_rows_by, *([pivot_columns_by] if pivot_columns_by else [])], **filters)
+    if pivot_columns_by:
+        pivot_columns, pivot_rows, pivot_totals = pivot(pivot_report, pivot_measure)
+    else:
+        pivot_columns, pivot_rows, pivot_totals = [], [], []
+
+    # Detailed entries are capped so long ranges don't load the whole table
+    query = filter_time_entries(TimeEntry.query, client_id=client_id, task_id=filters['task_id'],
+                                date_from=start_date, date_to=end_date)
+
+    entries = query.options(joinedload(TimeEntry.client), joinedload(TimeEntry.invoice)).order_by(
+        TimeEntry.date, TimeEntry.time_in, TimeEntry.id).limit(REPORT_ENTRY_LIMIT).all()
 
     return render_template('reports.html', 
                         clients=clients,
                         entries=entries,
+                        entry_count=entry_count,
                         total_hours=total_hours,
                         total_amount=total_amount,
-                        client_summary=client_summary,
+                        client_summary=client_summary.rows,
+                        dimensions=DIMENSIONS,
+                        measures=MEASURES,
+                        pivot_rows_by=pivot_rows_by,
+                        pivot_columns_by=pivot_columns_by,
+                        pivot_measure=pivot_measure,
+                        pivot_report=pivot_report,
+                        pivot_columns=pivot_columns,
+                        pivot_rows=pivot_rows,
+                        pivot_totals=pivot_totals,
                         start_date=start_date,
                         end_date=end_date,
                         selected_client_id=client_id)
 
+# Report rows grouped by ?dimensions=client,week as [client, week, entries, hours, amount] arrays
+@app.route('/api/reports')
+@query_budget(2)
+def report_api():
+    try:
+        filters = report_filters()
+        report = cached_report(request.args.get('dimensions', 'client'), **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'start_date': filters['start_date'].isoformat(),
+        'end_date': filters['end_date'].isoformat(),
+        'dimensions': report.dimensions,
+        'columns': report.columns,
+        'rows': [list(row) for row in report.rows],
+        'totals': list(report.totals),
+    })
+
 # Company Settings routes
 @app.route('/company-settings', methods=['GET', 'POST'])
 def company_settings():
@@ -967,45 +1317,62 @@ def calendar():
     tasks = Task.query.order_by(Task.title).all()
     return render_template('calendar.html', clients=clients, tasks=tasks)
 
+def parse_calendar_time(value):
+    """Parse a calendar window bound, returning None if it is missing or invalid"""
+    if not value:
+        return None
+    try:
+        # Handle possible 'Z' at the end of ISO string
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+# Columns of the calendar query, in the order calendar_event_json unpacks them
+CALENDAR_EVENT_COLUMNS = (
+    CalendarEvent.id, CalendarEvent.title, CalendarEvent.start_time, CalendarEvent.end_time,
+    CalendarEvent.all_day, CalendarEvent.location, CalendarEvent.client_id, Client.name,
+    CalendarEvent.task_id, Task.title, CalendarEvent.is_billable
+)
+
+def calendar_event_json(row):
+    """JSON shape of a row of CALENDAR_EVENT_COLUMNS"""
+    (event_id, title, start_time, end_time, all_day, location,
+     client_id, client_name, task_id, task_title, is_billable) = row
+    return {
+        'id': event_id,
+        'title': title,
+        'start': start_time.isoformat(),
+        'end': end_time.isoformat(),
+        'allDay': all_day,
+        'extendedProps': {
+            'location': location,
+            'client_id': client_id,
+            'client_name': client_name,
+            'task_id': task_id,
+            'task_title': task_title,
+            'is_billable': is_billable
+        }
+    }
+
 @app.route('/api/calendar-events')
+@query_budget(2)
+@conditional_on_versions('calendar_event', 'client', 'task')
 def get_calendar_events():
-    start = request.args.get('start')
-    end = request.args.get('end')
-    
-    query = CalendarEvent.query
+    start = parse_calendar_time(request.args.get('start'))
+    end = parse_calendar_time(request.args.get('end'))
+
+    # Only the columns the calendar shows, with the client and task names joined in
+    query = db.select(*CALENDAR_EVENT_COLUMNS).join(Client, CalendarEvent.client_id == Client.id).outerjoin(
+        Task, CalendarEvent.task_id == Task.id)
+
+    # Every event that overlaps the visible window, including ones that straddle its edges
     if start:
-        try:
-            # Handle possible 'Z' at the end of ISO string
-            start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-            query = query.filter(CalendarEvent.start_time >= start_dt)
-        except ValueError:
-            pass
+        query = query.where(CalendarEvent.end_time > start)
     if end:
-        try:
-            end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
-            query = query.filter(CalendarEvent.end_time <= end_dt)
-        except ValueError:
-            pass
-    
-    events = query.all()
-    events_list = []
-    for event in events:
-        events_list.append({
-            'id': event.id,
-            'title': event.title,
-            'start': event.start_time.isoformat(),
-            'end': event.end_time.isoformat(),
-            'allDay': event.all_day,
-            'extendedProps': {
-                'location': event.location,
-                'client_id': event.client_id,
-                'client_name': event.client.name,
-                'task_id': event.task_id,
-                'task_title': event.task.title if event.task else None,
-                'is_billable': event.is_billable
-            }
-        })
-    return jsonify(events_list)
+        query = query.where(CalendarEvent.start_time < end)
+
+    rows = db.session.execute(query.order_by(CalendarEvent.start_time))
+    return jsonify([calendar_event_json(row) for row in rows])
 
 @app.route('/calendar/add', methods=['POST'])
 def add_calendar_event():
@@ -0,0 +1,213 @@
+"""Full-text search over time entries, tasks, clients, invoices and quotes.
+
+The searchable text of every row lives in one SQLite FTS5 table,
+search_index, with a title and a body column. Triggers on the source tables
+keep it in step with every insert, update and delete, including bulk Core
+statements such as the CSV import, so application code never maintains it.
+An index row's rowid is the source row's id * KIND_CODES + the kind's code,
+which lets the triggers replace a row by rowid instead of scanning the index.
+Bulk loaders wrap their inserts in deferred_indexing(), which indexes all the
+new rows with one statement instead of one trigger insert per row.
+
+Searches are one MATCH against the index, ranked by bm25 with title matches
+weighted above body matches. Scoring has to visit every match, so a query
+matching more than RANKED_MATCH_LIMIT rows lists the most recently added
+matches first instead, which the index can return without visiting the rest.
+"""
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import event, select, text
+
+from app import db
+from models import Client, Invoice, TimeEntry
+
+SEARCH_TABLE = 'search_index'
+
+# Source tables whose insert trigger is switched off by deferred_indexing() in the current transaction
+DEFERRED_TABLE = 'search_index_deferred'
+
+SEARCH_PAGE_SIZE = 20
+
+# Queries with more matches than this are not scored, see above
+RANKED_MATCH_LIMIT = 1000
+
+# bm25 weight of a match in the title relative to one in the body
+TITLE_WEIGHT = 10.0
+
+# rowid = source id * KIND_CODES + kind code
+KIND_CODES = 8
+
+# Title and body are SQL expressions over a row alias, the columns are those that feed them
+SearchSource = namedtuple('SearchSource', ['code', 'title', 'body', 'columns'])
+
+SEARCH_SOURCES = {
+    'time_entry': SearchSource(1, '{row}.item', '{row}.location', ['item', 'location']),
+    'task': SearchSource(2, '{row}.title', '{row}.description', ['title', 'description']),
+    'client': SearchSource(
+        3, '{row}.name',
+        "coalesce({row}.contact_person, '') || ' ' || coalesce({row}.email, '') || ' ' || coalesce({row}.phone, '')",
+        ['name', 'contact_person', 'email', 'phone']),
+    'invoice': SearchSource(4, '{row}.invoice_number', '{row}.notes', ['invoice_number', 'notes']),
+    'quote': SearchSource(5, '{row}.quote_number', '{row}.notes', ['quote_number', 'notes']),
+}
+
+KINDS_BY_CODE = {source.code: kind for kind, source in SEARCH_SOURCES.items()}
+
+_WORD = re.compile(r'\w+')
+
+
+def _index_row(source, row):
+    return (f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) VALUES ("
+            f"{row}.id * {KIND_CODES} + {source.code}, {source.title.format(row=row)}, {source.body.format(row=row)})")
+
+
+def _unindex_row(source, row):
+    return f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {row}.id * {KIND_CODES} + {source.code}"
+
+
+def _trigger_ddl(table, source):
+    prefix = f"{SEARCH_TABLE}_{table}"
+    yield (f"CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} "
+           f"WHEN NOT EXISTS (SELECT 1 FROM {DEFERRED_TABLE} WHERE source = '{table}') BEGIN "
+           f"{_index_row(source, 'new')}; END")
+    yield (f"CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN "
+           f"{_unindex_row(source, 'old')}; END")
+    yield (f"CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF {', '.join(source.columns)} ON {table} "
+           f"BEGIN {_unindex_row(source, 'old')}; {_index_row(source, 'new')}; END")
+
+
+def _index_rows(connection, table, after_id=0):
+    """Index the rows of a source table with an id above after_id"""
+    source = SEARCH_SOURCES[table]
+    connection.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) "
+        f"SELECT id * {KIND_CODES} + {source.code}, {source.title.format(row=table)}, "
+        f"{source.body.format(row=table)} FROM {table} WHERE id > :after_id"
+    ), {'after_id': after_id})
+
+
+def rebuild_search_index(connection):
+    """Refill the search index from the source tables, returning the number of rows indexed"""
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    for table in SEARCH_SOURCES:
+        _index_rows(connection, table)
+    # Merge the index into a single b-tree for the fastest lookups
+    connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+    return connection.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+
+def create_search_index(connection):
+    """Create the search index and its triggers where missing, filling the index if it is new"""
+    if connection.dialect.name != 'sqlite':
+        return
+
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}).first()
+    if not exists:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"))
+        # ORDER BY rank uses these weights
+        connection.execute(text(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25({TITLE_WEIGHT}, 1.0)')"))
+
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFERRED_TABLE} (source VARCHAR(50) PRIMARY KEY)"))
+    for table, source in SEARCH_SOURCES.items():
+        for statement in _trigger_ddl(table, source):
+            connection.execute(text(statement))
+
+    if not exists:
+        rebuild_search_index(connection)
+
+
+@contextmanager
+def deferred_indexing(connection, table):
+    """Index the rows inserted into a source table inside the block with one statement at the end.
+
+    FTS5 inserts made by a trigger once per row cost several times more than
+    one INSERT ... SELECT. The flag that switches the trigger off is a row in
+    the caller's transaction, so other connections never see it, and it is
+    rolled back along with the inserts if the block fails. Writing it first
+    also takes SQLite's write lock, so no other rows can arrive in between.
+    """
+    if connection.dialect.name != 'sqlite':
+        yield
+        return
+
+    connection.execute(text(f"INSERT INTO {DEFERRED_TABLE}(source) VALUES (:table)"), {'table': table})
+    last_id = connection.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+    yield
+    _index_rows(connection, table, after_id=last_id)
+    connection.execute(text(f"DELETE FROM {DEFERRED_TABLE} WHERE source = :table"), {'table': table})
+
+
+@event.listens_for(db.metadata, 'after_create')
+def create_search_index_with_tables(target, connection, **kw):
+    create_search_index(connection)
+
+
+def match_expression(query):
+    """FTS5 MATCH expression for free text: every word must match, the last one as a prefix"""
+    words = _WORD.findall(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def _time_entry_details(entry_ids):
+    """Date, client and invoice of the given time entries, by id"""
+    if not entry_ids:
+        return {}
+    rows = db.session.execute(
+        select(TimeEntry.id, TimeEntry.date, Client.name, TimeEntry.invoice_id, Invoice.invoice_number)
+        .join(Client, TimeEntry.client_id == Client.id)
+        .outerjoin(Invoice, TimeEntry.invoice_id == Invoice.id)
+        .where(TimeEntry.id.in_(entry_ids))
+    )
+    return {
+        entry_id: {'date': entry_date.isoformat(), 'client': client, 'invoice_id': invoice_id,
+                   'invoice_number': invoice_number}
+        for entry_id, entry_date, client, invoice_id, invoice_number in rows
+    }
+
+
+def search(query, kind=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Return (results, has_more, ranked) for one page of the best matches of a free text query.
+
+    Each result is a dict with the kind and id of the matching row, its title
+    and a snippet of its body. Time entries also carry their date, client and
+    invoice. ranked is False when there were too many matches to score and
+    the most recently added ones come first.
+    """
+    match = match_expression(query)
+    if match is None:
+        return [], False, True
+
+    conditions = f"{SEARCH_TABLE} MATCH :match"
+    params = {'match': match}
+    if kind:
+        conditions += f" AND rowid % {KIND_CODES} = :code"
+        params['code'] = SEARCH_SOURCES[kind].code
+
+    # Counting up to the limit in rowid order stops early, however common the words are
+    matches = len(db.session.execute(text(
+        f"SELECT rowid FROM {SEARCH_TABLE} WHERE {conditions} ORDER BY rowid DESC LIMIT :limit"
+    ), dict(params, limit=RANKED_MATCH_LIMIT + 1)).all())
+    ranked = matches <= RANKED_MATCH_LIMIT
+
+    rows = db.session.execute(text(
+        f"SELECT rowid, title, snippet({SEARCH_TABLE}, 1, '', '', '...', 12) FROM {SEARCH_TABLE} "
+        f"WHERE {conditions} ORDER BY {'rank' if ranked else 'rowid DESC'} LIMIT :limit OFFSET :offset"
+    ), dict(params, limit=per_page + 1, offset=(page - 1) * per_page)).all()
+
+    results = [
+        {'kind': KINDS_BY_CODE[rowid % KIND_CODES], 'id': rowid // KIND_CODES, 'title': title,
+         'snippet': snippet.strip() if snippet else snippet}
+        for rowid, title, snippet in rows[:per_page]
+    ]
+    details = _time_entry_details([result['id'] for result in results if result['kind'] == 'time_entry'])
+    for result in results:
+        if result['kind'] == 'time_entry':
+            result.update(details.get(result['id'], {}))
+    return results, len(rows) > per_page, ranked
@@ -0,0 +1,215 @@
+"""Per-request SQL profiling and N+1 detection.
+
+Engine events count and time every statement executed while a request is
+handled, grouped by fingerprint: the SQL with its whitespace collapsed and
+literals and IN lists folded, so the same query with other parameters has
+the same fingerprint. A fingerprint run repeat_threshold or more times in one
+request is reported as a likely N+1 pattern, such as a relationship lazy
+loaded once per row of a listing.
+
+A request that runs more queries than its budget, takes longer than slow_ms
+in the database or repeats a statement is logged as a warning. In strict
+mode a request over its budget raises QueryBudgetExceeded instead, so a test
+suite run with SQL_PROFILER_STRICT=1 fails on routes that regress. Views
+declare their own budget with @query_budget(n); the rest use query_budget
+from the SQL_PROFILER config. Totals per endpoint and the most recent
+flagged requests are kept in memory for the /debug/perf page.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+
+logger = logging.getLogger(__name__)
+
+# Flagged requests kept for the /debug/perf page
+RECENT_REQUESTS = 50
+
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_WHITESPACE = re.compile(r'\s+')
+_SELECT_LIST = re.compile(r'^SELECT .*? FROM ')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a request runs more queries than its budget"""
+
+
+def fingerprint(statement):
+    """The statement with literals and IN lists replaced by ?, for grouping repeats of the same query"""
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return _IN_LIST.sub('(?)', statement)
+
+
+def _summary(statement, length=200):
+    """A fingerprint shortened for logs: the column list of a SELECT is elided"""
+    statement = _SELECT_LIST.sub('SELECT ... FROM ', statement)
+    return statement if len(statement) <= length else statement[:length] + '...'
+
+
+def query_budget(queries):
+    """Decorate a view with the number of queries it may run per request"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.sql_query_budget = queries
+            return view(*args, **kwargs)
+        wrapper.query_budget = queries
+        return wrapper
+    return decorator
+
+
+def _settings():
+    return current_app.config['SQL_PROFILER']
+
+
+def _profiling():
+    return has_request_context() and 'sql_profile' in g
+
+
+class EndpointStats:
+    """Running totals of the requests served by one endpoint"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+        self.max_db_ms = 0.0
+        self.flagged = 0
+
+    def add(self, profile):
+        self.requests += 1
+        self.queries += profile['queries']
+        self.max_queries = max(self.max_queries, profile['queries'])
+        self.db_ms += profile['db_ms']
+        self.max_db_ms = max(self.max_db_ms, profile['db_ms'])
+        self.flagged += bool(profile['problems'])
+
+    def summary(self):
+        return {
+            'endpoint': self.endpoint,
+            'requests': self.requests,
+            'avg_queries': round(self.queries / self.requests, 1),
+            'max_queries': self.max_queries,
+            'avg_db_ms': round(self.db_ms / self.requests, 2),
+            'max_db_ms': round(self.max_db_ms, 2),
+            'flagged': self.flagged,
+        }
+
+
+class ProfileLog:
+    """Per-endpoint totals and the most recent flagged requests of this process"""
+
+    def __init__(self, maxlen=RECENT_REQUESTS):
+        self._endpoints = {}
+        self._recent = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            stats = self._endpoints.get(profile['endpoint'])
+            if stats is None:
+                stats = self._endpoints[profile['endpoint']] = EndpointStats(profile['endpoint'])
+            stats.add(profile)
+            if profile['problems']:
+                self._recent.appendleft(profile)
+
+    def endpoints(self):
+        """Endpoint summaries, the most queries per request first"""
+        with self._lock:
+            summaries = [stats.summary() for stats in self._endpoints.values()]
+        return sorted(summaries, key=lambda summary: (-summary['max_queries'], summary['endpoint']))
+
+    def recent(self):
+        with self._lock:
+            return list(self._recent)
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._recent.clear()
+
+
+profile_log = ProfileLog()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if _profiling():
+        conn.info.setdefault('sql_profiler_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    if not _profiling():
+        return
+    starts = conn.info.get('sql_profiler_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    profile = g.sql_profile
+    profile['queries'] += 1
+    profile['db_seconds'] += elapsed
+    profile['fingerprints'][fingerprint(statement)] += 1
+
+
+@app.before_request
+def start_request_profile():
+    if _settings()['enabled']:
+        g.sql_profile = {'queries': 0, 'db_seconds': 0.0, 'fingerprints': Counter(), 'started': time.perf_counter()}
+
+
+@app.after_request
+def finish_request_profile(response):
+    if not _profiling():
+        return response
+    settings = _settings()
+    raw = g.pop('sql_profile')
+    budget = g.get('sql_query_budget', settings['query_budget'])
+
+    repeated = [(_summary(statement), count) for statement, count in raw['fingerprints'].most_common()
+                if count >= settings['repeat_threshold']]
+    db_ms = raw['db_seconds'] * 1000
+    problems = []
+    if raw['queries'] > budget:
+        problems.append(f"{raw['queries']} queries, budget {budget}")
+    if db_ms > settings['slow_ms']:
+        problems.append(f"{db_ms:.0f} ms in the database")
+    for statement, count in repeated:
+        problems.append(f"likely N+1: ran {count} times: {statement}")
+
+    profile = {
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint or request.path,
+        'status': response.status_code,
+        'queries': raw['queries'],
+        'budget': budget,
+        'db_ms': round(db_ms, 2),
+        'total_ms': round((time.perf_counter() - raw['started']) * 1000, 2),
+        'repeated': repeated,
+        'problems': problems,
+    }
+    profile_log.add(profile)
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{raw["queries"]} queries"')
+
+    if problems:
+        logger.warning('%s %s: %s', profile['method'], profile['path'], '; '.join(problems))
+    if settings['strict'] and raw['queries'] > budget:
+        raise QueryBudgetExceeded(
+            f"{profile['method']} {profile['path']} ran {raw['queries']} queries, budget {budget}"
+            + ''.join(f"\n  {count} x {_summary(statement)}" for statement, count in raw['fingerprints'].most_common(5)))
+    return response
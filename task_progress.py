@@ -0,0 +1,87 @@
+"""Hours and amounts logged against tasks, next to their estimates.
+
+The logged hours and amounts of the listed tasks are summed from the daily
+rollup in one grouped subquery that is outer-joined to the task listing, so a
+list of any number of tasks is a single query and never loads
+task.time_entries. The ix_daily_rollup_task_hours index covers the sums.
+Over-budget filtering, the sort orders and paging are applied in SQL as
+well; when the sort does not depend on progress, only the tasks of the
+requested page are summed.
+"""
+from collections import namedtuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import joinedload
+
+from app import db
+from models import DailyRollup, Task
+
+# Amount is the value of all time logged, billed_amount the part of it already invoiced
+TaskProgress = namedtuple('TaskProgress', ['logged_hours', 'amount', 'billed_amount', 'percent'])
+
+TASK_SORTS = ['priority', 'due_date', 'progress', 'logged_hours']
+
+# Sorts that only need task columns, so a page of tasks can be picked before any progress is summed
+TASK_ORDERS = {
+    'priority': [Task.priority.desc(), Task.due_date],
+    'due_date': [Task.due_date.is_(None), Task.due_date, Task.priority.desc()],
+}
+
+
+def _progress_subquery(task_ids=None):
+    """Logged hours and amounts per task, summed only for the ids of the task_ids select if given"""
+    query = select(
+        DailyRollup.task_id,
+        func.sum(DailyRollup.hours).label('logged_hours'),
+        func.sum(DailyRollup.billed_amount + DailyRollup.unbilled_amount).label('amount'),
+        func.sum(DailyRollup.billed_amount).label('billed_amount'),
+    ).where(DailyRollup.task_id != 0)
+    if task_ids is not None:
+        # A filtered list or a page sums the rollup rows of its own tasks instead of every task's
+        query = query.where(DailyRollup.task_id.in_(task_ids))
+    return query.group_by(DailyRollup.task_id).subquery('task_progress')
+
+
+def tasks_with_progress(*conditions, over_budget=False, sort='priority', limit=None, offset=0):
+    """List of (task, TaskProgress) for the tasks matching conditions, with their clients loaded.
+
+    percent is the logged hours as a percentage of the estimate, None for
+    tasks without an estimate. over_budget keeps only tasks that have logged
+    more than their estimate. sort is one of TASK_SORTS, and limit and offset
+    select a page of the sorted tasks.
+    """
+    task_ids = None
+    if sort in TASK_ORDERS and not over_budget and limit is not None:
+        task_ids = select(Task.id).where(*conditions).order_by(*TASK_ORDERS[sort], Task.id).limit(limit).offset(offset)
+    elif conditions:
+        task_ids = select(Task.id).where(*conditions)
+
+    progress = _progress_subquery(task_ids)
+    logged_hours = func.coalesce(progress.c.logged_hours, 0.0)
+    percent = case((Task.estimated_hours > 0, logged_hours * 100 / Task.estimated_hours))
+
+    query = select(
+        Task, logged_hours, func.coalesce(progress.c.amount, 0), func.coalesce(progress.c.billed_amount, 0), percent
+    ).outerjoin(progress, progress.c.task_id == Task.id).options(joinedload(Task.client)).where(*conditions)
+
+    if over_budget:
+        query = query.where(Task.estimated_hours > 0, logged_hours > Task.estimated_hours)
+
+    orders = {
+        **TASK_ORDERS,
+        'progress': [percent.is_(None), percent.desc(), Task.priority.desc()],
+        'logged_hours': [logged_hours.desc(), Task.priority.desc()],
+    }
+    query = query.order_by(*orders[sort], Task.id).limit(limit).offset(offset)
+
+    return [(task, TaskProgress(round(hours, 2), amount, billed_amount, None if pct is None else round(pct, 1)))
+            for task, hours, amount, billed_amount, pct in db.session.execute(query)]
+
+
+def task_counts(*conditions):
+    """Number of tasks matching conditions by (status, priority), from one GROUP BY"""
+    return {
+        (status, priority): count for status, priority, count in db.session.execute(
+            select(Task.status, Task.priority, func.count(Task.id)).where(*conditions)
+            .group_by(Task.status, Task.priority))
+    }
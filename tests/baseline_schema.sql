@@ -0,0 +1,139 @@
+-- Schema of a database created before the performance work, for the migration tests
+CREATE TABLE client (
+	id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	address TEXT, 
+	city VARCHAR(50), 
+	province VARCHAR(50), 
+	postal_code VARCHAR(20), 
+	phone VARCHAR(20), 
+	email VARCHAR(100), 
+	contact_person VARCHAR(100), 
+	hourly_rate FLOAT NOT NULL, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+
+CREATE TABLE company_settings (
+	id INTEGER NOT NULL, 
+	company_name VARCHAR(100) NOT NULL, 
+	address TEXT, 
+	city VARCHAR(50), 
+	province VARCHAR(50), 
+	postal_code VARCHAR(20), 
+	phone VARCHAR(20), 
+	email VARCHAR(100), 
+	website VARCHAR(100), 
+	tax_number VARCHAR(50), 
+	default_hst_rate FLOAT NOT NULL, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+
+CREATE TABLE hourly_rate (
+	id INTEGER NOT NULL, 
+	client_id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	rate FLOAT NOT NULL, 
+	is_default BOOLEAN, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES client (id)
+);
+
+CREATE TABLE invoice (
+	id INTEGER NOT NULL, 
+	invoice_number VARCHAR(20) NOT NULL, 
+	client_id INTEGER NOT NULL, 
+	date_issued DATE NOT NULL, 
+	date_due DATE, 
+	subtotal FLOAT NOT NULL, 
+	hst_rate FLOAT NOT NULL, 
+	hst_amount FLOAT NOT NULL, 
+	total FLOAT NOT NULL, 
+	status VARCHAR(20) NOT NULL, 
+	notes TEXT, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	UNIQUE (invoice_number), 
+	FOREIGN KEY(client_id) REFERENCES client (id)
+);
+
+CREATE TABLE task (
+	id INTEGER NOT NULL, 
+	title VARCHAR(200) NOT NULL, 
+	description TEXT, 
+	client_id INTEGER NOT NULL, 
+	status VARCHAR(20) NOT NULL, 
+	priority INTEGER NOT NULL, 
+	due_date DATE, 
+	estimated_hours FLOAT, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES client (id)
+);
+
+CREATE TABLE quote (
+	id INTEGER NOT NULL, 
+	quote_number VARCHAR(20) NOT NULL, 
+	client_id INTEGER NOT NULL, 
+	date_issued DATE NOT NULL, 
+	date_valid_until DATE, 
+	subtotal FLOAT NOT NULL, 
+	hst_rate FLOAT NOT NULL, 
+	hst_amount FLOAT NOT NULL, 
+	total FLOAT NOT NULL, 
+	status VARCHAR(20) NOT NULL, 
+	notes TEXT, 
+	invoice_id INTEGER, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	UNIQUE (quote_number), 
+	FOREIGN KEY(client_id) REFERENCES client (id), 
+	FOREIGN KEY(invoice_id) REFERENCES invoice (id)
+);
+
+CREATE TABLE time_entry (
+	id INTEGER NOT NULL, 
+	client_id INTEGER NOT NULL, 
+	location VARCHAR(100), 
+	item VARCHAR(100) NOT NULL, 
+	task_id INTEGER, 
+	date DATE NOT NULL, 
+	time_in TIME NOT NULL, 
+	time_out TIME NOT NULL, 
+	total_hours FLOAT NOT NULL, 
+	hourly_rate FLOAT NOT NULL, 
+	invoice_id INTEGER, 
+	quote_id INTEGER, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES client (id), 
+	FOREIGN KEY(task_id) REFERENCES task (id), 
+	FOREIGN KEY(invoice_id) REFERENCES invoice (id), 
+	FOREIGN KEY(quote_id) REFERENCES quote (id)
+);
+
+CREATE TABLE calendar_event (
+	id INTEGER NOT NULL, 
+	title VARCHAR(200) NOT NULL, 
+	location VARCHAR(200), 
+	all_day BOOLEAN, 
+	start_time DATETIME NOT NULL, 
+	end_time DATETIME NOT NULL, 
+	client_id INTEGER NOT NULL, 
+	task_id INTEGER, 
+	is_billable BOOLEAN, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES client (id), 
+	FOREIGN KEY(task_id) REFERENCES task (id)
+);
@@ -0,0 +1,79 @@
+"""Fixtures for tests run against a scratch SQLite database.
+
+app.py reads its settings from the environment when it is imported, so the
+database URI is pointed at a temporary directory before anything imports it.
+Each test gets a freshly created database and empty process-local caches,
+and the SQL profiler runs in strict mode so a request over its query budget
+fails the test.
+"""
+import os
+import tempfile
+from datetime import time
+
+_DB_DIR = tempfile.mkdtemp(prefix='timetracker-tests-')
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(_DB_DIR, 'timetracker.db')
+
+import pytest  # noqa: E402
+
+from app import app as flask_app, db  # noqa: E402
+import routes  # noqa: E402,F401
+from cache import caches  # noqa: E402
+from models import Client, CompanySettings, TimeEntry  # noqa: E402
+
+
+def remove_database():
+    """Close every connection and delete the database file with its WAL files"""
+    db.session.remove()
+    db.engine.dispose()
+    for suffix in ('', '-wal', '-shm'):
+        path = db.engine.url.database + suffix
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True)
+    flask_app.config['SQL_PROFILER'] = {**flask_app.config['SQL_PROFILER'], 'enabled': True, 'strict': True}
+    with flask_app.app_context():
+        remove_database()
+        db.create_all()
+        for cache in caches:
+            cache.clear()
+        yield flask_app
+        remove_database()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def company(app):
+    settings = CompanySettings(company_name='Test Company', default_hst_rate=13.0)
+    db.session.add(settings)
+    db.session.commit()
+    return settings
+
+
+@pytest.fixture
+def make_client(app):
+    def make(name='Acme', hourly_rate=100.0):
+        client = Client(name=name, hourly_rate=hourly_rate)
+        db.session.add(client)
+        db.session.commit()
+        return client
+    return make
+
+
+@pytest.fixture
+def make_entry(app):
+    def make(client, day, hours=1.0, rate=None, **fields):
+        entry = TimeEntry(client_id=client.id, item=fields.pop('item', 'Work'), date=day, time_in=time(9),
+                          time_out=time(9 + int(hours)), total_hours=hours,
+                          hourly_rate=client.hourly_rate if rate is None else rate, **fields)
+        db.session.add(entry)
+        db.session.commit()
+        return entry
+    return make
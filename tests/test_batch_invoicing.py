@@ -0,0 +1,103 @@
+from datetime import date
+from functools import partial
+
+import pytest
+
+import billing
+import routes
+from app import db
+from billing import BatchInvoicingError, invoice_billing_period
+from models import Invoice, TimeEntry
+
+PERIOD = (date(2025, 1, 1), date(2025, 1, 31))
+
+
+def run_batch(**kwargs):
+    return invoice_billing_period(*PERIOD, date(2025, 2, 1), date(2025, 3, 3), 0.13, **kwargs)
+
+
+def test_invoices_each_client_with_unbilled_entries(make_client, make_entry):
+    acme, globex = make_client('Acme', 100.0), make_client('Globex', 80.0)
+    make_entry(acme, date(2025, 1, 5), hours=2.0)
+    make_entry(acme, date(2025, 1, 6), hours=1.5)
+    make_entry(globex, date(2025, 1, 7), hours=1.0)
+    make_entry(globex, date(2025, 2, 1), hours=1.0)  # outside the period
+
+    created = run_batch()
+
+    assert [(invoice['client'], invoice['entries'], invoice['subtotal']) for invoice in created] == [
+        ('Acme', 2, 350.0), ('Globex', 1, 80.0)]
+    assert [invoice.invoice_number for invoice in Invoice.query.order_by(Invoice.id)] == ['INV-0001', 'INV-0002']
+    assert TimeEntry.query.filter(TimeEntry.invoice_id.is_(None)).count() == 1
+    assert run_batch() == []
+
+
+def test_client_billed_after_the_totals_were_read_gets_no_invoice(make_client, make_entry, monkeypatch):
+    acme, globex = make_client('Acme'), make_client('Globex')
+    acme_entry = make_entry(acme, date(2025, 1, 5))
+    make_entry(globex, date(2025, 1, 6))
+
+    stale_totals = billing.unbilled_period_totals(*PERIOD)
+    billing.create_invoice_for_entries(acme.id, [acme_entry.id], date(2025, 2, 1), None, 0.13)
+    db.session.commit()
+    monkeypatch.setattr(billing, 'unbilled_period_totals', lambda start, end: stale_totals)
+
+    created = run_batch()
+
+    assert [invoice['client'] for invoice in created] == ['Globex']
+    # The number taken for Acme's empty invoice was given back
+    assert [invoice.invoice_number for invoice in Invoice.query.order_by(Invoice.id)] == ['INV-0001', 'INV-0002']
+    assert Invoice.query.filter(Invoice.subtotal == 0).count() == 0
+
+
+@pytest.fixture
+def failing_third_invoice(make_client, make_entry, monkeypatch):
+    for name in ['Acme', 'Globex', 'Initech']:
+        make_entry(make_client(name), date(2025, 1, 5))
+
+    create_invoice = billing._create_invoice
+    calls = []
+
+    def fail_on_third(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 3:
+            raise RuntimeError('disk full')
+        return create_invoice(*args, **kwargs)
+
+    monkeypatch.setattr(billing, '_create_invoice', fail_on_third)
+
+
+def test_failure_keeps_only_the_committed_invoices(failing_third_invoice):
+    with pytest.raises(BatchInvoicingError) as raised:
+        run_batch(clients_per_transaction=2)
+
+    assert [invoice['client'] for invoice in raised.value.committed] == ['Acme', 'Globex']
+    assert [invoice.invoice_number for invoice in Invoice.query.order_by(Invoice.id)] == ['INV-0001', 'INV-0002']
+
+
+def test_failure_before_any_commit_keeps_nothing(failing_third_invoice):
+    with pytest.raises(BatchInvoicingError) as raised:
+        run_batch(clients_per_transaction=5)
+
+    assert raised.value.committed == []
+    assert Invoice.query.count() == 0
+    assert TimeEntry.query.filter(TimeEntry.invoice_id.isnot(None)).count() == 0
+
+
+def _post_batch(client):
+    response = client.post('/invoices/batch', data={
+        'period_start': '2025-01-01', 'period_end': '2025-01-31', 'date_issued': '2025-02-01'})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        (category, message), = session['_flashes']
+    assert category == 'danger'
+    return message
+
+
+def test_batch_page_reports_the_committed_invoices(client, company, failing_third_invoice, monkeypatch):
+    monkeypatch.setattr(routes, 'invoice_billing_period', partial(invoice_billing_period, clients_per_transaction=2))
+    assert 'The 2 invoices committed before the error (INV-0001 to INV-0002) were kept' in _post_batch(client)
+
+
+def test_batch_page_reports_when_nothing_was_committed(client, company, failing_third_invoice):
+    assert _post_batch(client) == 'Error creating invoices: disk full. No invoices were created.'
@@ -0,0 +1,54 @@
+import io
+import zipfile
+from datetime import date
+
+import pytest
+
+import bulk_export
+from app import db
+from bulk_export import matching_invoice_ids, stream_invoice_zip
+from models import Invoice
+
+
+class InProcessExecutor:
+    """Stands in for the worker pool, rendering in the test's own process and database"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def map(self, function, items):
+        return map(function, items)
+
+    def shutdown(self, cancel_futures=False):
+        pass
+
+
+@pytest.fixture
+def invoices(make_client, company):
+    acme = make_client()
+    invoices = [Invoice(invoice_number=f'INV-{number}', client_id=acme.id, date_issued=date(2025, 1, number))
+                for number in range(1, 4)]
+    db.session.add_all(invoices)
+    db.session.commit()
+    return invoices
+
+
+@pytest.fixture
+def in_process(monkeypatch, tmp_path):
+    def cached_pdf(kind, invoice, company, write):
+        path = tmp_path / f'{invoice.id}.pdf'
+        path.write_bytes(f'PDF of {invoice.invoice_number}'.encode())
+        return str(path), None
+
+    monkeypatch.setattr(bulk_export, 'ProcessPoolExecutor', InProcessExecutor)
+    monkeypatch.setattr(bulk_export, 'cached_pdf', cached_pdf)
+
+
+def test_invoices_deleted_during_the_export_are_skipped(invoices, in_process):
+    invoice_ids = matching_invoice_ids()
+    db.session.delete(invoices[1])
+    db.session.commit()
+
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_invoice_zip(invoice_ids))))
+    assert archive.namelist() == ['Invoice_INV-1.pdf', 'Invoice_INV-3.pdf']
+    assert archive.read('Invoice_INV-3.pdf') == b'PDF of INV-3'
@@ -0,0 +1,77 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event, update
+
+from app import db
+from cache import VersionedCache, caches, current_versions
+from models import Client, TimeEntry
+
+TABLES = ['client', 'time_entry']
+
+
+@pytest.fixture
+def version_updates(app):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE data_version'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def lookup(app):
+    cache = VersionedCache('test_lookup', TABLES)
+    yield cache
+    caches.remove(cache)
+
+
+def test_versions_move_once_per_transaction(make_client, make_entry, version_updates):
+    acme = make_client()
+    make_entry(acme, date(2025, 1, 6))
+    before = current_versions(TABLES)
+    version_updates.clear()
+
+    for day in range(7, 10):
+        db.session.add(TimeEntry(client_id=acme.id, item='Work', date=date(2025, 1, day), time_in=time(9),
+                                 time_out=time(10), total_hours=1.0, hourly_rate=100.0))
+        db.session.flush()
+    db.session.execute(update(Client).values(city='Toronto'))
+    db.session.commit()
+
+    assert len(version_updates) == 1
+    assert current_versions(TABLES) == tuple(version + 1 for version in before)
+
+
+def test_rolled_back_writes_bump_nothing(make_client, version_updates):
+    acme = make_client()
+    before = current_versions(TABLES)
+    version_updates.clear()
+
+    acme.name = 'Renamed'
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+
+    assert version_updates == []
+    assert current_versions(TABLES) == before
+
+
+def test_uncommitted_writes_are_computed_but_not_stored(make_client, lookup):
+    acme = make_client()
+    assert lookup.get(lambda: 'committed') == 'committed'
+
+    acme.name = 'Renamed'
+    db.session.flush()
+    assert lookup.get(lambda: 'pending') == 'pending'
+
+    db.session.rollback()
+    assert lookup.get(lambda: 'recomputed') == 'committed'
+
+    acme.name = 'Renamed'
+    db.session.commit()
+    assert lookup.get(lambda: 'recomputed') == 'recomputed'
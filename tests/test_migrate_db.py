@@ -0,0 +1,63 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import migrate_db
+from app import db
+from conftest import remove_database
+
+BASELINE_SCHEMA = Path(__file__).with_name('baseline_schema.sql')
+
+
+@pytest.fixture
+def baseline_db(app):
+    """Replace the test database with one in the schema from before the money, index and batch API changes"""
+    remove_database()
+    conn = sqlite3.connect(db.engine.url.database)
+    conn.executescript(BASELINE_SCHEMA.read_text())
+    conn.execute("INSERT INTO company_settings (id, company_name, default_hst_rate) VALUES (1, 'Test Company', 13.0)")
+    conn.execute("INSERT INTO client (id, name, hourly_rate) VALUES (1, 'Acme', 85.5)")
+    conn.execute("INSERT INTO hourly_rate (id, client_id, name, rate, is_default) VALUES (1, 1, 'Default', 85.5, 1)")
+    conn.execute(
+        "INSERT INTO time_entry (id, client_id, location, item, date, time_in, time_out, total_hours, hourly_rate) "
+        "VALUES (1, 1, 'Office', 'Design', '2025-01-10', '09:00:00.000000', '10:30:00.000000', 1.5, 85.5)")
+    conn.commit()
+    conn.close()
+    return db.engine.url.database
+
+
+def _columns(conn, table):
+    return {row[1]: row for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_migrates_baseline_database(baseline_db, app, client):
+    assert migrate_db.migrate_database()
+
+    conn = sqlite3.connect(baseline_db)
+    columns = _columns(conn, 'time_entry')
+    assert columns['idempotency_key'][3] == 0  # nullable, so existing rows need no key
+    assert columns['hourly_rate'][2] == 'INTEGER'
+    assert conn.execute("SELECT hourly_rate, amount FROM time_entry WHERE id = 1").fetchone() == (8550, 12825)
+    indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(time_entry)")}
+    assert indexes['ix_time_entry_idempotency_key'] == 1
+    conn.close()
+    assert migrate_db.validate_schema(baseline_db)
+
+    # The pages can read the migrated tables
+    for path in ['/', '/time-entries', '/reports?start_date=2025-01-01&end_date=2025-01-31']:
+        assert client.get(path).status_code == 200, path
+
+
+def test_migrating_twice_changes_nothing(baseline_db):
+    assert migrate_db.migrate_database()
+    assert migrate_db.migrate_database()
+
+    conn = sqlite3.connect(baseline_db)
+    assert conn.execute("SELECT hourly_rate, amount FROM time_entry WHERE id = 1").fetchone() == (8550, 12825)
+    conn.close()
+
+
+def test_reports_failure_when_schema_cannot_be_fixed(baseline_db, monkeypatch):
+    monkeypatch.setattr(migrate_db, 'fix_schema', lambda db_path: False)
+    assert migrate_db.migrate_database() is False
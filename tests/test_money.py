@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select, text
+
+from app import db
+from billing import create_invoice_for_entries
+from models import Invoice, TimeEntry
+from money import line_amount, round_to_cent, to_cents
+
+
+@pytest.mark.parametrize('amount, cents', [
+    (0, 0), (0.1, 10), (19.99, 1999), (0.005, 1), (0.015, 2), (2.675, 268), (-0.005, -1), (1234567.89, 123456789)])
+def test_to_cents_rounds_half_a_cent_up(amount, cents):
+    assert to_cents(amount) == cents
+
+
+@pytest.mark.parametrize('hours, rate, amount', [(1.5, 85.5, 128.25), (0.333, 100.0, 33.3), (2.25, 33.33, 74.99)])
+def test_line_amount_is_rounded_to_the_cent(hours, rate, amount):
+    assert line_amount(hours, rate) == amount
+
+
+def test_amounts_round_trip_through_integer_columns(make_client, make_entry):
+    entry = make_entry(make_client(hourly_rate=85.5), date(2025, 1, 5), hours=1.5)
+    db.session.expire_all()
+
+    stored = db.session.execute(
+        text('SELECT hourly_rate, amount FROM time_entry WHERE id = :id'), {'id': entry.id}).one()
+    assert tuple(stored) == (8550, 12825)
+    assert (entry.hourly_rate, entry.amount) == (85.5, 128.25)
+
+
+def test_sums_are_exact(make_client, make_entry):
+    client = make_client(hourly_rate=0.1)
+    for day in range(1, 31):
+        make_entry(client, date(2025, 1, day))
+
+    # 30 x $0.10 adds up to 3.0000000000000004 in floats
+    assert db.session.execute(select(func.sum(TimeEntry.amount))).scalar() == 3.0
+
+
+def test_invoice_totals_are_whole_cents(make_client, make_entry):
+    client = make_client(hourly_rate=33.33)
+    entries = [make_entry(client, date(2025, 1, day), hours=hours) for day, hours in [(6, 1.0), (7, 2.25), (8, 0.5)]]
+
+    invoice = create_invoice_for_entries(client.id, [entry.id for entry in entries], date(2025, 2, 1), None, 0.13)
+    db.session.commit()
+    db.session.expire_all()
+
+    invoice = db.session.get(Invoice, invoice.id)
+    assert invoice.subtotal == sum(entry.amount for entry in entries) == 124.99
+    assert invoice.hst_amount == round_to_cent(124.99 * 0.13) == 16.25
+    assert invoice.total == 141.24
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from app import app as flask_app, db
+from billing import create_invoice_for_entries, create_quote_for_entries
+from models import Invoice, Quote
+from numbering import next_document_number
+
+
+def invoice_numbers():
+    return [number for (number,) in db.session.query(Invoice.invoice_number).order_by(Invoice.invoice_number)]
+
+
+def test_invoices_and_quotes_are_numbered_separately(make_client, make_entry):
+    client = make_client()
+    entries = [make_entry(client, date(2025, 1, day)) for day in range(1, 5)]
+
+    for entry in entries[:2]:
+        create_invoice_for_entries(client.id, [entry.id], date(2025, 2, 1), None, 0.13)
+    for entry in entries[2:]:
+        create_quote_for_entries(client.id, [entry.id], date(2025, 2, 1), None, 0.13)
+    db.session.commit()
+
+    assert invoice_numbers() == ['INV-0001', 'INV-0002']
+    assert [quote.quote_number for quote in Quote.query.order_by(Quote.id)] == ['QUO-0001', 'QUO-0002']
+
+
+def test_failed_create_gives_its_number_back(make_client, make_entry):
+    client = make_client()
+    first, second = make_entry(client, date(2025, 1, 1)), make_entry(client, date(2025, 1, 2))
+    create_invoice_for_entries(client.id, [first.id], date(2025, 2, 1), None, 0.13)
+    db.session.commit()
+
+    # The entry is already invoiced, so the create fails after taking a number
+    with pytest.raises(ValueError):
+        create_invoice_for_entries(client.id, [first.id], date(2025, 2, 1), None, 0.13)
+    db.session.rollback()
+
+    create_invoice_for_entries(client.id, [second.id], date(2025, 2, 1), None, 0.13)
+    db.session.commit()
+    assert invoice_numbers() == ['INV-0001', 'INV-0002']
+
+
+def test_counter_starts_after_numbers_issued_before_it(make_client):
+    client = make_client()
+    for number in ['INV-0007', 'INV-0003', 'OLD-0042']:
+        db.session.add(Invoice(invoice_number=number, client_id=client.id, date_issued=date(2024, 1, 1)))
+    db.session.commit()
+
+    assert next_document_number('invoice') == 'INV-0008'
+    assert next_document_number('invoice') == 'INV-0009'
+
+
+def test_concurrent_workers_get_distinct_consecutive_numbers(app, make_client):
+    client_id = make_client().id
+
+    def create_invoices(count):
+        with flask_app.app_context():
+            for _ in range(count):
+                db.session.add(Invoice(invoice_number=next_document_number('invoice'), client_id=client_id,
+                                       date_issued=date(2025, 2, 1)))
+                db.session.commit()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(create_invoices, [5] * 4))
+
+    assert invoice_numbers() == [f'INV-{number:04d}' for number in range(1, 21)]
@@ -0,0 +1,153 @@
+"""Routes stay within their query budgets with more than a handful of rows.
+
+The conftest runs the SQL profiler in strict mode, so a request over its
+budget raises QueryBudgetExceeded out of the test client. The data has more
+clients than the profiler's repeat threshold, so a query run once per client
+or per row shows up as a budget failure rather than passing by luck. The bulk
+views run per-client queries by design; their budgets are sized for a batch
+of CLIENTS clients, which is what they are tested with.
+"""
+import io
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from app import db
+from billing import previous_month
+from models import CalendarEvent, Client, HourlyRate, Invoice, Quote, Task, TimeEntry
+from sql_profiler import QueryBudgetExceeded, query_budget
+
+# The bulk views' budgets are sized for batches covering this many clients
+CLIENTS = 20
+TODAY = date.today()
+PERIOD = previous_month(TODAY)
+
+
+@pytest.fixture
+def data(app, company):
+    """CLIENTS clients with rates, tasks, a calendar event and entries last month and this month"""
+    for number in range(CLIENTS):
+        client = Client(name=f'Client {number:02d}', hourly_rate=100.0)
+        db.session.add(client)
+        db.session.flush()
+        db.session.add_all([HourlyRate(client_id=client.id, name='Standard', rate=100.0, is_default=True),
+                            HourlyRate(client_id=client.id, name='Rush', rate=150.0)])
+        tasks = [Task(title=f'Task {number}-{status}', client_id=client.id, status=status, priority=1,
+                      estimated_hours=10.0) for status in ('todo', 'in_progress', 'completed')]
+        db.session.add_all(tasks)
+        db.session.flush()
+        for day in range(10):
+            for entry_date in (PERIOD[0] + timedelta(days=day), TODAY - timedelta(days=day % 5)):
+                db.session.add(TimeEntry(client_id=client.id, task_id=tasks[day % 3].id, item=f'Work {day}',
+                                         location='Office', date=entry_date, time_in=time(9), time_out=time(11),
+                                         total_hours=2.0, hourly_rate=100.0))
+        start = datetime.combine(TODAY, time(9))
+        db.session.add(CalendarEvent(title=f'Meeting {number}', client_id=client.id, task_id=tasks[0].id,
+                                     start_time=start, end_time=start + timedelta(hours=1)))
+    db.session.commit()
+
+
+def this_months_entries(client_id):
+    return [entry.id for entry in TimeEntry.query.filter(
+        TimeEntry.client_id == client_id, TimeEntry.date >= TODAY.replace(day=1)).order_by(TimeEntry.id)]
+
+
+def check(response):
+    assert response.status_code < 400, response.get_data(as_text=True)[:500]
+    response.get_data()
+    return response
+
+
+@pytest.mark.parametrize('path', [
+    '/', '/tasks', '/tasks?status=all', '/tasks/add', '/tasks/1/edit', '/timer', '/timer/task/1',
+    '/clients', '/clients/add', '/clients/1/edit',
+    '/time-entries', '/time-entries?client_id=2', '/time-entries/add', '/time-entries/1/edit',
+    '/time-entries/export?format=csv',
+    '/invoices', '/invoices/create', '/invoices/batch', '/get_unbilled_entries/1',
+    '/quotes', '/quotes/create', '/get_unquoted_entries/1',
+    '/reports', '/reports?rows=location&columns=week', '/api/reports?dimensions=client,week',
+    '/company-settings', '/calendar', '/api/calendar-events', '/api/search?q=work',
+])
+def test_pages_stay_within_budget(client, data, path):
+    check(client.get(path))
+
+
+def test_invoice_and_quote_routes_stay_within_budget(client, data):
+    check(client.post('/invoices/create', data={
+        'client_id': 1, 'date_issued': TODAY.isoformat(), 'time_entries': this_months_entries(1)}))
+    check(client.post('/quotes/create', data={
+        'client_id': 2, 'date_issued': TODAY.isoformat(), 'time_entries': this_months_entries(2)}))
+    invoice, quote = Invoice.query.one(), Quote.query.one()
+
+    check(client.get(f'/invoices/{invoice.id}'))
+    check(client.get(f'/quotes/{quote.id}'))
+    check(client.post(f'/invoices/{invoice.id}/update_status', data={'status': 'sent'}))
+    check(client.post(f'/quotes/{quote.id}/update_status', data={'status': 'accepted'}))
+    check(client.post(f'/quotes/{quote.id}/convert'))
+    check(client.post(f'/invoices/{invoice.id}/delete'))
+
+
+def test_entry_task_and_calendar_writes_stay_within_budget(client, data):
+    entry = {'client_id': 2, 'item': 'Review', 'location': 'Office', 'date': TODAY.isoformat(),
+             'time_in': '09:00', 'time_out': '10:30', 'total_hours': '1.5', 'hourly_rate': '100'}
+    check(client.post('/save-timer', data=entry))
+    check(client.post('/time-entries/add', data=entry))
+    check(client.post('/time-entries/1/edit', data=entry))
+    check(client.post('/time-entries/2/delete'))
+
+    task = {'title': 'Plan', 'client_id': 2, 'status': 'in_progress', 'priority': 2, 'due_date': '',
+            'estimated_hours': '3'}
+    check(client.post('/tasks/add', data=task))
+    check(client.post('/tasks/1/edit', data=task))
+    check(client.post('/tasks/2/delete'))
+
+    event_form = {'title': 'Call', 'client_id': 2, 'start_time': f'{TODAY}T09:00', 'end_time': f'{TODAY}T10:00',
+                  'is_billable': 'on'}
+    check(client.post('/calendar/add', data=event_form))
+    check(client.post('/calendar/edit/1', data=event_form))
+    check(client.post('/calendar/delete/2'))
+
+
+def test_client_writes_stay_within_budget(client, data):
+    form = {'name': 'Initech', 'address': '', 'city': '', 'province': '', 'postal_code': '', 'phone': '',
+            'email': '', 'contact_person': '', 'hourly_rate': '90'}
+    check(client.post('/clients/add', data={
+        **form, 'rate_names[]': ['Standard', 'Rush'], 'rate_values[]': ['90', '120'], 'default_rate': '0'}))
+    check(client.post('/clients/1/edit', data={
+        **form, 'rate_ids[]': ['1', ''], 'rate_names[]': ['Standard', 'Weekend'], 'rate_values[]': ['100', '110'],
+        'default_rate': '0'}))
+
+    # The delete cascades through every task, invoice and quote of the client
+    check(client.post('/invoices/create', data={
+        'client_id': 3, 'date_issued': TODAY.isoformat(), 'time_entries': this_months_entries(3)}))
+    check(client.post('/clients/3/delete'))
+    assert db.session.get(Client, 3) is None
+
+
+def test_bulk_writes_stay_within_budget(client, data):
+    names = [f'Client {number % CLIENTS:02d}' for number in range(5 * CLIENTS)]
+    rows = ''.join(f'{TODAY},13:00,14:00,Imported {number},{name}\n' for number, name in enumerate(names))
+    response = check(client.post('/time-entries/import', data={
+        'file': (io.BytesIO(f'date,time_in,time_out,item,client\n{rows}'.encode()), 'entries.csv')}))
+    assert response.json['imported'] == len(names)
+
+    entries = [{'date': TODAY.isoformat(), 'time_in': '15:00', 'time_out': '16:00', 'item': f'Synced {number}',
+                'client': name, 'idempotency_key': f'sync-{number}'} for number, name in enumerate(names)]
+    assert check(client.post('/api/time-entries/batch', json=entries)).json['created'] == len(names)
+
+    check(client.post('/invoices/batch', data={
+        'period_start': PERIOD[0].isoformat(), 'period_end': PERIOD[1].isoformat(),
+        'date_issued': TODAY.isoformat()}))
+    assert Invoice.query.count() == CLIENTS
+
+
+def test_strict_mode_raises_over_budget(client, data, monkeypatch):
+    @query_budget(1)
+    def two_queries():
+        Client.query.count()
+        Task.query.count()
+        return ''
+
+    monkeypatch.setitem(client.application.view_functions, 'clients', two_queries)
+    with pytest.raises(QueryBudgetExceeded, match='ran 2 queries, budget 1'):
+        client.get('/clients')
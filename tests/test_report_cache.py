@@ -0,0 +1,119 @@
+"""Cached reports are reused until a write they depend on commits, in this worker or another"""
+import io
+import sqlite3
+from datetime import date
+
+import pytest
+
+import cache
+from app import db
+from cache import VersionedCache
+from reporting import cached_report, report_cache
+from time_entry_import import import_time_entries
+
+TODAY = date.today()
+OPEN = (TODAY.replace(day=1), TODAY)
+CLOSED = (date(2025, 1, 1), date(2025, 1, 31))
+
+
+@pytest.fixture
+def acme(make_client):
+    return make_client('Acme', 100.0)
+
+
+@pytest.fixture
+def entries(acme, make_entry):
+    return make_entry(acme, TODAY, hours=2.0), make_entry(acme, date(2025, 1, 6), hours=3.0)
+
+
+def hours(period):
+    return cached_report(['client'], *period).totals[1]
+
+
+def test_repeated_reports_are_served_from_the_cache(entries):
+    hits, misses = report_cache.hits, report_cache.misses
+    first = cached_report(['client'], *OPEN)
+    assert cached_report('client', *OPEN) is first
+    assert (report_cache.hits - hits, report_cache.misses - misses) == (1, 1)
+
+
+def test_open_period_write_leaves_closed_reports_cached(entries):
+    open_entry, _ = entries
+    assert (hours(OPEN), hours(CLOSED)) == (2.0, 3.0)
+    closed = cached_report(['client'], *CLOSED)
+
+    open_entry.total_hours = 4.0
+    db.session.commit()
+
+    assert hours(OPEN) == 4.0
+    assert cached_report(['client'], *CLOSED) is closed
+
+
+def test_closed_period_write_refreshes_closed_reports(entries):
+    _, closed_entry = entries
+    assert hours(CLOSED) == 3.0
+
+    closed_entry.total_hours = 1.0
+    db.session.commit()
+    assert hours(CLOSED) == 1.0
+
+    import_time_entries(io.StringIO('date,time_in,time_out,item,client\n2025-01-20,09:00,11:00,Imported,Acme\n'))
+    db.session.commit()
+    assert hours(CLOSED) == 3.0
+
+
+def test_client_change_refreshes_both_caches(acme, entries):
+    assert cached_report(['client'], *OPEN).rows[0][0] == cached_report(['client'], *CLOSED).rows[0][0] == 'Acme'
+
+    acme.name = 'Acme Ltd'
+    db.session.commit()
+    assert cached_report(['client'], *OPEN).rows[0][0] == cached_report(['client'], *CLOSED).rows[0][0] == 'Acme Ltd'
+
+
+def test_uncommitted_writes_are_seen_but_not_cached(entries):
+    open_entry, _ = entries
+    cached = cached_report(['client'], *OPEN)
+
+    open_entry.total_hours = 5.0
+    db.session.flush()
+    assert hours(OPEN) == 5.0
+
+    db.session.rollback()
+    assert cached_report(['client'], *OPEN) is cached
+
+
+def test_commit_in_another_worker_refreshes_the_cache(entries):
+    assert hours(CLOSED) == 3.0
+    db.session.commit()
+
+    # Another process writes with its own connection, bumping the versions as cache.py would
+    other = sqlite3.connect(db.engine.url.database)
+    other.execute("UPDATE time_entry SET total_hours = 6.0 WHERE date = '2025-01-06'")
+    other.execute("UPDATE daily_rollup SET hours = 6.0 WHERE day = '2025-01-06'")
+    other.execute("UPDATE data_version SET version = version + 1 WHERE name = 'closed_period'")
+    other.commit()
+    other.close()
+
+    assert hours(CLOSED) == 6.0
+
+
+def test_least_recently_used_reports_are_evicted(app):
+    lru = VersionedCache('test_lru', ['time_entry'], maxsize=2)
+    try:
+        for key in ['a', 'b', 'a', 'c']:
+            lru.get(lambda: key.upper(), key=key)
+        assert lru.get(lambda: 'recomputed', key='a') == 'A'
+        assert lru.get(lambda: 'recomputed', key='b') == 'recomputed'
+    finally:
+        cache.caches.remove(lru)
+
+
+def test_open_period_reports_expire(entries, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: clock[0])
+    first = cached_report(['client'], *OPEN)
+
+    clock[0] += report_cache.ttl - 1
+    assert cached_report(['client'], *OPEN) is first
+    clock[0] += 2
+    assert cached_report(['client'], *OPEN) is not first
@@ -0,0 +1,87 @@
+import re
+from collections import defaultdict
+from datetime import date
+
+import pytest
+
+from app import db
+from models import Task
+from reporting import pivot, report_query, run_report
+
+START, END = date(2025, 1, 1), date(2025, 6, 30)
+
+
+@pytest.fixture
+def entries(make_client, make_entry):
+    acme = make_client('Acme', 100.0)
+    globex = make_client('Globex', 80.0)
+    install = Task(title='Install', client_id=acme.id)
+    db.session.add(install)
+    db.session.commit()
+
+    make_entry(acme, date(2025, 1, 6), hours=2.0, location='Site A', task_id=install.id)
+    make_entry(acme, date(2025, 1, 12), hours=1.0)
+    make_entry(acme, date(2025, 4, 1), hours=3.0, location='Site A')
+    make_entry(globex, date(2025, 1, 13), hours=2.0, rate=90.0, location='Site B')
+
+
+def grouped_from(dimensions):
+    return re.search(r'\bFROM (\w+)', str(report_query(dimensions, START, END))).group(1)
+
+
+def test_rollup_and_entries_give_the_same_totals(entries):
+    assert grouped_from(['client', 'task', 'month']) == 'daily_rollup'
+    assert grouped_from(['client', 'task', 'month', 'location']) == 'time_entry'
+
+    from_rollup = run_report(['client', 'task', 'month'], START, END)
+    from_entries = run_report(['client', 'task', 'month', 'location'], START, END)
+    assert from_rollup.totals == from_entries.totals
+    assert from_rollup.totals[:2] == (4, 8.0)
+
+    # Summing the location groups away gives the rollup's rows
+    merged = defaultdict(lambda: [0, 0.0, 0])
+    for *key, _, entry_count, hours, amount in from_entries.rows:
+        measures = merged[tuple(key)]
+        measures[0] += entry_count
+        measures[1] += hours
+        measures[2] += amount
+    assert from_rollup.rows == [(*key, *measures) for key, measures in merged.items()]
+
+
+def test_week_and_quarter_labels(entries):
+    weeks = run_report(['week'], START, END)
+    assert [(week, hours) for week, _, hours, _ in weeks.rows] == [
+        ('2025-01-06', 3.0), ('2025-01-13', 2.0), ('2025-03-31', 3.0)]
+
+    quarters = run_report(['quarter'], START, END)
+    assert [(quarter, hours) for quarter, _, hours, _ in quarters.rows] == [('2025-Q1', 5.0), ('2025-Q2', 3.0)]
+
+
+def test_report_api(client, entries):
+    response = client.get('/api/reports?dimensions=client,quarter&start_date=2025-01-01&end_date=2025-06-30')
+    assert response.status_code == 200
+    assert response.json['columns'] == ['client', 'quarter', 'entries', 'hours', 'amount']
+    assert [row[:4] for row in response.json['rows']] == [
+        ['Acme', '2025-Q1', 2, 3.0], ['Acme', '2025-Q2', 1, 3.0], ['Globex', '2025-Q1', 1, 2.0]]
+
+
+@pytest.mark.parametrize('dimensions, error', [
+    ('client,bogus', "Unknown report dimension 'bogus'"),
+    ('client,client', 'Each report dimension can only be used once'),
+])
+def test_report_api_rejects_bad_dimensions(client, dimensions, error):
+    response = client.get(f'/api/reports?dimensions={dimensions}')
+    assert response.status_code == 400
+    assert response.json['error'].startswith(error)
+
+
+def test_pivot_spreads_the_last_dimension(entries):
+    report = run_report(['client', 'location'], START, END)
+    column_keys, rows, column_totals = pivot(report)
+
+    assert column_keys == [None, 'Site A', 'Site B']
+    assert rows == [(('Acme',), [1.0, 5.0, None], 6.0), (('Globex',), [None, None, 2.0], 2.0)]
+    assert column_totals == [1.0, 5.0, 2.0]
+
+    _, entry_counts, _ = pivot(report, 'entries')
+    assert [cells for _, cells, _ in entry_counts] == [[1, 2, None], [None, None, 1]]
@@ -0,0 +1,132 @@
+"""The incrementally maintained rollup matches a rebuild from time_entry after every kind of write"""
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app import db
+from billing import create_invoice_for_entries, invoice_billing_period
+from models import DailyRollup, Invoice, Task, TimeEntry
+from rollup import rebuild_rollup
+
+
+def rollup_rows():
+    return sorted(tuple(row) for row in db.session.execute(select(
+        DailyRollup.client_id, DailyRollup.task_id, DailyRollup.day, DailyRollup.entry_count, DailyRollup.hours,
+        DailyRollup.unbilled_hours, DailyRollup.billed_amount, DailyRollup.unbilled_amount)))
+
+
+def assert_consistent():
+    maintained = rollup_rows()
+    rebuild_rollup(db.session.connection())
+    assert maintained == rollup_rows()
+    db.session.rollback()
+
+
+@pytest.fixture
+def acme(make_client):
+    return make_client('Acme', 100.0)
+
+
+@pytest.fixture
+def task(acme):
+    task = Task(title='Design', client_id=acme.id)
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+
+def test_added_entries(acme, task, make_entry):
+    make_entry(acme, date(2025, 1, 5), hours=2.0)
+    make_entry(acme, date(2025, 1, 5), hours=1.0, task_id=task.id)
+    make_entry(acme, date(2025, 1, 6), hours=3.0, rate=120.0)
+
+    assert_consistent()
+    assert rollup_rows() == [
+        (acme.id, 0, date(2025, 1, 5), 1, 2.0, 2.0, 0.0, 200.0),
+        (acme.id, 0, date(2025, 1, 6), 1, 3.0, 3.0, 0.0, 360.0),
+        (acme.id, task.id, date(2025, 1, 5), 1, 1.0, 1.0, 0.0, 100.0),
+    ]
+
+
+def test_entry_moved_to_another_day_client_and_task(acme, task, make_client, make_entry):
+    globex = make_client('Globex')
+    entry = make_entry(acme, date(2025, 1, 5))
+    make_entry(acme, date(2025, 1, 5))
+
+    entry.date = date(2025, 1, 9)
+    db.session.commit()
+    assert_consistent()
+
+    entry.client_id = globex.id
+    entry.total_hours = 4.0
+    db.session.commit()
+    assert_consistent()
+
+    entry.client_id, entry.task_id = acme.id, task.id
+    db.session.commit()
+    assert_consistent()
+
+
+def test_deleted_entries_tasks_and_invoices(acme, task, make_entry):
+    make_entry(acme, date(2025, 1, 5), task_id=task.id)
+    entry = make_entry(acme, date(2025, 1, 6))
+    invoice = create_invoice_for_entries(acme.id, [entry.id], date(2025, 2, 1), None, 0.13)
+    db.session.commit()
+    assert_consistent()
+
+    db.session.delete(task)
+    db.session.delete(invoice)
+    db.session.commit()
+    assert_consistent()
+    assert TimeEntry.query.filter(TimeEntry.task_id.isnot(None) | TimeEntry.invoice_id.isnot(None)).count() == 0
+
+    db.session.delete(entry)
+    db.session.commit()
+    assert_consistent()
+
+
+def test_invoiced_entries_move_to_billed(acme, make_client, make_entry):
+    globex = make_client('Globex')
+    for day in (5, 6, 7):
+        make_entry(acme, date(2025, 1, day))
+        make_entry(globex, date(2025, 1, day), hours=2.0)
+
+    invoice_billing_period(date(2025, 1, 1), date(2025, 1, 6), date(2025, 2, 1), None, 0.13)
+    assert_consistent()
+    assert Invoice.query.count() == 2
+    assert db.session.execute(select(DailyRollup.unbilled_hours).where(
+        DailyRollup.client_id == globex.id, DailyRollup.day == date(2025, 1, 7))).scalar() == 2.0
+
+
+def test_deleted_client_leaves_no_rows(acme, task, make_client, make_entry):
+    globex = make_client('Globex')
+    make_entry(acme, date(2025, 1, 5), task_id=task.id)
+    make_entry(globex, date(2025, 1, 5))
+    create_invoice_for_entries(acme.id, [TimeEntry.query.filter_by(client_id=acme.id).one().id],
+                               date(2025, 2, 1), None, 0.13)
+    db.session.commit()
+
+    db.session.delete(acme)
+    db.session.commit()
+    assert_consistent()
+    assert {row[0] for row in rollup_rows()} == {globex.id}
+
+
+def test_client_delete_runs_the_same_queries_however_many_tasks_and_invoices(client, make_client, make_entry):
+    def delete_queries(tasks):
+        doomed = make_client('Doomed')
+        for number in range(tasks):
+            task = Task(title=f'Task {number}', client_id=doomed.id)
+            db.session.add(task)
+            db.session.flush()
+            entry = make_entry(doomed, date(2025, 1, number + 1), task_id=task.id)
+            create_invoice_for_entries(doomed.id, [entry.id], date(2025, 2, 1), None, 0.13)
+            db.session.commit()
+
+        response = client.post(f'/clients/{doomed.id}/delete')
+        assert response.status_code == 302
+        return int(response.headers['Server-Timing'].split('desc="')[1].split()[0])
+
+    assert delete_queries(2) == delete_queries(10)
+    assert_consistent()
@@ -0,0 +1,84 @@
+"""The search index follows every write to its source tables, through the triggers"""
+import io
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from billing import create_invoice_for_entries
+from models import Task, TimeEntry
+from search import DEFERRED_TABLE, SEARCH_TABLE, deferred_indexing, rebuild_search_index, search
+from time_entry_import import import_time_entries
+
+
+def index_rows():
+    return db.session.execute(text(f"SELECT rowid, title, body FROM {SEARCH_TABLE} ORDER BY rowid")).all()
+
+
+def assert_index_matches_a_rebuild():
+    maintained = index_rows()
+    rebuild_search_index(db.session.connection())
+    assert maintained == index_rows()
+    db.session.rollback()
+
+
+def found(query, kind=None):
+    return [(result['kind'], result['title']) for result in search(query, kind=kind)[0]]
+
+
+def test_inserts_updates_and_deletes_are_indexed(make_client, make_entry):
+    acme = make_client('Acme Plumbing')
+    entry = make_entry(acme, date(2025, 1, 6), item='Replace boiler', location='Basement')
+    task = Task(title='Inspect radiators', description='Bleed every radiator', client_id=acme.id)
+    db.session.add(task)
+    invoice = create_invoice_for_entries(acme.id, [entry.id], date(2025, 2, 1), None, 0.13, notes='Boiler parts')
+    db.session.commit()
+    assert_index_matches_a_rebuild()
+    assert found('boiler') == [('time_entry', 'Replace boiler'), ('invoice', 'INV-0001')]
+
+    acme.name = 'Acme Heating'
+    entry.item = 'Service furnace'
+    task.description = 'Check the thermostat'
+    db.session.commit()
+    assert_index_matches_a_rebuild()
+    assert found('boiler') == [('invoice', 'INV-0001')]
+    assert found('heat', kind='client') == [('client', 'Acme Heating')]
+    assert found('thermostat') == [('task', 'Inspect radiators')]
+
+    db.session.delete(invoice)
+    db.session.delete(task)
+    db.session.commit()
+    assert_index_matches_a_rebuild()
+    assert found('boiler') == found('radiators') == []
+
+
+def test_bulk_import_is_indexed_once_at_the_end(make_client):
+    make_client('Acme')
+    rows = ''.join(f'2025-01-{day:02d},09:00,10:00,Window cleaning {day},Acme\n' for day in range(1, 29))
+    import_time_entries(io.StringIO('date,time_in,time_out,item,client\n' + rows))
+    db.session.commit()
+
+    assert_index_matches_a_rebuild()
+    assert len(search('window', per_page=100)[0]) == 28
+    assert db.session.execute(text(f"SELECT count(*) FROM {DEFERRED_TABLE}")).scalar() == 0
+
+
+def test_failed_bulk_insert_leaves_the_trigger_on(make_client, make_entry):
+    acme = make_client('Acme')
+    with pytest.raises(RuntimeError):
+        with deferred_indexing(db.session.connection(), TimeEntry.__tablename__):
+            raise RuntimeError('import failed')
+    db.session.rollback()
+
+    make_entry(acme, date(2025, 1, 6), item='Gutter repair')
+    assert found('gutter') == [('time_entry', 'Gutter repair')]
+
+
+def test_title_matches_rank_above_body_matches(make_client):
+    acme = make_client('Acme')
+    db.session.add_all([Task(title='Roof survey', description='Check the chimney', client_id=acme.id),
+                        Task(title='Chimney sweep', description='Annual visit', client_id=acme.id)])
+    db.session.commit()
+
+    assert found('chimney') == [('task', 'Chimney sweep'), ('task', 'Roof survey')]
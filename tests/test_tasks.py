@@ -0,0 +1,76 @@
+import pytest
+from flask import template_rendered
+
+from app import db
+from models import Task, TaskStatus
+from routes import TASKS_PER_PAGE
+
+
+@pytest.fixture
+def rendered(app):
+    contexts = []
+
+    def record(sender, template, context, **extra):
+        contexts.append(context)
+
+    template_rendered.connect(record, app)
+    yield contexts
+    template_rendered.disconnect(record, app)
+
+
+@pytest.fixture
+def acme(make_client):
+    return make_client('Acme', 100.0)
+
+
+def add_tasks(client, count, status=TaskStatus.TODO.value):
+    db.session.add_all(Task(title=f'{status} {number}', client_id=client.id, status=status)
+                       for number in range(count))
+    db.session.commit()
+
+
+def task_page(client, rendered, query=''):
+    response = client.get(f'/tasks{query}')
+    assert response.status_code == 200
+    return rendered[-1]
+
+
+def test_default_view_hides_archived_tasks(client, rendered, acme):
+    add_tasks(acme, 2)
+    add_tasks(acme, 1, TaskStatus.ARCHIVED.value)
+    page = task_page(client, rendered)
+
+    assert page['status'] == ''
+    assert [task.status for task, _ in page['tasks']] == [TaskStatus.TODO.value] * 2
+    assert (page['page_count'], page['next_url']) == (1, None)
+
+
+def test_all_view_includes_archived_tasks(client, rendered, acme):
+    add_tasks(acme, 2)
+    add_tasks(acme, 1, TaskStatus.ARCHIVED.value)
+    page = task_page(client, rendered, '?status=all')
+
+    assert len(page['tasks']) == 3
+    assert dict((value, count) for value, _, _, count in page['status_chips'])['all'] == 3
+
+
+def test_unknown_status_matches_no_tasks(client, rendered, acme):
+    add_tasks(acme, 2)
+    page = task_page(client, rendered, '?status=bogus')
+
+    assert page['tasks'] == []
+    assert (page['page_count'], page['next_url']) == (1, None)
+
+
+def test_tasks_are_paged(client, rendered, acme):
+    add_tasks(acme, TASKS_PER_PAGE + 5)
+    first = task_page(client, rendered)
+    assert len(first['tasks']) == TASKS_PER_PAGE
+    assert first['page_count'] == 2
+    assert (first['previous_url'], first['next_url']) == (None, '/tasks?page=2')
+
+    second = task_page(client, rendered, '?page=2')
+    assert len(second['tasks']) == 5
+    assert (second['page'], second['page_count']) == (2, 2)
+    assert (second['previous_url'], second['next_url']) == ('/tasks?page=1', None)
+    assert not {task.id for task, _ in first['tasks']} & {task.id for task, _ in second['tasks']}
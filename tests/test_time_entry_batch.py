@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import app as flask_app, db
+from cache import current_versions
+from models import Task, TimeEntry
+
+
+def entry(key, **fields):
+    return {'idempotency_key': key, 'date': '2025-01-06', 'time_in': '09:00', 'time_out': '10:00',
+            'item': f'Visit {key}', 'client': 'Acme', **fields}
+
+
+@pytest.fixture
+def acme(make_client):
+    return make_client('Acme', 100.0)
+
+
+def post_batch(client, entries):
+    response = client.post('/api/time-entries/batch', json=entries)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_resent_batch_creates_nothing(client, acme):
+    entries = [entry('a'), entry('b', hourly_rate=120)]
+    first = post_batch(client, entries)
+    second = post_batch(client, entries)
+
+    assert (first['created'], first['duplicates']) == (2, 0)
+    assert (second['created'], second['duplicates']) == (0, 2)
+    assert [result['id'] for result in second['results']] == [result['id'] for result in first['results']]
+    assert TimeEntry.query.count() == 2
+
+
+def test_partly_saved_batch_only_adds_the_new_entries(client, acme):
+    post_batch(client, [entry('a')])
+    result = post_batch(client, [entry('a'), entry('b'), entry('b'), entry('c')])
+
+    assert [(result['idempotency_key'], result['status']) for result in result['results']] == [
+        ('a', 'duplicate'), ('b', 'created'), ('b', 'duplicate'), ('c', 'created')]
+    assert result['results'][1]['id'] == result['results'][2]['id']
+    assert sorted(entry.idempotency_key for entry in TimeEntry.query) == ['a', 'b', 'c']
+
+
+def test_batches_that_save_nothing_leave_cached_data_valid(client, acme):
+    post_batch(client, [entry('a')])
+    before = current_versions(['time_entry'])
+
+    post_batch(client, [entry('a'), entry('a')])
+    post_batch(client, [entry(''), entry('bad', client='Globex')])
+    assert current_versions(['time_entry']) == before
+
+    post_batch(client, [entry('a'), entry('b')])
+    assert current_versions(['time_entry']) == (before[0] + 1,)
+
+
+def test_invalid_entries_get_errors_without_affecting_the_rest(client, acme):
+    result = post_batch(client, [entry(''), entry('x' * 65), entry('bad', client='Globex'), entry('good')])
+
+    assert [(result['status'], result.get('error')) for result in result['results']] == [
+        ('error', 'Missing idempotency_key'),
+        ('error', 'idempotency_key is longer than 64 characters'),
+        ('error', "Unknown client 'Globex'"),
+        ('created', None),
+    ]
+    assert [entry.idempotency_key for entry in TimeEntry.query] == ['good']
+
+
+def test_entries_start_their_to_do_tasks(client, acme):
+    task = Task(title='Install', client_id=acme.id)
+    db.session.add(task)
+    db.session.commit()
+
+    post_batch(client, [entry('a', task='install')])
+    db.session.refresh(task)
+    assert task.status == 'in_progress'
+
+
+@pytest.mark.parametrize('payload, error', [
+    ({'entries': 'nope'}, 'Expected a JSON array of time entry objects'),
+    ([entry(str(number)) for number in range(1001)], 'At most 1000 time entries can be saved per request'),
+])
+def test_malformed_batches_are_rejected(client, acme, payload, error):
+    response = client.post('/api/time-entries/batch', json=payload)
+    assert (response.status_code, response.json) == (400, {'error': error})
+
+
+def test_concurrent_resends_save_each_key_once(app, acme):
+    entries = [entry(str(number)) for number in range(50)]
+
+    def send(_):
+        return flask_app.test_client().post('/api/time-entries/batch', json=entries).json['created']
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        created = list(pool.map(send, range(4)))
+
+    assert sum(created) == 50
+    assert TimeEntry.query.count() == 50
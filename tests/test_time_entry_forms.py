@@ -0,0 +1,56 @@
+from datetime import date, time
+
+import pytest
+
+from app import db
+from models import HourlyRate, TimeEntry
+
+FORM = {
+    'location': 'Office', 'item': 'Design', 'date': '2025-03-03', 'time_in': '09:00', 'time_out': '10:30',
+    'total_hours': '1.5', 'hourly_rate': '80',
+}
+
+
+@pytest.fixture
+def entry(make_client):
+    client = make_client()
+    entry = TimeEntry(client_id=client.id, item='Design', date=date(2025, 3, 3), time_in=time(9), time_out=time(10),
+                      total_hours=1.0, hourly_rate=100.0)
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+@pytest.mark.parametrize('path', ['/save-timer', '/time-entries/add'])
+def test_unknown_client_is_not_found(client, make_client, path):
+    make_client()
+    response = client.post(path, data={**FORM, 'client_id': '999'})
+    assert response.status_code == 404
+    assert TimeEntry.query.count() == 0
+
+
+def test_edit_with_unknown_client_is_not_found(client, entry):
+    response = client.post(f'/time-entries/{entry.id}/edit', data={**FORM, 'client_id': '999'})
+    assert response.status_code == 404
+    assert db.session.get(TimeEntry, entry.id).client_id != 999
+
+
+def test_named_rate_of_the_client_is_used(client, make_client):
+    acme = make_client()
+    rate = HourlyRate(client_id=acme.id, name='Weekend', rate=150.0)
+    db.session.add(rate)
+    db.session.commit()
+
+    response = client.post('/time-entries/add', data={**FORM, 'client_id': acme.id, 'rate_id': rate.id})
+    assert response.status_code == 302
+    assert TimeEntry.query.one().hourly_rate == 150.0
+
+
+def test_rate_of_another_client_falls_back_to_the_form_rate(client, make_client):
+    acme, other = make_client('Acme'), make_client('Other')
+    rate = HourlyRate(client_id=other.id, name='Weekend', rate=150.0)
+    db.session.add(rate)
+    db.session.commit()
+
+    client.post('/time-entries/add', data={**FORM, 'client_id': acme.id, 'rate_id': rate.id})
+    assert TimeEntry.query.one().hourly_rate == 80.0
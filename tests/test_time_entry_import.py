@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from app import db
+from models import DailyRollup, HourlyRate, Task, TimeEntry
+
+
+@pytest.fixture
+def acme(make_client):
+    acme = make_client('Acme', 100.0)
+    db.session.add_all([HourlyRate(client_id=acme.id, name='Standard', rate=90.0, is_default=True),
+                        HourlyRate(client_id=acme.id, name='Rush', rate=150.0),
+                        Task(title='Design', client_id=acme.id)])
+    db.session.commit()
+    return acme
+
+
+def post_csv(client, text):
+    return client.post('/time-entries/import', data=text, content_type='text/csv')
+
+
+def test_rows_resolve_clients_rates_and_tasks(client, acme):
+    response = post_csv(client, (
+        'date,time_in,time_out,item,client,client_id,rate,hourly_rate,task\n'
+        '2025-01-06,09:00,10:30,Default rate,acme,,,,\n'
+        '2025-01-06,11:00,12:00,Named rate,,1,Rush,,design\n'
+        '2025-01-07,09:00,09:45,Explicit rate,Acme,,Rush,$120,\n'
+    ))
+
+    assert response.json == {'imported': 3, 'error_count': 0, 'errors': []}
+    entries = TimeEntry.query.order_by(TimeEntry.id).all()
+    assert [(entry.item, entry.total_hours, entry.hourly_rate, entry.amount, entry.task_id) for entry in entries] == [
+        ('Default rate', 1.5, 90.0, 135.0, None),
+        ('Named rate', 1.0, 150.0, 150.0, 1),
+        ('Explicit rate', 0.75, 120.0, 90.0, None),
+    ]
+    # The bulk insert bypasses the ORM, the rollup is refreshed explicitly
+    assert db.session.execute(select(func.sum(DailyRollup.unbilled_amount))).scalar() == 375.0
+
+
+def test_invalid_rows_are_reported_and_skipped(client, acme):
+    response = post_csv(client, (
+        'date,time_in,time_out,item,client\n'
+        '2025-01-06,09:00,10:00,Valid,Acme\n'
+        '2025-13-06,09:00,10:00,Bad date,Acme\n'
+        '2025-01-06,09:30,09:30,No time,Acme\n'
+        '2025-01-06,09:00,10:00,Unknown,Globex\n'
+        '2025-01-06,09:00,10:00,,Acme\n'
+    ))
+
+    assert response.json == {'imported': 1, 'error_count': 4, 'errors': [
+        {'line': 3, 'error': "Invalid date '2025-13-06'"},
+        {'line': 4, 'error': 'time_out must be after time_in'},
+        {'line': 5, 'error': "Unknown client 'Globex'"},
+        {'line': 6, 'error': 'Missing item'},
+    ]}
+    assert [entry.item for entry in TimeEntry.query] == ['Valid']
+
+
+def test_missing_columns_reject_the_file(client, acme):
+    response = post_csv(client, 'date,item\n2025-01-06,Work\n')
+
+    assert response.status_code == 400
+    assert response.json == {'error': 'CSV is missing the columns: client, time_in, time_out'}
+    assert TimeEntry.query.count() == 0
+
+
+def test_exported_file_imports_the_same_entries(client, acme, make_entry):
+    make_entry(acme, date(2025, 1, 6), hours=2.0, item='Design', location='Office')
+    make_entry(acme, date(2025, 1, 7), hours=1.0, rate=150.0, item='Support')
+    exported = client.get('/time-entries/export?format=csv').get_data(as_text=True)
+
+    def rows():
+        return sorted((entry.date, entry.time_in, entry.time_out, entry.item, entry.location, entry.hourly_rate,
+                       entry.amount) for entry in TimeEntry.query)
+
+    before = rows()
+    response = client.post('/time-entries/import', data=exported.encode('utf-8-sig'), content_type='text/csv')
+
+    assert response.json['imported'] == 2
+    assert rows() == sorted(before * 2)
@@ -0,0 +1,133 @@
+"""Batched JSON saving of time entries with idempotency keys.
+
+Field apps submit many entries per request, often over connections that
+drop the response. Every entry carries an idempotency_key chosen by the
+client; an entry whose key is already saved is not inserted again but
+reported as a duplicate with the id it was saved under, so a batch can be
+resent as often as needed without duplicating rows.
+
+Entries are objects with the columns of the CSV import (see
+time_entry_import) plus idempotency_key, and values may be JSON strings or
+numbers. They are validated with the same lookups and rules as the import,
+the valid ones are inserted with one executemany, and the whole batch is one
+transaction. Invalid entries get an error result without affecting the rest.
+"""
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+
+from app import db
+from cache import mark_tables_changed
+from models import DataVersion, Task, TaskStatus, TimeEntry
+from rollup import refresh_rollup
+from search import deferred_indexing
+from time_entry_import import ImportLookup, parse_row
+
+MAX_BATCH_ENTRIES = 1000
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+# Keys looked up per SELECT, well below SQLite's limit on bound parameters
+KEY_CHUNK_SIZE = 500
+
+
+def _saved_entry_ids(keys):
+    """Map of idempotency key to entry id for the keys that are already saved"""
+    keys = sorted(keys)
+    saved = {}
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        saved.update(db.session.execute(
+            select(TimeEntry.idempotency_key, TimeEntry.id)
+            .where(TimeEntry.idempotency_key.in_(keys[start:start + KEY_CHUNK_SIZE]))
+        ).all())
+    return saved
+
+
+def _idempotency_key(entry):
+    key = entry.get('idempotency_key')
+    return '' if key is None else str(key).strip()
+
+
+def _fields(entry):
+    """The entry's values as the text the CSV row parser expects"""
+    return {name: '' if value is None else str(value) for name, value in entry.items()}
+
+
+def _start_tasks(task_ids):
+    """Move the tasks that time was logged against from to-do to in progress, as the timer does"""
+    db.session.execute(
+        update(Task).where(Task.id.in_(sorted(task_ids)), Task.status == TaskStatus.TODO.value)
+        .values(status=TaskStatus.IN_PROGRESS.value),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def save_time_entry_batch(entries):
+    """Save a list of time entry dicts and return one result dict per entry, in the same order.
+
+    A result has the entry's idempotency_key and a status: 'created' with the
+    new entry's id, 'duplicate' with the id the key was saved under before,
+    or 'error' with a message. Raises ValueError if entries is not a list of
+    at most MAX_BATCH_ENTRIES objects. The caller commits the session.
+    """
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        raise ValueError('Expected a JSON array of time entry objects')
+    if len(entries) > MAX_BATCH_ENTRIES:
+        raise ValueError(f'At most {MAX_BATCH_ENTRIES} time entries can be saved per request')
+
+    connection = db.session.connection()
+    # A write that changes nothing still takes SQLite's write lock before the keys are
+    # looked up, so a concurrent resend of the same batch waits for this one and then
+    # sees its keys, while a resend of saved entries leaves the cached data valid
+    connection.execute(update(DataVersion).where(DataVersion.name == TimeEntry.__tablename__)
+                       .values(version=DataVersion.version))
+
+    keys = [_idempotency_key(entry) for entry in entries]
+    saved = _saved_entry_ids({key for key in keys if key})
+    lookup = ImportLookup()
+    imported_at = datetime.utcnow()
+    results = []
+    batch = []
+    batch_keys = set()
+    days = set()
+
+    for entry, key in zip(entries, keys):
+        result = {'idempotency_key': key or None}
+        results.append(result)
+        if not key:
+            result.update(status='error', error='Missing idempotency_key')
+            continue
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            result.update(status='error', error=f'idempotency_key is longer than {IDEMPOTENCY_KEY_MAX_LENGTH} characters')
+            continue
+        if key in saved or key in batch_keys:
+            result['status'] = 'duplicate'
+            continue
+
+        try:
+            values = parse_row(_fields(entry), lookup, imported_at)
+        except ValueError as e:
+            result.update(status='error', error=str(e))
+            continue
+
+        values['idempotency_key'] = key
+        batch.append(values)
+        batch_keys.add(key)
+        days.add((values['client_id'], values['date']))
+        result['status'] = 'created'
+
+    if batch:
+        task_ids = {values['task_id'] for values in batch if values['task_id']}
+        with deferred_indexing(connection, TimeEntry.__tablename__):
+            connection.execute(insert(TimeEntry.__table__), batch)
+        # Core inserts skip the flush hooks that keep the rollup and cache versions current
+        refresh_rollup(connection, days)
+        mark_tables_changed([TimeEntry.__tablename__])
+        if task_ids:
+            _start_tasks(task_ids)
+        saved.update(_saved_entry_ids(batch_keys))
+
+    for result in results:
+        if result['status'] != 'error':
+            result['id'] = saved[result['idempotency_key']]
+    return results
@@ -0,0 +1,102 @@
+"""Streaming export of time entries as CSV or NDJSON (one JSON object per line).
+
+Rows are read with a streaming cursor a batch at a time and written out as
+they arrive, so an export holds at most one batch in memory however many
+entries it covers.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from app import db
+from models import Client, Invoice, Task, TimeEntry
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched from the cursor, and written out, at a time
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    'id', 'date', 'time_in', 'time_out', 'client', 'task', 'item', 'location',
+    'total_hours', 'hourly_rate', 'amount', 'invoice_number',
+]
+
+
+def filter_time_entries(query, client_id=None, task_id=None, date_from=None, date_to=None, invoice_status=None):
+    """Apply the time entry listing and export filters to a query"""
+    if client_id:
+        query = query.filter(TimeEntry.client_id == client_id)
+    if task_id:
+        query = query.filter(TimeEntry.task_id == task_id)
+    if date_from:
+        query = query.filter(TimeEntry.date >= date_from)
+    if date_to:
+        query = query.filter(TimeEntry.date <= date_to)
+    if invoice_status == 'invoiced':
+        query = query.filter(TimeEntry.invoice_id.isnot(None))
+    elif invoice_status == 'not_invoiced':
+        query = query.filter(TimeEntry.invoice_id.is_(None))
+    return query
+
+
+def export_rows(**filters):
+    """Yield one dict per matching time entry, oldest first"""
+    query = select(
+        TimeEntry.id, TimeEntry.date, TimeEntry.time_in, TimeEntry.time_out,
+        Client.name.label('client'), Task.title.label('task'), TimeEntry.item, TimeEntry.location,
+        TimeEntry.total_hours, TimeEntry.hourly_rate, TimeEntry.amount, Invoice.invoice_number
+    ).join(Client, TimeEntry.client_id == Client.id).outerjoin(
+        Task, TimeEntry.task_id == Task.id).outerjoin(Invoice, TimeEntry.invoice_id == Invoice.id)
+    query = filter_time_entries(query, **filters).order_by(TimeEntry.date, TimeEntry.time_in, TimeEntry.id)
+
+    # yield_per streams the result instead of fetching every row up front
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for row in result:
+        yield {
+            'id': row.id,
+            'date': row.date.isoformat(),
+            'time_in': row.time_in.strftime('%H:%M'),
+            'time_out': row.time_out.strftime('%H:%M'),
+            'client': row.client,
+            'task': row.task or '',
+            'item': row.item,
+            'location': row.location or '',
+            'total_hours': row.total_hours,
+            'hourly_rate': row.hourly_rate,
+            'amount': row.amount,
+            'invoice_number': row.invoice_number or '',
+        }
+
+
+def _batches(rows, format_row, buffer):
+    """Yield the text written to buffer for every EXPORT_BATCH_SIZE rows"""
+    for count, row in enumerate(rows, 1):
+        format_row(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_time_entries(export_format='csv', **filters):
+    """Yield the export of the matching time entries as text chunks"""
+    buffer = io.StringIO()
+    rows = export_rows(**filters)
+
+    if export_format == 'ndjson':
+        def write_line(row):
+            buffer.write(json.dumps(row))
+            buffer.write('\n')
+        yield from _batches(rows, write_line, buffer)
+        return
+
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    yield from _batches(rows, writer.writerow, buffer)
@@ -0,0 +1,224 @@
+"""Bulk import of time entries from CSV.
+
+Clients, hourly rates and tasks are loaded once per import into in-memory
+lookups, so validating a row never touches the database. Valid rows are
+inserted IMPORT_BATCH_SIZE at a time with executemany, and the whole import
+is one transaction. Invalid rows are skipped and reported by line number
+without affecting the rest.
+
+The columns are those of the time entry export, so an exported file can be
+imported again:
+
+    date, time_in, time_out, item      required
+    client or client_id                client name or id
+    location                           optional
+    hourly_rate                        optional, overrides the rates below
+    rate_id                            optional id of one of the client's hourly rates
+    rate                               optional name of one of the client's hourly rates
+    task or task_id                    optional task title or id, for the same client
+
+Without hourly_rate, rate_id or rate, the client's default rate is used. Other columns
+(id, total_hours, amount, invoice_number) are ignored; total_hours is always
+recomputed from the times.
+"""
+import csv
+from datetime import date, datetime, time
+
+from sqlalchemy import insert, select
+
+from app import db
+from cache import mark_tables_changed
+from models import Client, HourlyRate, Task, TimeEntry
+from money import line_amount
+from rollup import refresh_rollup
+from search import deferred_indexing
+from utils import calculate_hours
+
+IMPORT_BATCH_SIZE = 5000
+
+# Only the first errors are listed in the result; error_count covers all of them
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = {'date', 'time_in', 'time_out', 'item'}
+
+
+class ImportLookup:
+    """Clients, rates and tasks, loaded once per import"""
+
+    def __init__(self):
+        self.client_ids = set()
+        self.clients_by_name = {}
+        self.default_rates = {}
+        for client_id, name, hourly_rate in db.session.execute(select(Client.id, Client.name, Client.hourly_rate)):
+            self.client_ids.add(client_id)
+            self.clients_by_name.setdefault(name.strip().casefold(), client_id)
+            self.default_rates[client_id] = hourly_rate
+
+        self.named_rates = {}
+        self.rates_by_id = {}
+        for rate_id, client_id, name, rate, is_default in db.session.execute(
+                select(HourlyRate.id, HourlyRate.client_id, HourlyRate.name, HourlyRate.rate, HourlyRate.is_default)
+                .order_by(HourlyRate.id)):
+            self.named_rates.setdefault((client_id, name.strip().casefold()), rate)
+            self.rates_by_id[rate_id] = (client_id, rate)
+            if is_default:
+                self.default_rates[client_id] = rate
+
+        self.task_clients = {}
+        self.tasks_by_title = {}
+        for task_id, client_id, title in db.session.execute(select(Task.id, Task.client_id, Task.title)):
+            self.task_clients[task_id] = client_id
+            self.tasks_by_title.setdefault((client_id, title.strip().casefold()), task_id)
+
+    def client_id(self, row):
+        value = (row.get('client_id') or '').strip()
+        if value:
+            if not value.isdigit() or int(value) not in self.client_ids:
+                raise ValueError(f"Unknown client_id '{value}'")
+            return int(value)
+
+        name = (row.get('client') or '').strip()
+        if not name:
+            raise ValueError('Missing client')
+        try:
+            return self.clients_by_name[name.casefold()]
+        except KeyError:
+            raise ValueError(f"Unknown client '{name}'") from None
+
+    def hourly_rate(self, row, client_id):
+        value = (row.get('hourly_rate') or '').strip()
+        if value:
+            rate = _parse(row, 'hourly_rate', lambda text: float(text.lstrip('$')))
+            if rate < 0:
+                raise ValueError('hourly_rate cannot be negative')
+            return rate
+
+        value = (row.get('rate_id') or '').strip()
+        if value and value != 'default':
+            client_rate = self.rates_by_id.get(int(value)) if value.isdigit() else None
+            if not client_rate or client_rate[0] != client_id:
+                raise ValueError(f"Unknown rate_id '{value}' for this client")
+            return client_rate[1]
+
+        name = (row.get('rate') or '').strip()
+        if name:
+            try:
+                return self.named_rates[(client_id, name.casefold())]
+            except KeyError:
+                raise ValueError(f"Client has no hourly rate named '{name}'") from None
+
+        return self.default_rates[client_id]
+
+    def task_id(self, row, client_id):
+        value = (row.get('task_id') or '').strip()
+        if value:
+            if not value.isdigit() or self.task_clients.get(int(value)) != client_id:
+                raise ValueError(f"Unknown task_id '{value}' for this client")
+            return int(value)
+
+        title = (row.get('task') or '').strip()
+        if not title:
+            return None
+        try:
+            return self.tasks_by_title[(client_id, title.casefold())]
+        except KeyError:
+            raise ValueError(f"Unknown task '{title}' for this client") from None
+
+
+def _parse(row, column, parser):
+    value = (row.get(column) or '').strip()
+    try:
+        return parser(value)
+    except ValueError:
+        raise ValueError(f"Invalid {column} '{value}'") from None
+
+
+def _text(row, column, max_length, required=False):
+    value = (row.get(column) or '').strip()
+    if required and not value:
+        raise ValueError(f'Missing {column}')
+    if len(value) > max_length:
+        raise ValueError(f'{column} is longer than {max_length} characters')
+    return value or None
+
+
+def parse_row(row, lookup, imported_at):
+    """Validate one CSV row and return the time_entry values to insert"""
+    client_id = lookup.client_id(row)
+    entry_date = _parse(row, 'date', date.fromisoformat)
+    time_in = _parse(row, 'time_in', time.fromisoformat)
+    time_out = _parse(row, 'time_out', time.fromisoformat)
+    total_hours = calculate_hours(time_in, time_out)
+    if total_hours <= 0:
+        raise ValueError('time_out must be after time_in')
+
+    hourly_rate = lookup.hourly_rate(row, client_id)
+    return {
+        'client_id': client_id,
+        'location': _text(row, 'location', 100),
+        'item': _text(row, 'item', 100, required=True),
+        'task_id': lookup.task_id(row, client_id),
+        'date': entry_date,
+        'time_in': time_in,
+        'time_out': time_out,
+        'total_hours': total_hours,
+        'hourly_rate': hourly_rate,
+        # Core inserts skip the flush event that sets the amount of ORM entries
+        'amount': line_amount(total_hours, hourly_rate),
+        'created_at': imported_at,
+        'updated_at': imported_at,
+    }
+
+
+def import_time_entries(csv_file):
+    """Import time entries from an open CSV text file and return a summary dict.
+
+    Raises ValueError if the header is missing required columns. The caller
+    commits the session.
+    """
+    reader = csv.DictReader(csv_file, restval='')
+    columns = {name.strip() for name in reader.fieldnames or []}
+    missing = REQUIRED_COLUMNS - columns
+    if not columns & {'client', 'client_id'}:
+        missing.add('client')
+    if missing:
+        raise ValueError(f"CSV is missing the columns: {', '.join(sorted(missing))}")
+    reader.fieldnames = [name.strip() for name in reader.fieldnames]
+
+    lookup = ImportLookup()
+    connection = db.session.connection()
+    imported_at = datetime.utcnow()
+    batch = []
+    days = set()
+    imported = 0
+    errors = []
+    error_count = 0
+
+    # The imported rows are added to the search index in one go once they are all in
+    with deferred_indexing(connection, TimeEntry.__tablename__):
+        for row in reader:
+            try:
+                values = parse_row(row, lookup, imported_at)
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'line': reader.line_num, 'error': str(e)})
+                continue
+
+            batch.append(values)
+            days.add((values['client_id'], values['date']))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                connection.execute(insert(TimeEntry.__table__), batch)
+                imported += len(batch)
+                batch.clear()
+
+        if batch:
+            connection.execute(insert(TimeEntry.__table__), batch)
+            imported += len(batch)
+
+    # Core inserts skip the flush hooks that keep the rollup and cache versions current
+    if imported:
+        refresh_rollup(connection, days)
+        mark_tables_changed([TimeEntry.__tablename__])
+
+    return {'imported': imported, 'error_count': error_count, 'errors': errors}
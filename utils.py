@@ -1,9 +1,12 @@
+from reportlab import rl_config
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak, Flowable
 from reportlab.lib.units import inch
+from PIL import Image as PILImage
 from datetime import datetime, date
+from functools import lru_cache
 import io
 import os
 
@@ -21,191 +24,231 @@ def calculate_hours(time_in, time_out):
     
     return round(total_hours, 2)
 
-def generate_invoice_pdf(invoice, company):
-    """Generate a PDF invoice"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=0.5*inch,
-        leftMargin=0.5*inch,
-        topMargin=0.5*inch,
-        bottomMargin=0.5*inch
-    )
-    
+def parse_date(value):
+    """Parse a YYYY-MM-DD string, returning None if it is missing or invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def encode_cursor(entry):
+    """Encode a time entry's (date, time_in, id) sort key as a page cursor"""
+    return f"{entry.date.isoformat()}_{entry.time_in.strftime('%H:%M:%S')}_{entry.id}"
+
+def decode_cursor(cursor):
+    """Decode a page cursor back into a (date, time_in, id) tuple, or None if invalid"""
+    if not cursor:
+        return None
+    try:
+        date_str, time_str, entry_id = cursor.split('_')
+        return (
+            datetime.strptime(date_str, '%Y-%m-%d').date(),
+            datetime.strptime(time_str, '%H:%M:%S').time(),
+            int(entry_id)
+        )
+    except ValueError:
+        return None
+
+# Write PDF streams as binary instead of ASCII85 text: the files are a fifth
+# smaller and skip an encoding pass that is slow without reportlab's C extension
+rl_config.useA85 = 0
+
+# Shared PDF layout for invoices and quotes
+PDF_MARGIN = 0.5*inch
+PDF_LOGO_PATH = os.path.join('static', 'images', 'logo.png')
+PDF_LOGO_SIZE = (2*inch, 0.5*inch)
+PDF_LOGO_DPI = 300  # resolution the logo is pre-scaled to
+LINE_ITEM_COL_WIDTHS = [1*inch, 2*inch, 1.5*inch, 0.75*inch, 0.75*inch, 1*inch]
+LINE_ITEM_HEADER = ["Date", "Description", "Location", "Hours", "Rate", "Amount"]
+
+# Documents with more line items than this are laid out one page table at a time
+LARGE_DOCUMENT_LINES = 100
+LINE_ITEM_ROW_HEIGHT = 18
+
+DETAILS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+])
+
+LINE_ITEMS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),  # Header alignment
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),  # Header font
+    ('ALIGN', (3, 1), (5, -1), 'RIGHT'),  # Right align numbers
+    ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),  # Header underline
+    ('LINEABOVE', (0, -3), (-1, -3), 1, colors.black),  # Line above subtotal
+    ('FONTNAME', (4, -3), (4, -1), 'Helvetica-Bold'),  # Bold for "Subtotal", "HST", and "Total"
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),  # Thicker line above the total row
+])
+
+PAGE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),  # Header alignment
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),  # Header font
+    ('ALIGN', (3, 1), (5, -1), 'RIGHT'),  # Right align numbers
+    ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),  # Header underline
+    ('LINEABOVE', (0, -1), (-1, -1), 0.5, colors.grey),  # Line above the page subtotal
+    ('FONTNAME', (3, -1), (5, -1), 'Helvetica-Oblique'),  # Page subtotal
+])
+
+TOTALS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (3, 0), (5, -1), 'RIGHT'),
+    ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),  # Line above subtotal
+    ('FONTNAME', (4, 0), (4, -1), 'Helvetica-Bold'),  # Bold for "Subtotal", "HST", and "Total"
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),  # Thicker line above the total row
+])
+
+# What differs between an invoice and a quote
+DOCUMENT_LAYOUTS = {
+    'invoice': {
+        'title': 'INVOICE',
+        'details': lambda invoice: [
+            ["Invoice Number:", invoice.invoice_number],
+            ["Date Issued:", invoice.date_issued.strftime("%B %d, %Y")],
+            ["Date Due:", invoice.date_due.strftime("%B %d, %Y")],
+        ],
+        'client_heading': 'BILL TO:',
+        'terms_heading': 'PAYMENT TERMS:',
+        'terms': "Payment is due within 30 days of invoice date.",
+    },
+    'quote': {
+        'title': 'QUOTE',
+        'details': lambda quote: [
+            ["Quote Number:", quote.quote_number],
+            ["Date Issued:", quote.date_issued.strftime("%B %d, %Y")],
+            ["Valid Until:", quote.date_valid_until.strftime("%B %d, %Y")],
+        ],
+        'client_heading': 'PREPARED FOR:',
+        'terms_heading': 'TERMS AND CONDITIONS:',
+        'terms': "This quote is valid until the date specified above. To accept this quote, please contact us.",
+    },
+}
+
+@lru_cache(maxsize=None)
+def pdf_styles():
+    """Paragraph styles for the PDFs, built once per process"""
     styles = getSampleStyleSheet()
     styles.add(ParagraphStyle(
         name='RightAlign',
         parent=styles['Normal'],
         alignment=2  # right alignment
     ))
-    
-    elements = []
-    
-    # Add company logo and name
-    logo_path = os.path.join('static', 'images', 'logo.png')
-    if os.path.exists(logo_path):
-        logo = Image(logo_path, width=2*inch, height=0.5*inch)
-        elements.append(logo)
-        elements.append(Spacer(1, 0.1*inch))
-    
-    elements.append(Paragraph(f"<b>{company.company_name}</b>", styles['Heading1']))
-    elements.append(Spacer(1, 0.1*inch))
-    
-    # Company details
-    company_address = []
-    if company.address:
-        company_address.append(company.address)
-    if company.city and company.province and company.postal_code:
-        company_address.append(f"{company.city}, {company.province} {company.postal_code}")
-    if company.phone:
-        company_address.append(f"Phone: {company.phone}")
-    if company.email:
-        company_address.append(f"Email: {company.email}")
-    if company.website:
-        company_address.append(f"Website: {company.website}")
-    if company.tax_number:
-        company_address.append(f"Tax Number: {company.tax_number}")
-    
-    for line in company_address:
-        elements.append(Paragraph(line, styles['Normal']))
-    
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Invoice details
-    elements.append(Paragraph("<b>INVOICE</b>", styles['Heading2']))
-    elements.append(Spacer(1, 0.1*inch))
-    
-    invoice_data = [
-        ["Invoice Number:", invoice.invoice_number],
-        ["Date Issued:", invoice.date_issued.strftime("%B %d, %Y")],
-        ["Date Due:", invoice.date_due.strftime("%B %d, %Y")],
-    ]
-    
-    invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
-    invoice_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-    ]))
-    
-    elements.append(invoice_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Client details
-    client = invoice.client
-    elements.append(Paragraph("<b>BILL TO:</b>", styles['Heading3']))
-    elements.append(Spacer(1, 0.1*inch))
-    
-    client_address = [client.name]
-    if client.contact_person:
-        client_address.append(f"Attn: {client.contact_person}")
-    if client.address:
-        client_address.append(client.address)
-    if client.city and client.province and client.postal_code:
-        client_address.append(f"{client.city}, {client.province} {client.postal_code}")
-    if client.phone:
-        client_address.append(f"Phone: {client.phone}")
-    if client.email:
-        client_address.append(f"Email: {client.email}")
-    
-    for line in client_address:
-        elements.append(Paragraph(line, styles['Normal']))
-    
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Time Entries
-    elements.append(Paragraph("<b>SERVICES:</b>", styles['Heading3']))
-    elements.append(Spacer(1, 0.1*inch))
-    
-    # Table header
-    time_data = [
-        ["Date", "Description", "Location", "Hours", "Rate", "Amount"]
-    ]
-    
-    # Table rows for each time entry
-    for entry in invoice.time_entries:
-        amount = entry.total_hours * entry.hourly_rate
-        time_data.append([
+    return styles
+
+@lru_cache(maxsize=1)
+def _load_logo(mtime_ns):
+    """Decode the logo once, scaled to its printed size and flattened onto white, as PNG bytes"""
+    logo = PILImage.open(PDF_LOGO_PATH).convert('RGBA')
+
+    # Never keep more pixels than the printed size needs
+    max_size = (int(PDF_LOGO_SIZE[0] / inch * PDF_LOGO_DPI), int(PDF_LOGO_SIZE[1] / inch * PDF_LOGO_DPI))
+    logo.thumbnail(max_size)
+
+    # The PDF page is white, so dropping the alpha channel saves embedding a mask
+    flattened = PILImage.new('RGB', logo.size, 'white')
+    flattened.paste(logo, mask=logo.getchannel('A'))
+
+    buffer = io.BytesIO()
+    flattened.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def pdf_logo():
+    """Logo flowable for a new document, or None if there is no logo"""
+    try:
+        mtime_ns = os.stat(PDF_LOGO_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return Image(io.BytesIO(_load_logo(mtime_ns)), width=PDF_LOGO_SIZE[0], height=PDF_LOGO_SIZE[1])
+
+def _address_lines(party, lines):
+    """Append the city line, phone and email of a company or client to lines"""
+    if party.city and party.province and party.postal_code:
+        lines.append(f"{party.city}, {party.province} {party.postal_code}")
+    if party.phone:
+        lines.append(f"Phone: {party.phone}")
+    if party.email:
+        lines.append(f"Email: {party.email}")
+    return lines
+
+def _line_item_rows(entries):
+    """Table rows for time entries, paired with their amounts"""
+    rows, amounts = [], []
+    for entry in entries:
+        rows.append([
             entry.date.strftime("%Y-%m-%d"),
             entry.item,
             entry.location or "",
             f"{entry.total_hours:.2f}",
             f"${entry.hourly_rate:.2f}",
-            f"${amount:.2f}"
+            f"${entry.amount:.2f}"
         ])
-    
-    # Add subtotal, tax and total rows
-    time_data.append(["", "", "", "", "Subtotal:", f"${invoice.subtotal:.2f}"])
-    time_data.append(["", "", "", "", f"HST ({invoice.hst_rate*100:.0f}%):", f"${invoice.hst_amount:.2f}"])
-    time_data.append(["", "", "", "", "Total:", f"${invoice.total:.2f}"])
-    
-    # Adjust column widths for time entries table
-    col_widths = [1*inch, 2*inch, 1.5*inch, 0.75*inch, 0.75*inch, 1*inch]
-    time_table = Table(time_data, colWidths=col_widths)
-    
-    # Style the table
-    style = TableStyle([
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),  # Header alignment
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),  # Header font
-        ('ALIGN', (3, 1), (5, -1), 'RIGHT'),  # Right align numbers
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),  # Header underline
-        ('LINEABOVE', (0, -3), (-1, -3), 1, colors.black),  # Line above subtotal
-        ('FONTNAME', (4, -3), (4, -1), 'Helvetica-Bold'),  # Bold for "Subtotal", "HST", and "Total"
-    ])
-    
-    # Add a thicker line above the total row
-    style.add('LINEABOVE', (0, -1), (-1, -1), 2, colors.black)
-    
-    time_table.setStyle(style)
-    elements.append(time_table)
-    
-    # Add invoice notes if any
-    if invoice.notes:
-        elements.append(Spacer(1, 0.3*inch))
-        elements.append(Paragraph("<b>NOTES:</b>", styles['Heading3']))
-        elements.append(Paragraph(invoice.notes, styles['Normal']))
-    
-    # Add payment terms
-    elements.append(Spacer(1, 0.3*inch))
-    elements.append(Paragraph("<b>PAYMENT TERMS:</b>", styles['Heading3']))
-    elements.append(Paragraph("Payment is due within 30 days of invoice date.", styles['Normal']))
-    
-    # Build the PDF document
-    doc.build(elements)
-    
-    # Get the value of the BytesIO buffer
-    pdf_data = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_data
+        amounts.append(entry.amount)
+    return rows, amounts
 
-def generate_quote_pdf(quote, company):
-    """Generate a PDF quote"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=0.5*inch,
-        leftMargin=0.5*inch,
-        topMargin=0.5*inch,
-        bottomMargin=0.5*inch
-    )
-    
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='RightAlign',
-        parent=styles['Normal'],
-        alignment=2  # right alignment
-    ))
-    
+def _totals_rows(document):
+    return [
+        ["", "", "", "", "Subtotal:", f"${document.subtotal:.2f}"],
+        ["", "", "", "", f"HST ({document.hst_rate*100:.0f}%):", f"${document.hst_amount:.2f}"],
+        ["", "", "", "", "Total:", f"${document.total:.2f}"],
+    ]
+
+class PagedLineItems(Flowable):
+    """Line items of a large document, split into one table per page.
+
+    Every page repeats the header row and ends with the subtotal of the lines
+    on that page. Rows have a fixed height, so a page's share is worked out
+    without laying out the rest, and only the table for the current page is
+    ever built.
+    """
+
+    def __init__(self, rows, amounts, start=0):
+        super().__init__()
+        self.rows = rows
+        self.amounts = amounts
+        self.start = start
+        self.hAlign = 'CENTER'
+
+    def _height(self, count):
+        # Header and page subtotal rows around count line items
+        return (count + 2) * LINE_ITEM_ROW_HEIGHT
+
+    def _page_table(self, stop):
+        page_subtotal = sum(self.amounts[self.start:stop])
+        data = [LINE_ITEM_HEADER, *self.rows[self.start:stop], ["", "", "", "", "Page total:", f"${page_subtotal:.2f}"]]
+        table = Table(data, colWidths=LINE_ITEM_COL_WIDTHS, rowHeights=LINE_ITEM_ROW_HEIGHT)
+        table.setStyle(PAGE_TABLE_STYLE)
+        return table
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(LINE_ITEM_COL_WIDTHS)
+        self.height = self._height(len(self.rows) - self.start)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        count = int(availHeight // LINE_ITEM_ROW_HEIGHT) - 2
+        if count < 1:
+            return []  # Not even one line fits, start on the next page
+        stop = self.start + count
+        if stop >= len(self.rows):
+            return [self._page_table(len(self.rows))]
+        return [self._page_table(stop), PagedLineItems(self.rows, self.amounts, stop)]
+
+    def draw(self):
+        table = self._page_table(len(self.rows))
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+def document_elements(kind, document, company):
+    """Build the flowables for one invoice or quote"""
+    layout = DOCUMENT_LAYOUTS[kind]
+    styles = pdf_styles()
     elements = []
     
     # Add company logo and name
-    logo_path = os.path.join('static', 'images', 'logo.png')
-    if os.path.exists(logo_path):
-        logo = Image(logo_path, width=2*inch, height=0.5*inch)
+    logo = pdf_logo()
+    if logo:
         elements.append(logo)
         elements.append(Spacer(1, 0.1*inch))
     
@@ -213,15 +256,8 @@ def generate_quote_pdf(quote, company):
     elements.append(Spacer(1, 0.1*inch))
     
     # Company details
-    company_address = []
-    if company.address:
-        company_address.append(company.address)
-    if company.city and company.province and company.postal_code:
-        company_address.append(f"{company.city}, {company.province} {company.postal_code}")
-    if company.phone:
-        company_address.append(f"Phone: {company.phone}")
-    if company.email:
-        company_address.append(f"Email: {company.email}")
+    company_address = [company.address] if company.address else []
+    _address_lines(company, company_address)
     if company.website:
         company_address.append(f"Website: {company.website}")
     if company.tax_number:
@@ -232,30 +268,19 @@ def generate_quote_pdf(quote, company):
     
     elements.append(Spacer(1, 0.3*inch))
     
-    # Quote details
-    elements.append(Paragraph("<b>QUOTE</b>", styles['Heading2']))
+    # Document details
+    elements.append(Paragraph(f"<b>{layout['title']}</b>", styles['Heading2']))
     elements.append(Spacer(1, 0.1*inch))
     
-    quote_data = [
-        ["Quote Number:", quote.quote_number],
-        ["Date Issued:", quote.date_issued.strftime("%B %d, %Y")],
-        ["Valid Until:", quote.date_valid_until.strftime("%B %d, %Y")],
-    ]
-    
-    quote_table = Table(quote_data, colWidths=[2*inch, 4*inch])
-    quote_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-    ]))
+    details_table = Table(layout['details'](document), colWidths=[2*inch, 4*inch])
+    details_table.setStyle(DETAILS_TABLE_STYLE)
     
-    elements.append(quote_table)
+    elements.append(details_table)
     elements.append(Spacer(1, 0.3*inch))
     
     # Client details
-    client = quote.client
-    elements.append(Paragraph("<b>PREPARED FOR:</b>", styles['Heading3']))
+    client = document.client
+    elements.append(Paragraph(f"<b>{layout['client_heading']}</b>", styles['Heading3']))
     elements.append(Spacer(1, 0.1*inch))
     
     client_address = [client.name]
@@ -263,12 +288,7 @@ def generate_quote_pdf(quote, company):
         client_address.append(f"Attn: {client.contact_person}")
     if client.address:
         client_address.append(client.address)
-    if client.city and client.province and client.postal_code:
-        client_address.append(f"{client.city}, {client.province} {client.postal_code}")
-    if client.phone:
-        client_address.append(f"Phone: {client.phone}")
-    if client.email:
-        client_address.append(f"Email: {client.email}")
+    _address_lines(client, client_address)
     
     for line in client_address:
         elements.append(Paragraph(line, styles['Normal']))
@@ -279,64 +299,68 @@ def generate_quote_pdf(quote, company):
     elements.append(Paragraph("<b>SERVICES:</b>", styles['Heading3']))
     elements.append(Spacer(1, 0.1*inch))
     
-    # Table header
-    time_data = [
-        ["Date", "Description", "Location", "Hours", "Rate", "Amount"]
-    ]
-    
-    # Table rows for each time entry
-    for entry in quote.time_entries:
-        amount = entry.total_hours * entry.hourly_rate
-        time_data.append([
-            entry.date.strftime("%Y-%m-%d"),
-            entry.item,
-            entry.location or "",
-            f"{entry.total_hours:.2f}",
-            f"${entry.hourly_rate:.2f}",
-            f"${amount:.2f}"
-        ])
-    
-    # Add subtotal, tax and total rows
-    time_data.append(["", "", "", "", "Subtotal:", f"${quote.subtotal:.2f}"])
-    time_data.append(["", "", "", "", f"HST ({quote.hst_rate*100:.0f}%):", f"${quote.hst_amount:.2f}"])
-    time_data.append(["", "", "", "", "Total:", f"${quote.total:.2f}"])
-    
-    # Adjust column widths for time entries table
-    col_widths = [1*inch, 2*inch, 1.5*inch, 0.75*inch, 0.75*inch, 1*inch]
-    time_table = Table(time_data, colWidths=col_widths)
-    
-    # Style the table
-    style = TableStyle([
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),  # Header alignment
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),  # Header font
-        ('ALIGN', (3, 1), (5, -1), 'RIGHT'),  # Right align numbers
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),  # Header underline
-        ('LINEABOVE', (0, -3), (-1, -3), 1, colors.black),  # Line above subtotal
-        ('FONTNAME', (4, -3), (4, -1), 'Helvetica-Bold'),  # Bold for "Subtotal", "HST", and "Total"
-    ])
-    
-    # Add a thicker line above the total row
-    style.add('LINEABOVE', (0, -1), (-1, -1), 2, colors.black)
-    
-    time_table.setStyle(style)
-    elements.append(time_table)
-    
-    # Add quote notes if any
-    if quote.notes:
+    rows, amounts = _line_item_rows(document.time_entries)
+    if len(rows) > LARGE_DOCUMENT_LINES:
+        elements.append(PagedLineItems(rows, amounts))
+        totals_table = Table(_totals_rows(document), colWidths=LINE_ITEM_COL_WIDTHS)
+        totals_table.setStyle(TOTALS_TABLE_STYLE)
+        elements.append(totals_table)
+    else:
+        time_table = Table([LINE_ITEM_HEADER, *rows, *_totals_rows(document)], colWidths=LINE_ITEM_COL_WIDTHS)
+        time_table.setStyle(LINE_ITEMS_TABLE_STYLE)
+        elements.append(time_table)
+    
+    # Add notes if any
+    if document.notes:
         elements.append(Spacer(1, 0.3*inch))
         elements.append(Paragraph("<b>NOTES:</b>", styles['Heading3']))
-        elements.append(Paragraph(quote.notes, styles['Normal']))
+        elements.append(Paragraph(document.notes, styles['Normal']))
     
-    # Add quote terms
+    # Add payment terms or quote terms
     elements.append(Spacer(1, 0.3*inch))
-    elements.append(Paragraph("<b>TERMS AND CONDITIONS:</b>", styles['Heading3']))
-    elements.append(Paragraph("This quote is valid until the date specified above. To accept this quote, please contact us.", styles['Normal']))
+    elements.append(Paragraph(f"<b>{layout['terms_heading']}</b>", styles['Heading3']))
+    elements.append(Paragraph(layout['terms'], styles['Normal']))
     
-    # Build the PDF document
+    return elements
+
+def build_pdf(elements, output):
+    """Lay out flowables on letter pages and write the PDF to output (a path or file)"""
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=letter,
+        rightMargin=PDF_MARGIN,
+        leftMargin=PDF_MARGIN,
+        topMargin=PDF_MARGIN,
+        bottomMargin=PDF_MARGIN
+    )
     doc.build(elements)
+
+def write_invoice_pdf(invoice, company, output):
+    """Write a PDF invoice to output (a path or file)"""
+    build_pdf(document_elements('invoice', invoice, company), output)
+
+def write_quote_pdf(quote, company, output):
+    """Write a PDF quote to output (a path or file)"""
+    build_pdf(document_elements('quote', quote, company), output)
+
+def generate_invoice_pdf(invoice, company):
+    """Generate a PDF invoice"""
+    buffer = io.BytesIO()
+    write_invoice_pdf(invoice, company, buffer)
+    return buffer.getvalue()
+
+def generate_quote_pdf(quote, company):
+    """Generate a PDF quote"""
+    buffer = io.BytesIO()
+    write_quote_pdf(quote, company, buffer)
+    return buffer.getvalue()
+
+def generate_combined_invoice_pdf(invoices, company, output):
+    """Generate one PDF with every invoice starting on a new page, written to output (a path or file)"""
+    elements = []
+    for invoice in invoices:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(document_elements('invoice', invoice, company))
     
-    # Get the value of the BytesIO buffer
-    pdf_data = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_data
+    build_pdf(elements, output)
@@ -3,6 +3,7 @@ import os
 import sys
 from app import app, db
 import models
+from search import SEARCH_TABLE
 import inspect
 
 def get_expected_tables():
@@ -25,7 +26,7 @@ def get_expected_tables():
         # Get column info
         for column_name, column in model_class.__table__.columns.items():
             column_type = str(column.type)
-            nullable = not column.nullable
+            nullable = column.nullable
             primary_key = column.primary_key
             foreign_key = None
             
@@ -53,7 +54,9 @@ def get_actual_tables(db_path):
     cursor = conn.cursor()
     
     # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    # The full-text search index and its shadow tables are maintained by search.py, not the models
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+                   f"AND name NOT LIKE '{SEARCH_TABLE}%'")
     tables = cursor.fetchall()
     
     actual_tables = {}
@@ -82,7 +85,7 @@ def get_actual_tables(db_path):
             
             actual_tables[table_name]['columns'][name] = {
                 'type': type_,
-                'nullable': notnull == 1,
+                'nullable': notnull == 0,
                 'primary_key': pk == 1,
                 'foreign_key': foreign_key
             }
@@ -134,8 +137,8 @@ def validate_schema(db_path):
                 if expected_column['nullable'] != actual_column['nullable']:
                     issues_found = True
                     print(f"Column '{table_name}.{column_name}' has different nullable constraint: "
-                          f"expected {'NOT NULL' if expected_column['nullable'] else 'NULL'}, "
-                          f"got {'NOT NULL' if actual_column['nullable'] else 'NULL'}")
+                          f"expected {'NULL' if expected_column['nullable'] else 'NOT NULL'}, "
+                          f"got {'NULL' if actual_column['nullable'] else 'NOT NULL'}")
                 
                 # Check primary key constraint
                 if expected_column['primary_key'] != actual_column['primary_key']:
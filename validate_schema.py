@@ -3,6 +3,7 @@ import os
 import sys
 from app import app, db
 import models
+from search import SEARCH_TABLE
 
 def get_expected_tables():
     """Get the expected tables from the SQLAlchemy models"""
@@ -50,7 +51,9 @@ def get_actual_tables(db_path):
     cursor = conn.cursor()
     
     # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    # The full-text search index and its shadow tables are maintained by search.py, not the models
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+                   f"AND name NOT LIKE '{SEARCH_TABLE}%'")
     tables = cursor.fetchall()
     
     actual_tables = {}